@@ -1,6 +1,8 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import get_settings
+from .services.browser_pool import browser_pool_enabled, get_browser_pool
 import logging
 import os
 
@@ -29,7 +31,20 @@ def get_cors_origins() -> list[str]:
     return sorted(set(origins))
 
 
-app = FastAPI(title="BrowserTeacher API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep warm browser sessions for the lifetime of the API process
+    pool = get_browser_pool() if browser_pool_enabled() else None
+    if pool is not None:
+        await pool.start()
+    try:
+        yield
+    finally:
+        if pool is not None:
+            await pool.stop()
+
+
+app = FastAPI(title="BrowserTeacher API", version="0.1.0", lifespan=lifespan)
 
 # Basic logging setup
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
@@ -45,9 +60,11 @@ app.add_middleware(
 
 # Routers
 from .v1.routes.voice import router as voice_router  # noqa: E402
+from .v1.routes.browser import router as browser_router  # noqa: E402
 
 
 app.include_router(voice_router, prefix="/api/v1/voice", tags=["voice"]) 
+app.include_router(browser_router, prefix="/api/v1/browser", tags=["browser"])
 
 
 @app.get("/health")
@@ -0,0 +1,64 @@
+"""Offline browser pool benchmark using the fake provider.
+
+  python -m api.bench.browser_pool --rooms 30 --warm-sizes 0,4,16 --cold-start 2.0
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from ..services.browser_pool import BrowserSessionPool, FakeBrowserProvider
+
+
+async def _wait_warm(pool: BrowserSessionPool, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while pool.snapshot()["warm"] < pool.warm_size and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+
+async def run_scenario(args: argparse.Namespace, warm_size: int) -> dict:
+    provider = FakeBrowserProvider(create_latency=args.cold_start, jitter=args.jitter)
+    pool = BrowserSessionPool(provider, warm_size=warm_size, max_sessions=args.max_sessions, recycle=args.recycle)
+    await pool.start()
+    await _wait_warm(pool, timeout=args.cold_start * 4 + 5)
+
+    async def learner(i: int) -> None:
+        # Arrivals are spread uniformly over the burst window (0 = all at once)
+        await asyncio.sleep(random.uniform(0, args.burst_window))
+        room = f"room-{i}"
+        await pool.lease(room)
+        await asyncio.sleep(args.hold)
+        await pool.release(room)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(learner(i) for i in range(args.rooms)))
+    elapsed = time.perf_counter() - t0
+    stats = pool.snapshot()
+    await pool.stop()
+    return {"warm_size": warm_size, "elapsed_s": elapsed, "created": provider.created, **stats}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m api.bench.browser_pool")
+    parser.add_argument("--rooms", type=int, default=30)
+    parser.add_argument("--warm-sizes", default="0,4,16,32")
+    parser.add_argument("--cold-start", type=float, default=2.0, help="fake browser boot time (s)")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--burst-window", type=float, default=1.0, help="seconds over which learners arrive")
+    parser.add_argument("--hold", type=float, default=0.5, help="seconds each learner keeps the browser")
+    parser.add_argument("--max-sessions", type=int, default=64)
+    parser.add_argument("--recycle", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'warm':>5} {'lease p50 ms':>13} {'p99 ms':>9} {'warm hits':>10} {'cold':>6} {'created':>8} {'elapsed s':>10}")
+    for warm_size in (int(w) for w in args.warm_sizes.split(",") if w.strip()):
+        r = asyncio.run(run_scenario(args, warm_size))
+        print(
+            f"{r['warm_size']:>5} {r['lease_p50_ms']:>13.1f} {r['lease_p99_ms']:>9.1f} "
+            f"{r['warm_hits']:>10} {r['cold_starts']:>6} {r['created']:>8} {r['elapsed_s']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
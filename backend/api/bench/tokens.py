@@ -0,0 +1,115 @@
+"""Token minting benchmark through the FastAPI test client.
+
+  python -m api.bench.tokens --requests 2000 --batch-sizes 10,100,500
+"""
+
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from ..app import app
+from ..core.config import get_settings
+from ..services.livekit_tokens import get_token_minter
+
+try:
+    from livekit import api as lk_api
+except Exception:
+    lk_api = None  # type: ignore
+
+
+def _pct(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100.0)))]
+
+
+def _report(label: str, tokens: int, elapsed: float, latencies: list[float]) -> None:
+    print(
+        f"{label:<24} {tokens / elapsed:>10.0f} tok/s   "
+        f"p50 {_pct(latencies, 50) * 1000:>7.2f} ms   p99 {_pct(latencies, 99) * 1000:>7.2f} ms"
+    )
+
+
+def bench_sdk_builder(n: int) -> None:
+    """Previous per-request path: fresh AccessToken + RoomConfiguration each time."""
+    if lk_api is None:
+        return
+    settings = get_settings()
+    latencies = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        s = time.perf_counter()
+        (
+            lk_api.AccessToken(settings.LIVEKIT_API_KEY, settings.LIVEKIT_API_SECRET)
+            .with_identity(f"user-{i}")
+            .with_grants(lk_api.VideoGrants(room_join=True, room=f"room-{i}", can_publish=True, can_subscribe=True))
+            .with_room_config(lk_api.RoomConfiguration(agents=[lk_api.RoomAgentDispatch(agent_name=settings.AGENT_NAME, metadata="browserteacher")]))
+            .to_jwt()
+        )
+        latencies.append(time.perf_counter() - s)
+    _report("sdk builder (no http)", n, time.perf_counter() - t0, latencies)
+
+
+def bench_minter(n: int) -> None:
+    minter = get_token_minter()
+    latencies = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        s = time.perf_counter()
+        minter.mint(f"user-{i}", f"room-{i}")
+        latencies.append(time.perf_counter() - s)
+    _report("minter (no http)", n, time.perf_counter() - t0, latencies)
+
+
+def bench_single(client: TestClient, n: int) -> None:
+    latencies = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        s = time.perf_counter()
+        r = client.post("/api/v1/voice/token", json={"identity": f"user-{i}", "room": f"room-{i}"})
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - s)
+    _report("POST /token", n, time.perf_counter() - t0, latencies)
+
+
+def bench_batch(client: TestClient, n: int, size: int) -> None:
+    calls = max(1, n // size)
+    latencies = []
+    t0 = time.perf_counter()
+    for c in range(calls):
+        body = {"requests": [{"identity": f"user-{c}-{i}", "room": f"room-{c}"} for i in range(size)]}
+        s = time.perf_counter()
+        r = client.post("/api/v1/voice/token/batch", json=body)
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - s)
+    _report(f"POST /token/batch x{size}", calls * size, time.perf_counter() - t0, latencies)
+
+
+def verify() -> None:
+    """Minted tokens must decode with the SDK's own verifier."""
+    if lk_api is None:
+        return
+    settings = get_settings()
+    claims = lk_api.TokenVerifier(settings.LIVEKIT_API_KEY, settings.LIVEKIT_API_SECRET).verify(get_token_minter().mint("check", "room-check"))
+    assert claims.identity == "check" and claims.video.room == "room-check" and claims.video.room_join
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m api.bench.tokens")
+    parser.add_argument("--requests", type=int, default=2000, help="tokens per scenario")
+    parser.add_argument("--batch-sizes", default="10,100,500")
+    args = parser.parse_args()
+
+    verify()
+    bench_sdk_builder(args.requests)
+    bench_minter(args.requests)
+    with TestClient(app) as client:
+        bench_single(client, args.requests)
+        for size in (int(s) for s in args.batch_sizes.split(",") if s.strip()):
+            bench_batch(client, args.requests, size)
+
+
+if __name__ == "__main__":
+    main()
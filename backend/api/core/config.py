@@ -11,6 +11,17 @@ class Settings(BaseSettings):
     BB_MCP_SERVER_URL: str | None = None
     AGENT_NAME: str = "teacher-agent"
 
+    # Browser session pool (api/services/browser_pool.py)
+    BROWSERBASE_API_KEY: str | None = None
+    BROWSERBASE_PROJECT_ID: str | None = None
+    BROWSER_POOL_PROVIDER: str = "browserbase"  # or "fake" for offline runs
+    BROWSER_POOL_WARM_SIZE: int = 2
+    BROWSER_POOL_MAX_SESSIONS: int = 20
+    BROWSER_POOL_MAX_LEASE_AGE_S: float = 2 * 3600
+    BROWSER_POOL_RECYCLE: bool = False
+    BROWSER_POOL_TAG: str = "browserteacher"  # Browserbase userMetadata tag for finding pooled sessions after a restart
+    BROWSER_POOL_SECRET: str | None = None  # shared secret callers send in X-Browser-Pool-Secret; routes refuse requests while unset
+
     # Optional runtime knobs
     HOST: str = "0.0.0.0"
     PORT: int = 8000
@@ -0,0 +1,477 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Protocol
+
+import httpx
+
+from ..core.config import get_settings
+
+
+log = logging.getLogger("browser_pool")
+
+BROWSERBASE_API = "https://api.browserbase.com/v1"
+
+# userMetadata key marking sessions created by a pool, so they can be found after a restart
+POOL_METADATA_KEY = "browserPool"
+
+
+@dataclass
+class BrowserSession:
+    id: str
+    live_view_url: str = ""
+    devtools_wss_url: str = ""
+    created_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class BrowserLease:
+    room_id: str
+    session: BrowserSession
+    leased_at: float = field(default_factory=time.monotonic)
+    warm: bool = False
+
+    @property
+    def age_s(self) -> float:
+        return time.monotonic() - self.leased_at
+
+
+@dataclass
+class TaggedSession:
+    id: str
+    age_s: float
+
+
+class BrowserProvider(Protocol):
+    async def create(self, tag: str = "") -> BrowserSession: ...
+
+    async def release(self, session_id: str) -> None: ...
+
+    async def healthy(self, session_id: str) -> bool: ...
+
+    async def list_tagged(self, tag: str) -> list[TaggedSession]: ...
+
+    async def is_tagged(self, session_id: str, tag: str) -> bool: ...
+
+
+class BrowserbaseProvider:
+    """Creates keep-alive Browserbase sessions over the REST API."""
+
+    def __init__(self, api_key: str, project_id: str, timeout: float = 30.0) -> None:
+        self._headers = {"X-BB-API-Key": api_key, "Content-Type": "application/json"}
+        self._project_id = project_id
+        self._client = httpx.AsyncClient(base_url=BROWSERBASE_API, headers=self._headers, timeout=timeout)
+
+    async def create(self, tag: str = "") -> BrowserSession:
+        body: dict = {"projectId": self._project_id, "keepAlive": True}
+        if tag:
+            body["userMetadata"] = {POOL_METADATA_KEY: tag}
+        r = await self._client.post("/sessions", json=body)
+        r.raise_for_status()
+        session_id = str(r.json().get("id", ""))
+        live_view_url = ""
+        devtools_wss_url = ""
+        try:
+            dbg = await self._client.get(f"/sessions/{session_id}/debug")
+            if dbg.status_code == 200:
+                d = dbg.json()
+                live_view_url = d.get("debuggerFullscreenUrl") or d.get("debuggerUrl") or ""
+                devtools_wss_url = d.get("wsUrl") or ((d.get("pages") or [{}])[0].get("wsUrl") or "")
+        except httpx.HTTPError as e:
+            log.warning("failed to fetch Browserbase debug urls", extra={"bb_session_id": session_id, "error": str(e)})
+        return BrowserSession(id=session_id, live_view_url=live_view_url, devtools_wss_url=devtools_wss_url)
+
+    async def release(self, session_id: str) -> None:
+        r = await self._client.post(f"/sessions/{session_id}", json={"status": "REQUEST_RELEASE", "projectId": self._project_id})
+        r.raise_for_status()
+
+    async def healthy(self, session_id: str) -> bool:
+        try:
+            r = await self._client.get(f"/sessions/{session_id}")
+            return r.status_code == 200 and r.json().get("status") == "RUNNING"
+        except httpx.HTTPError:
+            return False
+
+    async def list_tagged(self, tag: str) -> list[TaggedSession]:
+        r = await self._client.get("/sessions", params={"status": "RUNNING", "q": f"user_metadata['{POOL_METADATA_KEY}']:'{tag}'"})
+        r.raise_for_status()
+        now = time.time()
+        out = []
+        for item in r.json():
+            # Filter again in case the query parameter is ignored
+            if (item.get("userMetadata") or {}).get(POOL_METADATA_KEY) != tag:
+                continue
+            try:
+                created = datetime.fromisoformat(str(item.get("createdAt", "")).replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                continue
+            out.append(TaggedSession(id=str(item.get("id", "")), age_s=now - created))
+        return out
+
+    async def is_tagged(self, session_id: str, tag: str) -> bool:
+        r = await self._client.get(f"/sessions/{session_id}")
+        if r.status_code != 200:
+            return False
+        return (r.json().get("userMetadata") or {}).get(POOL_METADATA_KEY) == tag
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class FakeBrowserProvider:
+    """In-memory provider with a simulated cold-start latency, for offline benchmarks."""
+
+    def __init__(self, create_latency: float = 2.0, jitter: float = 0.5, failure_rate: float = 0.0) -> None:
+        self.create_latency = create_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.running: set[str] = set()
+        self.tags: dict[str, tuple[str, float]] = {}
+        self.created = 0
+        self.released = 0
+
+    async def create(self, tag: str = "") -> BrowserSession:
+        await asyncio.sleep(self.create_latency + random.uniform(0, self.jitter))
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("fake browser failed to start")
+        session_id = f"fake-{uuid.uuid4().hex[:12]}"
+        self.running.add(session_id)
+        if tag:
+            self.tags[session_id] = (tag, time.time())
+        self.created += 1
+        return BrowserSession(id=session_id, live_view_url=f"https://fake.invalid/live/{session_id}")
+
+    async def release(self, session_id: str) -> None:
+        if session_id in self.running:
+            self.running.discard(session_id)
+            self.released += 1
+
+    async def healthy(self, session_id: str) -> bool:
+        return session_id in self.running
+
+    async def list_tagged(self, tag: str) -> list[TaggedSession]:
+        now = time.time()
+        return [TaggedSession(id=sid, age_s=now - created) for sid, (t, created) in self.tags.items() if t == tag and sid in self.running]
+
+    async def is_tagged(self, session_id: str, tag: str) -> bool:
+        return session_id in self.running and self.tags.get(session_id, ("", 0.0))[0] == tag
+
+
+@dataclass
+class _RoomLock:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0
+
+
+class PoolExhaustedError(RuntimeError):
+    pass
+
+
+def _pct(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100.0)))]
+
+
+class BrowserSessionPool:
+    """Keeps warm browser sessions and leases one per LiveKit room.
+
+    Leases are idempotent per room, so a redispatched worker gets the same
+    browser back. On release the session is returned to the pool when
+    `recycle` is set and it is still healthy and young, otherwise it is
+    released at the provider and the pool is topped up in the background.
+
+    Pool state lives in memory. Sessions are tagged with `tag` in their
+    Browserbase userMetadata, so sessions this process does not hold can still
+    be found: a lease lost in a restart is released by session id, and tagged
+    sessions that no pool holds are released at startup and every
+    `orphan_reap_interval_s` once they are older than any live session can be
+    (warm for `recycle_max_age_s`, then leased for `max_lease_age_s`). The age
+    limit keeps the reaper away from sessions of other replicas sharing the tag.
+    """
+
+    def __init__(
+        self,
+        provider: BrowserProvider,
+        *,
+        warm_size: int = 2,
+        max_sessions: int = 20,
+        max_lease_age_s: float = 2 * 3600,
+        recycle: bool = False,
+        recycle_max_age_s: float = 1800,
+        reap_interval_s: float = 30.0,
+        tag: str = "",
+        orphan_reap_interval_s: float = 600.0,
+    ) -> None:
+        self.provider = provider
+        self.warm_size = warm_size
+        self.max_sessions = max_sessions
+        self.max_lease_age_s = max_lease_age_s
+        self.recycle = recycle
+        self.recycle_max_age_s = recycle_max_age_s
+        self.reap_interval_s = reap_interval_s
+        self.tag = tag
+        self.orphan_reap_interval_s = orphan_reap_interval_s
+
+        self._warm: deque[BrowserSession] = deque()
+        self._leases: dict[str, BrowserLease] = {}
+        self._room_locks: dict[str, _RoomLock] = {}
+        self._orphans_reaped_at = 0.0
+        self._creating = 0
+        self._replenish_task: asyncio.Task | None = None
+        self._reaper_task: asyncio.Task | None = None
+
+        self._lease_latencies: deque[float] = deque(maxlen=2048)
+        self.warm_hits = 0
+        self.cold_starts = 0
+        self.recycled = 0
+        self.released = 0
+        self.expired = 0
+        self.create_failures = 0
+        self.orphans_released = 0
+
+    @property
+    def total_sessions(self) -> int:
+        return len(self._warm) + len(self._leases) + self._creating
+
+    async def start(self) -> None:
+        await self.reap_orphans()
+        self._kick_replenish()
+        if self._reaper_task is None:
+            self._reaper_task = asyncio.create_task(self._reaper())
+
+    async def stop(self, release_leased: bool = False) -> None:
+        """Release warm sessions; leased ones keep running for their rooms unless asked."""
+        for task in (self._replenish_task, self._reaper_task):
+            if task is not None:
+                task.cancel()
+        self._replenish_task = None
+        self._reaper_task = None
+        sessions = list(self._warm)
+        self._warm.clear()
+        if release_leased:
+            sessions += [lease.session for lease in self._leases.values()]
+            self._leases.clear()
+        await asyncio.gather(*(self._release_session(s) for s in sessions), return_exceptions=True)
+        aclose = getattr(self.provider, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    async def _create(self) -> BrowserSession:
+        self._creating += 1
+        try:
+            return await self.provider.create(self.tag)
+        except Exception:
+            self.create_failures += 1
+            raise
+        finally:
+            self._creating -= 1
+
+    async def _release_session(self, session: BrowserSession) -> None:
+        try:
+            await self.provider.release(session.id)
+            self.released += 1
+        except Exception as e:
+            log.warning("failed to release browser session", extra={"bb_session_id": session.id, "error": str(e)})
+
+    def _kick_replenish(self) -> None:
+        if self._replenish_task is None or self._replenish_task.done():
+            self._replenish_task = asyncio.create_task(self._replenish())
+
+    async def _replenish(self) -> None:
+        while len(self._warm) + self._creating < self.warm_size and self.total_sessions < self.max_sessions:
+            need = min(self.warm_size - len(self._warm) - self._creating, self.max_sessions - self.total_sessions)
+            results = await asyncio.gather(*(self._create() for _ in range(need)), return_exceptions=True)
+            created = [r for r in results if isinstance(r, BrowserSession)]
+            self._warm.extend(created)
+            if not created:
+                # Provider is failing; back off and let the next lease/reap retry
+                log.warning("browser pool replenish failed", extra={"errors": [repr(r) for r in results]})
+                return
+
+    async def _take_warm(self) -> BrowserSession | None:
+        while self._warm:
+            session = self._warm.popleft()
+            if await self.provider.healthy(session.id):
+                return session
+            log.info("discarding unhealthy warm browser session", extra={"bb_session_id": session.id})
+            await self._release_session(session)
+        return None
+
+    @asynccontextmanager
+    async def _room_lock(self, room_id: str):
+        # Dropped only when no lease or release for the room holds or waits on it
+        entry = self._room_locks.setdefault(room_id, _RoomLock())
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0 and self._room_locks.get(room_id) is entry:
+                del self._room_locks[room_id]
+
+    async def lease(self, room_id: str) -> BrowserLease:
+        async with self._room_lock(room_id):
+            existing = self._leases.get(room_id)
+            if existing is not None:
+                return existing
+            t0 = time.monotonic()
+            session = await self._take_warm()
+            warm = session is not None
+            if session is None:
+                if self.total_sessions >= self.max_sessions:
+                    raise PoolExhaustedError(f"browser pool at capacity ({self.max_sessions})")
+                session = await self._create()
+            lease = BrowserLease(room_id=room_id, session=session, warm=warm)
+            self._leases[room_id] = lease
+            self._lease_latencies.append(time.monotonic() - t0)
+            if warm:
+                self.warm_hits += 1
+            else:
+                self.cold_starts += 1
+        self._kick_replenish()
+        log.info("leased browser session", extra={"room": room_id, "bb_session_id": session.id, "warm": warm})
+        return lease
+
+    async def release(self, room_id: str, recycle: bool | None = None, session_id: str = "") -> bool:
+        """Return a room's browser; `session_id` releases a tagged session whose lease this process lost."""
+        async with self._room_lock(room_id):
+            lease = self._leases.pop(room_id, None)
+            if lease is None:
+                return await self._release_unknown(room_id, session_id)
+            recycle = self.recycle if recycle is None else recycle
+            session = lease.session
+            if (
+                recycle
+                and time.monotonic() - session.created_at < self.recycle_max_age_s
+                and len(self._warm) < self.warm_size
+                and await self.provider.healthy(session.id)
+            ):
+                self._warm.append(session)
+                self.recycled += 1
+            else:
+                await self._release_session(session)
+        self._kick_replenish()
+        log.info("released browser lease", extra={"room": room_id, "bb_session_id": session.id, "age_s": round(lease.age_s, 1)})
+        return True
+
+    def _held(self) -> set[str]:
+        return {s.id for s in self._warm} | {lease.session.id for lease in self._leases.values()}
+
+    async def _release_unknown(self, room_id: str, session_id: str) -> bool:
+        # Never release a session this pool holds: it is another room's browser or a warm spare
+        if not session_id or not self.tag or session_id in self._held():
+            return False
+        try:
+            if not await self.provider.is_tagged(session_id, self.tag):
+                return False
+        except Exception as e:
+            log.warning("failed to look up browser session", extra={"bb_session_id": session_id, "error": str(e)})
+            return False
+        await self._release_session(BrowserSession(id=session_id))
+        self.orphans_released += 1
+        log.info("released browser session of a lost lease", extra={"room": room_id, "bb_session_id": session_id})
+        return True
+
+    async def reap_orphans(self) -> None:
+        """Release tagged sessions that no pool holds and that are past the lease age limit."""
+        if not self.tag:
+            return
+        self._orphans_reaped_at = time.monotonic()
+        try:
+            tagged = await self.provider.list_tagged(self.tag)
+        except Exception as e:
+            log.warning("failed to list pooled browser sessions", extra={"error": str(e)})
+            return
+        held = self._held()
+        max_age = self.recycle_max_age_s + self.max_lease_age_s + self.reap_interval_s
+        orphans = [t for t in tagged if t.id not in held and t.age_s > max_age]
+        for orphan in orphans:
+            await self._release_session(BrowserSession(id=orphan.id))
+        self.orphans_released += len(orphans)
+        if orphans:
+            log.info("released orphaned browser sessions", extra={"count": len(orphans)})
+
+    async def _reaper(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval_s)
+            try:
+                await self.reap()
+            except Exception as e:  # pragma: no cover
+                log.warning("browser pool reap failed", extra={"error": str(e)})
+
+    async def reap(self) -> None:
+        """Expire over-age leases, drop unhealthy or old warm sessions and top the pool up."""
+        for room_id, lease in list(self._leases.items()):
+            if lease.age_s > self.max_lease_age_s:
+                self.expired += 1
+                await self.release(room_id, recycle=False)
+        healthy: deque[BrowserSession] = deque()
+        for session in list(self._warm):
+            # Warm sessions are rotated so every live session stays under the orphan age
+            fresh = time.monotonic() - session.created_at < self.recycle_max_age_s
+            if fresh and await self.provider.healthy(session.id):
+                healthy.append(session)
+            else:
+                await self._release_session(session)
+        self._warm = healthy
+        if time.monotonic() - self._orphans_reaped_at >= self.orphan_reap_interval_s:
+            await self.reap_orphans()
+        self._kick_replenish()
+
+    def snapshot(self) -> dict:
+        latencies = list(self._lease_latencies)
+        return {
+            "warm": len(self._warm),
+            "leased": len(self._leases),
+            "creating": self._creating,
+            "warm_hits": self.warm_hits,
+            "cold_starts": self.cold_starts,
+            "recycled": self.recycled,
+            "released": self.released,
+            "expired": self.expired,
+            "create_failures": self.create_failures,
+            "orphans_released": self.orphans_released,
+            "lease_p50_ms": round(_pct(latencies, 50) * 1000, 1),
+            "lease_p99_ms": round(_pct(latencies, 99) * 1000, 1),
+            "leases": [
+                {"room_id": lease.room_id, "bb_session_id": lease.session.id, "age_s": round(lease.age_s, 1), "warm": lease.warm}
+                for lease in self._leases.values()
+            ],
+        }
+
+
+def build_provider() -> BrowserProvider:
+    settings = get_settings()
+    if settings.BROWSER_POOL_PROVIDER == "fake":
+        return FakeBrowserProvider()
+    if not settings.BROWSERBASE_API_KEY or not settings.BROWSERBASE_PROJECT_ID:
+        raise RuntimeError("BROWSERBASE_API_KEY and BROWSERBASE_PROJECT_ID must be set for the browserbase provider")
+    return BrowserbaseProvider(settings.BROWSERBASE_API_KEY, settings.BROWSERBASE_PROJECT_ID)
+
+
+@lru_cache()
+def get_browser_pool() -> BrowserSessionPool:
+    settings = get_settings()
+    return BrowserSessionPool(
+        build_provider(),
+        warm_size=settings.BROWSER_POOL_WARM_SIZE,
+        max_sessions=settings.BROWSER_POOL_MAX_SESSIONS,
+        max_lease_age_s=settings.BROWSER_POOL_MAX_LEASE_AGE_S,
+        recycle=settings.BROWSER_POOL_RECYCLE,
+        tag=settings.BROWSER_POOL_TAG,
+    )
+
+
+def browser_pool_enabled() -> bool:
+    settings = get_settings()
+    return settings.BROWSER_POOL_PROVIDER == "fake" or bool(settings.BROWSERBASE_API_KEY and settings.BROWSERBASE_PROJECT_ID)
@@ -0,0 +1,95 @@
+import base64
+import calendar
+import datetime
+import hashlib
+import hmac
+import json
+from functools import lru_cache
+
+from ..core.config import get_settings
+
+try:
+    from livekit import api as lk_api
+except Exception:
+    lk_api = None  # type: ignore
+
+
+DEFAULT_TTL = datetime.timedelta(hours=6)
+
+# Placeholder substituted per token in the precomputed claims template
+_ROOM_PLACEHOLDER = "__room__"
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+class TokenMinter:
+    """Mints LiveKit join tokens from precomputed claims and signing state.
+
+    The claims template (grants plus the agent dispatch room config) is built
+    once through the LiveKit SDK, and the HMAC key schedule is computed once, so
+    each token only costs a dict copy, a JSON dump and one HMAC-SHA256.
+    """
+
+    def __init__(self, api_key: str, api_secret: str, ws_url: str, agent_name: str | None, ttl: datetime.timedelta = DEFAULT_TTL) -> None:
+        if lk_api is None:
+            raise RuntimeError("livekit server sdk not installed")
+        self.api_key = api_key
+        self.ws_url = ws_url
+        self.ttl = ttl
+
+        at = (
+            lk_api.AccessToken(api_key, api_secret)
+            .with_identity("template")
+            .with_grants(
+                lk_api.VideoGrants(
+                    room_join=True,
+                    room=_ROOM_PLACEHOLDER,
+                    can_publish=True,
+                    can_subscribe=True,
+                )
+            )
+        )
+        # Request agent dispatch so a worker auto-joins the room
+        if agent_name:
+            at = at.with_room_config(
+                lk_api.RoomConfiguration(
+                    agents=[lk_api.RoomAgentDispatch(agent_name=agent_name, metadata="browserteacher")]
+                )
+            )
+        self._claims = at.claims.asdict()
+        self._video = self._claims.pop("video")
+
+        self._header = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+        self._mac = hmac.new(api_secret.encode(), digestmod=hashlib.sha256)
+
+    def mint(self, identity: str, room: str, now: datetime.datetime | None = None) -> str:
+        if not identity or not room:
+            raise ValueError("identity and room must be set when joining a room")
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        claims = dict(self._claims)
+        claims["video"] = {**self._video, "room": room}
+        claims["sub"] = identity
+        claims["iss"] = self.api_key
+        claims["nbf"] = calendar.timegm(now.utctimetuple())
+        claims["exp"] = calendar.timegm((now + self.ttl).utctimetuple())
+        signing_input = f"{self._header}.{_b64(json.dumps(claims, separators=(',', ':')).encode())}"
+        mac = self._mac.copy()
+        mac.update(signing_input.encode("ascii"))
+        return f"{signing_input}.{_b64(mac.digest())}"
+
+    def mint_many(self, pairs: list[tuple[str, str]]) -> list[str]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return [self.mint(identity, room, now) for identity, room in pairs]
+
+
+@lru_cache()
+def get_token_minter() -> TokenMinter:
+    settings = get_settings()
+    return TokenMinter(
+        api_key=settings.LIVEKIT_API_KEY,
+        api_secret=settings.LIVEKIT_API_SECRET,
+        ws_url=settings.LIVEKIT_URL,
+        agent_name=settings.AGENT_NAME,
+    )
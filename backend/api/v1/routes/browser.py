@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+import hmac
+import logging
+
+from ...core.config import get_settings
+
+
+log = logging.getLogger("browser")
+
+SECRET_HEADER = "X-Browser-Pool-Secret"
+
+
+def require_pool_secret(x_browser_pool_secret: str = Header("", alias=SECRET_HEADER)) -> None:
+    """Only the frontend and the worker may lease or release browsers; they share BROWSER_POOL_SECRET."""
+    secret = get_settings().BROWSER_POOL_SECRET
+    if not secret:
+        raise HTTPException(status_code=503, detail="BROWSER_POOL_SECRET not configured")
+    if not hmac.compare_digest(x_browser_pool_secret.encode(), secret.encode()):
+        raise HTTPException(status_code=401, detail="invalid browser pool secret")
+
+
+router = APIRouter(dependencies=[Depends(require_pool_secret)])
+
+
+class LeaseRequest(BaseModel):
+    room_id: str
+
+
+class LeaseResponse(BaseModel):
+    room_id: str
+    bb_session_id: str
+    live_view_url: str
+    devtools_wss_url: str
+    warm: bool
+
+
+class ReleaseRequest(BaseModel):
+    room_id: str
+    recycle: bool | None = None
+    bb_session_id: str = ""
+
+
+class ReleaseResponse(BaseModel):
+    room_id: str
+    released: bool
+
+
+from ...services.browser_pool import BrowserSessionPool, PoolExhaustedError, browser_pool_enabled, get_browser_pool  # noqa: E402
+
+
+def _pool() -> BrowserSessionPool:
+    if not browser_pool_enabled():
+        raise HTTPException(status_code=503, detail="browser pool not configured")
+    return get_browser_pool()
+
+
+@router.post("/lease", response_model=LeaseResponse)
+async def lease_session(body: LeaseRequest) -> LeaseResponse:
+    pool = _pool()
+    try:
+        lease = await pool.lease(body.room_id)
+    except PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        log.warning("browser lease failed", extra={"room": body.room_id, "error": str(e)})
+        raise HTTPException(status_code=502, detail=f"failed to lease browser session: {e}")
+    return LeaseResponse(
+        room_id=lease.room_id,
+        bb_session_id=lease.session.id,
+        live_view_url=lease.session.live_view_url,
+        devtools_wss_url=lease.session.devtools_wss_url,
+        warm=lease.warm,
+    )
+
+
+@router.post("/release", response_model=ReleaseResponse)
+async def release_session(body: ReleaseRequest) -> ReleaseResponse:
+    released = await _pool().release(body.room_id, recycle=body.recycle, session_id=body.bb_session_id)
+    return ReleaseResponse(room_id=body.room_id, released=released)
+
+
+@router.get("/pool")
+async def pool_status() -> dict:
+    return _pool().snapshot()
@@ -1,19 +1,15 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-import os
+from pydantic import BaseModel, Field
 import uuid
 import logging
 
-try:
-    # Prefer the modern API module per docs
-    from livekit import api as lk_api
-except Exception:
-    lk_api = None  # type: ignore
-
 
 router = APIRouter()
 log = logging.getLogger("voice")
 
+# Upper bound on identities per batch call; keeps one request from monopolizing the loop
+MAX_BATCH_TOKENS = 500
+
 
 class TokenRequest(BaseModel):
     identity: str
@@ -26,51 +22,46 @@ class TokenResponse(BaseModel):
     ws_url: str
 
 
-from ...core.config import get_settings
+class BatchTokenRequest(BaseModel):
+    requests: list[TokenRequest] = Field(..., min_length=1, max_length=MAX_BATCH_TOKENS)
 
 
-@router.post("/token", response_model=TokenResponse)
-def create_token(body: TokenRequest) -> TokenResponse:
-    if lk_api is None:
-        raise HTTPException(status_code=500, detail="livekit server sdk not installed")
+class BatchTokenResponse(BaseModel):
+    tokens: list[TokenResponse]
 
-    settings = get_settings()
-    api_key = settings.LIVEKIT_API_KEY
-    api_secret = settings.LIVEKIT_API_SECRET
-    ws_url = settings.LIVEKIT_URL
 
-    room = body.room or f"lesson-{uuid.uuid4()}"
-    log.info("minting livekit token", extra={"room": room, "identity": body.identity})
-
-    at = (
-        lk_api.AccessToken(api_key, api_secret)
-        .with_identity(body.identity)
-        .with_grants(
-            lk_api.VideoGrants(
-                room_join=True,
-                room=room,
-                can_publish=True,
-                can_subscribe=True,
-            )
-        )
-    )
+from ...services.livekit_tokens import TokenMinter, get_token_minter  # noqa: E402
+
 
-    # Optional: request agent dispatch so a worker auto-joins this room
+def _minter() -> TokenMinter:
     try:
-        agent_name = get_settings().AGENT_NAME
-        if agent_name:
-            at = at.with_room_config(
-                lk_api.RoomConfiguration(
-                    agents=[lk_api.RoomAgentDispatch(agent_name=agent_name, metadata="browserteacher")]
-                )
-            )
-            log.info("added room agent dispatch", extra={"room": room, "agent": agent_name})
-    except Exception:  # pragma: no cover
-        pass
-
-    token = at.to_jwt()
-
-    resp = TokenResponse(access_token=token, room=room, ws_url=ws_url)
-    log.info("issued token", extra={"room": resp.room})
-    return resp
+        return get_token_minter()
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post("/token", response_model=TokenResponse)
+async def create_token(body: TokenRequest) -> TokenResponse:
+    minter = _minter()
+    room = body.room or f"lesson-{uuid.uuid4()}"
+    try:
+        token = minter.mint(body.identity, room)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    log.info("issued token", extra={"room": room, "identity": body.identity})
+    return TokenResponse(access_token=token, room=room, ws_url=minter.ws_url)
+
+
+@router.post("/token/batch", response_model=BatchTokenResponse)
+async def create_tokens(body: BatchTokenRequest) -> BatchTokenResponse:
+    """Mint tokens for many identities/rooms at once (e.g. a whole classroom joining)."""
+    minter = _minter()
+    pairs = [(r.identity, r.room or f"lesson-{uuid.uuid4()}") for r in body.requests]
+    try:
+        tokens = minter.mint_many(pairs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    log.info("issued token batch", extra={"count": len(tokens)})
+    return BatchTokenResponse(
+        tokens=[TokenResponse(access_token=t, room=room, ws_url=minter.ws_url) for t, (_, room) in zip(tokens, pairs)]
+    )
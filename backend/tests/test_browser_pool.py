@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from api.core.config import get_settings
+from api.services.browser_pool import BrowserSessionPool, FakeBrowserProvider, PoolExhaustedError
+from api.v1.routes.browser import require_pool_secret
+
+
+def _pool(**kwargs) -> tuple[BrowserSessionPool, FakeBrowserProvider]:
+  provider = FakeBrowserProvider(create_latency=0.0, jitter=0.0)
+  kwargs.setdefault("warm_size", 0)
+  kwargs.setdefault("tag", "test")
+  return BrowserSessionPool(provider, **kwargs), provider
+
+
+def test_lease_is_idempotent_per_room():
+  async def run() -> None:
+    pool, provider = _pool()
+    first, second = await asyncio.gather(pool.lease("room-1"), pool.lease("room-1"))
+    assert first is second
+    assert provider.created == 1
+    assert (await pool.lease("room-2")).session.id != first.session.id
+    # Room locks are dropped once nothing holds or waits on them
+    assert pool._room_locks == {}
+
+  asyncio.run(run())
+
+
+def test_warm_sessions_are_leased_first():
+  async def run() -> None:
+    pool, provider = _pool(warm_size=2)
+    await pool.start()
+    await pool._replenish_task
+    lease = await pool.lease("room-1")
+    assert lease.warm
+    assert pool.warm_hits == 1 and pool.cold_starts == 0
+    await pool.stop()
+    # Warm spares are released on stop; leased sessions keep running for their rooms
+    assert provider.running == {lease.session.id}
+
+  asyncio.run(run())
+
+
+def test_release_recycles_or_releases():
+  async def run() -> None:
+    pool, provider = _pool(warm_size=1)
+    lease = await pool.lease("room-1")
+    assert await pool.release("room-1", recycle=True)
+    assert list(pool._warm) == [lease.session]
+    assert pool.recycled == 1
+
+    lease = await pool.lease("room-2")
+    assert await pool.release("room-2", recycle=False)
+    assert lease.session.id not in provider.running
+    assert not await pool.release("room-2")
+
+  asyncio.run(run())
+
+
+def test_capacity_limit():
+  async def run() -> None:
+    pool, _ = _pool(max_sessions=1)
+    await pool.lease("room-1")
+    with pytest.raises(PoolExhaustedError):
+      await pool.lease("room-2")
+
+  asyncio.run(run())
+
+
+def test_release_by_session_id_only_for_unheld_tagged_sessions():
+  async def run() -> None:
+    pool, provider = _pool()
+    held = await pool.lease("room-1")
+    # Another room's live browser is never released by id
+    assert not await pool.release("room-2", session_id=held.session.id)
+    assert held.session.id in provider.running
+
+    untagged = await provider.create()
+    assert not await pool.release("room-3", session_id=untagged.id)
+    assert untagged.id in provider.running
+
+    # A tagged session whose lease was lost (API restart) is released
+    lost = await provider.create("test")
+    assert await pool.release("room-4", session_id=lost.id)
+    assert lost.id not in provider.running
+    assert pool.orphans_released == 1
+
+  asyncio.run(run())
+
+
+def test_reap_expires_old_leases_and_unhealthy_warm_sessions():
+  async def run() -> None:
+    pool, provider = _pool(warm_size=1, max_lease_age_s=60)
+    lease = await pool.lease("room-1")
+    lease.leased_at -= 120
+    warm = await provider.create("test")
+    pool._warm.append(warm)
+    provider.running.discard(warm.id)
+
+    await pool.reap()
+    assert pool.expired == 1
+    assert "room-1" not in pool._leases
+    assert lease.session.id not in provider.running
+    assert warm not in pool._warm
+
+  asyncio.run(run())
+
+
+def test_reap_orphans_skips_held_and_young_sessions():
+  async def run() -> None:
+    pool, provider = _pool(max_lease_age_s=60, recycle_max_age_s=60, reap_interval_s=1)
+    held = await pool.lease("room-1")
+    young = await provider.create("test")
+    old = await provider.create("test")
+    other_tag = await provider.create("other")
+    for session in (held.session, old, other_tag):
+      provider.tags[session.id] = (provider.tags[session.id][0], time.time() - 3600)
+
+    await pool.reap_orphans()
+    assert provider.running == {held.session.id, young.id, other_tag.id}
+    assert pool.orphans_released == 1
+
+  asyncio.run(run())
+
+
+def test_routes_require_the_shared_secret(monkeypatch):
+  settings = get_settings()
+  monkeypatch.setattr(settings, "BROWSER_POOL_SECRET", None)
+  with pytest.raises(HTTPException) as e:
+    require_pool_secret("anything")
+  assert e.value.status_code == 503
+
+  monkeypatch.setattr(settings, "BROWSER_POOL_SECRET", "s3cret")
+  with pytest.raises(HTTPException) as e:
+    require_pool_secret("guess")
+  assert e.value.status_code == 401
+  require_pool_secret("s3cret")
@@ -0,0 +1,88 @@
+import pytest
+
+from voice_bot.lesson_plans import LessonPlanCache, instantiate, normalize_goal
+from voice_bot.schemas import LessonPlan, LessonStep
+
+
+@pytest.mark.parametrize(
+  "goal, key",
+  [
+    ("Learn CSS grid layouts", "css grid layout"),
+    ("Please teach me CSS Grid layout!", "css grid layout"),
+    ("Can you explain JavaScript promises?", "javascript promise"),
+    ("how do I center a div", "center div"),
+    # Subject words that look like request phrasing are kept
+    ("machine learning basics", "basic learning machine"),
+    ("I want to learn the basics of machine learning", "basic learning machine"),
+    ("learning rust", "learning rust"),
+    ("", ""),
+  ],
+)
+def test_normalize_goal(goal, key):
+  assert normalize_goal(goal) == key
+
+
+def _plan(goal: str) -> LessonPlan:
+  return LessonPlan(
+    title="CSS grid",
+    description="Lay out a page with CSS grid",
+    goal=goal,
+    objective="Build a grid layout",
+    userObjective="for my portfolio",
+    steps=[
+      LessonStep(id="s2", conceptTitle="Areas", description="Name grid areas", objective="Use grid-template-areas", done=True, order=1),
+      LessonStep(id="s1", conceptTitle="Tracks", description="Define rows and columns", objective="Use grid-template-columns", done=True, order=0),
+    ],
+  )
+
+
+def test_exact_hit_across_phrasings(tmp_path):
+  cache = LessonPlanCache(tmp_path)
+  cache.store(_plan("learn css grid layouts"), generation_s=4.0)
+  match = LessonPlanCache(tmp_path).lookup("Please teach me CSS grid layout")
+  assert match is not None and match.exact and match.score == 1.0
+
+
+def test_similarity_threshold(tmp_path):
+  cache = LessonPlanCache(tmp_path)
+  assert cache.min_similarity == 0.85
+  cache.store(_plan("learn css grid layouts"))
+
+  similar = cache.lookup("CSS grid layout basics")
+  assert similar is not None and not similar.exact
+  assert similar.score >= 0.85
+  # Close, but under the threshold: generate a fresh plan
+  assert cache.lookup("the css grid") is None
+  assert cache.lookup("python decorators") is None
+  assert LessonPlanCache(tmp_path, min_similarity=0.7).lookup("the css grid") is not None
+
+
+def test_instantiate_resets_learner_state(tmp_path):
+  cache = LessonPlanCache(tmp_path)
+  template = cache.store(_plan("learn css grid layouts"))
+  plan = instantiate(template, "CSS grid for beginners", user_objective="for work")
+  assert [s.conceptTitle for s in plan.steps] == ["Tracks", "Areas"]
+  assert [s.order for s in plan.steps] == [0, 1]
+  assert not any(s.done for s in plan.steps)
+  assert {s.id for s in plan.steps}.isdisjoint({"s1", "s2"})
+  assert plan.goal == "CSS grid for beginners"
+  assert plan.userObjective == "for work"
+
+
+def test_store_respects_max_templates(tmp_path):
+  cache = LessonPlanCache(tmp_path, max_templates=1)
+  assert cache.store(_plan("learn css grid layouts")) is not None
+  assert cache.store(_plan("javascript promises")) is None
+  # Replacing an existing template is still allowed
+  assert cache.store(_plan("css grid layout"), generation_s=2.0) is not None
+
+
+def test_hit_stats(tmp_path):
+  cache = LessonPlanCache(tmp_path)
+  cache.store(_plan("learn css grid layouts"), generation_s=4.0)
+  cache.record_hit(cache.lookup("css grid layouts"), instantiate_s=0.5)
+  cache.record_miss()
+  snap = cache.snapshot()
+  assert snap["exact_hits"] == 1 and snap["misses"] == 1
+  assert snap["hit_rate"] == 0.5
+  assert snap["time_saved_s"] == 3.5
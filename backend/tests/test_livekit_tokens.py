@@ -0,0 +1,74 @@
+import base64
+import datetime
+import json
+
+import jwt
+import pytest
+from livekit import api as lk_api
+
+from api.services.livekit_tokens import DEFAULT_TTL, TokenMinter
+
+
+API_KEY = "APItest"
+API_SECRET = "test-secret-that-is-long-enough-for-hs256"
+
+
+def _payload(token: str) -> dict:
+  body = token.split(".")[1]
+  return json.loads(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))
+
+
+@pytest.fixture
+def minter() -> TokenMinter:
+  return TokenMinter(API_KEY, API_SECRET, "wss://livekit.invalid", "teacher-agent")
+
+
+def test_minted_token_verifies_with_sdk(minter):
+  claims = lk_api.TokenVerifier(API_KEY, API_SECRET).verify(minter.mint("learner-1", "room-1"))
+  assert claims.identity == "learner-1"
+  assert claims.video.room == "room-1"
+  assert claims.video.room_join and claims.video.can_publish and claims.video.can_subscribe
+  assert [a.agent_name for a in claims.room_config.agents] == ["teacher-agent"]
+
+
+def test_minted_claims_match_sdk_token(minter):
+  now = datetime.datetime.now(datetime.timezone.utc)
+  sdk_token = (
+    lk_api.AccessToken(API_KEY, API_SECRET)
+    .with_identity("learner-1")
+    .with_ttl(DEFAULT_TTL)
+    .with_grants(lk_api.VideoGrants(room_join=True, room="room-1", can_publish=True, can_subscribe=True))
+    .with_room_config(lk_api.RoomConfiguration(agents=[lk_api.RoomAgentDispatch(agent_name="teacher-agent", metadata="browserteacher")]))
+    .to_jwt()
+  )
+  ours = _payload(minter.mint("learner-1", "room-1", now))
+  theirs = _payload(sdk_token)
+  for claims in (ours, theirs):
+    claims.pop("nbf")
+    claims.pop("exp")
+  assert ours == theirs
+
+
+def test_ttl(minter):
+  now = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+  claims = _payload(minter.mint("learner-1", "room-1", now))
+  assert claims["nbf"] == int(now.timestamp())
+  assert claims["exp"] - claims["nbf"] == int(DEFAULT_TTL.total_seconds())
+
+
+def test_wrong_secret_is_rejected(minter):
+  with pytest.raises(jwt.InvalidSignatureError):
+    lk_api.TokenVerifier(API_KEY, "another-secret-that-is-long-enough-too").verify(minter.mint("learner-1", "room-1"))
+
+
+def test_mint_many_keeps_pairs_apart(minter):
+  tokens = minter.mint_many([("learner-1", "room-1"), ("learner-2", "room-2")])
+  verifier = lk_api.TokenVerifier(API_KEY, API_SECRET)
+  assert [(c.identity, c.video.room) for c in map(verifier.verify, tokens)] == [("learner-1", "room-1"), ("learner-2", "room-2")]
+
+
+def test_identity_and_room_required(minter):
+  with pytest.raises(ValueError):
+    minter.mint("", "room-1")
+  with pytest.raises(ValueError):
+    minter.mint("learner-1", "")
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import openai
+import pytest
+from pydantic_ai.exceptions import ModelHTTPError
+
+from voice_bot.llm_scheduler import LLMOverloadedError, LLMScheduler, Priority, TokenBucket, retry_after
+
+
+def test_token_bucket_waits_for_refill():
+  bucket = TokenBucket(60)  # one token per second
+  t0 = time.monotonic()
+  assert bucket.wait_time(1, t0) == 0.0
+  bucket.take(60)
+  assert bucket.wait_time(1, t0) == pytest.approx(1.0)
+  assert bucket.wait_time(1, t0 + 0.5) == pytest.approx(0.5)
+  assert bucket.wait_time(1, t0 + 2.0) == 0.0
+
+
+def test_token_bucket_clamps_to_capacity():
+  bucket = TokenBucket(60)
+  t0 = time.monotonic()
+  bucket.wait_time(0, t0)
+  # An estimate larger than the bucket waits for a full bucket, not forever
+  assert bucket.wait_time(1000, t0) == 0.0
+  bucket.take(1000)
+  assert bucket.tokens == 0.0
+  assert bucket.wait_time(1000, t0 + 30.0) == pytest.approx(30.0)
+
+
+def test_token_bucket_adjust_and_drain():
+  bucket = TokenBucket(60)
+  t0 = time.monotonic()
+  bucket.wait_time(0, t0)
+  bucket.take(10)
+  # Actual usage above the estimate puts the bucket in debt
+  bucket.adjust(70)
+  assert bucket.tokens == -20.0
+  assert bucket.wait_time(1, t0) == pytest.approx(21.0)
+  bucket.adjust(-1000)
+  assert bucket.tokens == 60.0
+  bucket.drain()
+  assert bucket.tokens == 0.0
+
+
+async def _grant_order(requests: list[tuple[Priority, str, str]]) -> list[str]:
+  """Queue `requests` behind a held slot, then record the order they are granted in."""
+  scheduler = LLMScheduler(max_concurrency=1)
+  order: list[str] = []
+  gate = asyncio.Event()
+
+  async def hold() -> None:
+    async with scheduler.slot(priority=Priority.ACTION, room="holder"):
+      await gate.wait()
+
+  async def request(priority: Priority, room: str, label: str) -> None:
+    async with scheduler.slot(priority=priority, room=room):
+      order.append(label)
+
+  holder = asyncio.create_task(hold())
+  await asyncio.sleep(0)
+  tasks = []
+  for priority, room, label in requests:
+    tasks.append(asyncio.create_task(request(priority, room, label)))
+    await asyncio.sleep(0)
+  assert scheduler.queue_depth == len(requests)
+  gate.set()
+  await asyncio.gather(holder, *tasks)
+  return order
+
+
+def test_narration_is_granted_before_queued_actions():
+  order = asyncio.run(_grant_order([
+    (Priority.ACTION, "a", "action-a"),
+    (Priority.ACTION, "b", "action-b"),
+    (Priority.NARRATION, "c", "narration-c"),
+  ]))
+  assert order == ["narration-c", "action-a", "action-b"]
+
+
+def test_rooms_are_served_round_robin_within_a_priority():
+  order = asyncio.run(_grant_order([
+    (Priority.ACTION, "a", "a1"),
+    (Priority.ACTION, "a", "a2"),
+    (Priority.ACTION, "a", "a3"),
+    (Priority.ACTION, "b", "b1"),
+    (Priority.ACTION, "c", "c1"),
+  ]))
+  assert order == ["a1", "b1", "c1", "a2", "a3"]
+
+
+def test_actions_are_shed_before_narration():
+  async def run() -> None:
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=1, max_narration_queue_depth=2)
+    gate = asyncio.Event()
+
+    async def hold() -> None:
+      async with scheduler.slot(priority=Priority.ACTION, room="holder"):
+        await gate.wait()
+
+    async def request(priority: Priority) -> None:
+      async with scheduler.slot(priority=priority, room="r"):
+        pass
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(request(Priority.ACTION))
+    await asyncio.sleep(0)
+    with pytest.raises(LLMOverloadedError):
+      await request(Priority.ACTION)
+    narration = asyncio.create_task(request(Priority.NARRATION))
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth == 2
+    with pytest.raises(LLMOverloadedError):
+      await request(Priority.NARRATION)
+    gate.set()
+    await asyncio.gather(holder, queued, narration)
+    snap = scheduler.snapshot()
+    assert snap["action"]["rejected"] == 1
+    assert snap["narration"]["rejected"] == 1
+    assert snap["queued"] == 0 and snap["in_flight"] == 0
+
+  asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+  async def run() -> None:
+    scheduler = LLMScheduler(max_concurrency=1)
+    async with scheduler.slot(priority=Priority.ACTION, room="a"):
+      waiter = asyncio.create_task(scheduler.slot(priority=Priority.ACTION, room="b").__aenter__())
+      await asyncio.sleep(0)
+      assert scheduler.queue_depth == 1
+      waiter.cancel()
+      await asyncio.gather(waiter, return_exceptions=True)
+      assert scheduler.queue_depth == 0
+    assert scheduler.snapshot()["in_flight"] == 0
+
+  asyncio.run(run())
+
+
+def test_scheduler_survives_a_new_event_loop():
+  scheduler = LLMScheduler(requests_per_minute=60)
+
+  async def leave_timer_behind() -> None:
+    scheduler._requests.drain()
+    waiter = asyncio.create_task(scheduler.slot(priority=Priority.ACTION, room="a").__aenter__())
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+
+  async def admitted() -> bool:
+    scheduler._requests.tokens = scheduler._requests.capacity
+    async with scheduler.slot(priority=Priority.NARRATION, room="b"):
+      return True
+
+  asyncio.run(leave_timer_behind())
+  assert asyncio.run(asyncio.wait_for(admitted(), 5.0))
+
+
+def _rate_limited(headers: dict[str, str]) -> ModelHTTPError:
+  # What the OpenAI model raises: the SDK error, with the response headers, is the cause
+  request = httpx.Request("POST", "https://llm.invalid/v1/chat/completions")
+  error = ModelHTTPError(429, "test-model")
+  error.__cause__ = openai.RateLimitError("rate limited", response=httpx.Response(429, headers=headers, request=request), body=None)
+  return error
+
+
+def test_retry_after_headers():
+  assert retry_after(_rate_limited({"retry-after-ms": "1500"})) == pytest.approx(1.5)
+  assert retry_after(_rate_limited({"retry-after": "7"})) == pytest.approx(7.0)
+  when = datetime.now(timezone.utc) + timedelta(seconds=30)
+  assert retry_after(_rate_limited({"retry-after": format_datetime(when, usegmt=True)})) == pytest.approx(30.0, abs=1.5)
+  assert retry_after(_rate_limited({})) is None
+  assert retry_after(_rate_limited({"retry-after": "soon"})) is None
+  assert retry_after(ModelHTTPError(429, "test-model")) is None
@@ -0,0 +1,107 @@
+import os
+import time
+
+import pytest
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
+from pydantic_core import to_jsonable_python
+
+from voice_bot.room_log import _RECORD, _SEGMENT_HEADER, RoomLog, _room_dirname, encode_message
+
+
+def _payloads(n: int) -> list[bytes]:
+  messages = []
+  for i in range(n):
+    messages.append(ModelRequest(parts=[UserPromptPart(content=f"question {i}")]))
+    messages.append(ModelResponse(parts=[TextPart(content=f"answer {i}")]))
+  return [encode_message(m) for m in to_jsonable_python(messages)]
+
+
+def _segment(log: RoomLog, room_id: str) -> str:
+  segments = sorted((log.root / _room_dirname(room_id)).glob("*.seg"))
+  assert len(segments) == 1
+  return str(segments[0])
+
+
+def test_append_and_read_round_trip(tmp_path):
+  log = RoomLog(tmp_path)
+  payloads = _payloads(2)
+  assert log.append("room-1", [(i + 1, p) for i, p in enumerate(payloads)]) == 4
+  tail = RoomLog(tmp_path).read("room-1")
+  assert tail.last_seq == 4
+  assert tail.payloads == payloads
+  messages = tail.messages()
+  assert [m.parts[0].content for m in messages] == ["question 0", "answer 0", "question 1", "answer 1"]
+
+
+def test_unknown_room_is_empty(tmp_path):
+  log = RoomLog(tmp_path)
+  assert log.read("nobody").last_seq == -1
+  assert log.last_seq("nobody") == -1
+
+
+def test_seqs_must_increase(tmp_path):
+  log = RoomLog(tmp_path)
+  log.append("room-1", [(5, b"{}")])
+  with pytest.raises(ValueError):
+    log.append("room-1", [(5, b"{}")])
+
+
+def test_corrupt_record_truncates_the_tail(tmp_path):
+  log = RoomLog(tmp_path)
+  payloads = _payloads(2)
+  log.append("room-1", [(i + 1, p) for i, p in enumerate(payloads)])
+  path = _segment(log, "room-1")
+  # Flip a byte in the third payload: its crc no longer matches
+  offset = _SEGMENT_HEADER.size + sum(_RECORD.size + len(p) for p in payloads[:2]) + _RECORD.size
+  with open(path, "r+b") as f:
+    f.seek(offset)
+    byte = f.read(1)
+    f.seek(offset)
+    f.write(bytes([byte[0] ^ 0xFF]))
+
+  tail = RoomLog(tmp_path).read("room-1")
+  assert tail.last_seq == 2
+  assert tail.payloads == payloads[:2]
+  assert os.path.getsize(path) == offset - _RECORD.size
+
+
+def test_torn_write_is_cut_and_appends_continue(tmp_path):
+  log = RoomLog(tmp_path)
+  payloads = _payloads(2)
+  log.append("room-1", [(i + 1, p) for i, p in enumerate(payloads)])
+  path = _segment(log, "room-1")
+  # A crash mid-append leaves half a record behind
+  with open(path, "r+b") as f:
+    f.truncate(os.path.getsize(path) - len(payloads[-1]) // 2)
+
+  reopened = RoomLog(tmp_path)
+  assert reopened.last_seq("room-1") == 3
+  reopened.append("room-1", [(4, payloads[-1])])
+  tail = RoomLog(tmp_path).read("room-1")
+  assert tail.last_seq == 4
+  assert tail.payloads == payloads
+
+
+def test_segments_roll_over(tmp_path):
+  log = RoomLog(tmp_path, segment_bytes=256)
+  payloads = _payloads(10)
+  for i, p in enumerate(payloads):
+    log.append("room-1", [(i + 1, p)])
+  assert len(list((tmp_path / _room_dirname("room-1")).glob("*.seg"))) > 1
+  assert RoomLog(tmp_path).read("room-1").payloads == payloads
+
+
+def test_compact_drops_idle_rooms_only(tmp_path):
+  log = RoomLog(tmp_path, ttl_s=60)
+  log.append("idle", [(1, b"{}")])
+  log.append("active", [(7, b"{}")])
+  old = time.time() - 3600
+  for path in (tmp_path / _room_dirname("idle")).iterdir():
+    os.utime(path, (old, old))
+
+  assert log.compact() == 1
+  assert not (tmp_path / _room_dirname("idle")).exists()
+  assert log.last_seq("idle") == -1
+  # The active room keeps its cached seq and its data
+  assert log._last_seq["active"] == 7
+  assert log.read("active").last_seq == 7
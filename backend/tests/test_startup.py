@@ -0,0 +1,7 @@
+from voice_bot.bench.startup import WORKER_IMPORT_BUDGET_MS, run_phase
+
+
+def test_worker_import_within_budget():
+  result = run_phase("worker", runs=5, top=10)
+  slowest = [f"{r.module} {r.self_us / 1000:.1f} ms" for r in result.top]
+  assert result.import_median_ms <= WORKER_IMPORT_BUDGET_MS, slowest
@@ -0,0 +1,123 @@
+"""Next-step prefetch against the fake MCP server: turn latency with and without it.
+
+Each room gets a lesson plan whose steps each name a page. The learner works
+through the steps one turn at a time: the previous step is marked done, then
+the turn asks to open the current step's page. The fake navigate pays
+--page-load seconds on top of the MCP latency unless the page was prefetched.
+  off   PREFETCH_ENABLE=0
+  on    PREFETCH_ENABLE=1 (fake browserbase_prefetch tool, warmed between turns)
+
+  python -m voice_bot.bench.prefetch --rooms 4 --steps 5 --page-load 1.5 --think-time 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+
+import httpx
+
+from ..loadtest.fakes import FakeConfig, FakeStack
+from ..loadtest.runner import SimChatContext, run_turn
+
+
+def _plan(room_id: str, steps: int) -> dict:
+  return {
+    "title": "Bench lesson",
+    "description": "One page per step",
+    "goal": "bench",
+    "objective": "bench",
+    "steps": [
+      {
+        "id": f"step-{i}",
+        "order": i,
+        "done": False,
+        "conceptTitle": f"Concept {i}",
+        "description": f"Practise on https://site{i}.example/{room_id}/lesson.",
+        "objective": f"Finish exercise {i}",
+      }
+      for i in range(steps)
+    ],
+  }
+
+
+async def _room(stack: FakeStack, make_llm, room_id: str, steps: int, think_time: float) -> tuple[list[float], dict]:
+  session_id = f"sess-{room_id}"
+  plan = _plan(room_id, steps)
+  async with httpx.AsyncClient(timeout=30.0) as client:
+    r = await client.post(f"{stack.frontend_base}/api/lesson/plan", json={"sessionId": session_id, "plan": plan})
+    r.raise_for_status()
+    llm = make_llm()
+    ctx = SimChatContext(room=room_id)
+    turns: list[float] = []
+    try:
+      await llm.open(room_id)
+      for i, step in enumerate(plan["steps"]):
+        if i:
+          r = await client.post(f"{stack.frontend_base}/api/lesson/step", json={"sessionId": session_id, "stepId": f"step-{i - 1}", "done": True})
+          r.raise_for_status()
+        url = step["description"].split(" ")[-1].rstrip(".")
+        sample = await run_turn(llm, ctx, f"Open the page for step {i}: {url}")
+        if not sample.ok:
+          raise RuntimeError(sample.error)
+        turns.append(sample.turn_s)
+        await asyncio.sleep(think_time)
+    finally:
+      await llm.close()
+  return turns, llm._prefetcher.snapshot() if llm._prefetcher is not None else {}
+
+
+async def _bench(stack: FakeStack, mode: str, rooms: int, steps: int, think_time: float) -> None:
+  from ..pydantic_llm_adapter import PydanticAgentLLM
+
+  os.environ["PREFETCH_ENABLE"] = "1" if mode == "on" else "0"
+
+  def make_llm() -> PydanticAgentLLM:
+    return PydanticAgentLLM(openai_model="openai:gpt-4.1-mini", mcp_url=stack.mcp_url)
+
+  results = await asyncio.gather(*(_room(stack, make_llm, f"bench-{mode}-{i}", steps, think_time) for i in range(rooms)))
+  # The first turn of a room has nothing to prefetch yet
+  turns = [t for room_turns, _ in results for t in room_turns[1:]]
+  print(f"{mode:<4} {statistics.median(turns) * 1000:>10.0f} {statistics.mean(turns) * 1000:>10.0f} {max(turns) * 1000:>10.0f}")
+  totals: dict = {}
+  for _, snap in results:
+    for k, v in snap.items():
+      if isinstance(v, int) and not isinstance(v, bool):
+        totals[k] = totals.get(k, 0) + v
+  if totals:
+    hit_p50 = statistics.median(s["hit_p50_ms"] for _, s in results)
+    miss_p50 = statistics.median(s["miss_p50_ms"] for _, s in results)
+    print(f"     prefetch: {totals}  hit p50 {hit_p50:.0f} ms  miss p50 {miss_p50:.0f} ms  saved {sum(s['time_saved_s'] for _, s in results):.1f} s")
+
+
+def main() -> None:
+  p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  p.add_argument("--rooms", type=int, default=4)
+  p.add_argument("--steps", type=int, default=5)
+  p.add_argument("--page-load", type=float, default=1.5, help="cold page load added to navigate, seconds")
+  p.add_argument("--think-time", type=float, default=3.0, help="idle time between turns, seconds")
+  p.add_argument("--max-concurrency", type=int, default=2)
+  p.add_argument("--lookahead", type=int, default=1)
+  p.add_argument("--max-urls", type=int, default=3)
+  args = p.parse_args()
+
+  cfg = FakeConfig(llm_latency=0.2, llm_jitter=0.1, mcp_latency=0.1, mcp_jitter=0.05, page_load_latency=args.page_load, tool_calls_per_action=1)
+  with FakeStack(cfg) as stack:
+    os.environ["OPENAI_BASE_URL"] = stack.llm_base_url
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["FRONTEND_API_BASE"] = stack.frontend_base
+    os.environ.setdefault("LOGFIRE_ENABLE", "0")
+    os.environ.setdefault("ROOM_LOG_DIR", tempfile.mkdtemp(prefix="bench-prefetch-"))
+    os.environ["PREFETCH_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    os.environ["PREFETCH_LOOKAHEAD"] = str(args.lookahead)
+    os.environ["PREFETCH_MAX_URLS"] = str(args.max_urls)
+    print(f"{'mode':<4} {'turn p50':>10} {'mean ms':>10} {'max ms':>10}")
+    for mode in ("off", "on"):
+      asyncio.run(_bench(stack, mode, args.rooms, args.steps, args.think_time))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,113 @@
+"""Overhead of the loop profiler on a worker-like event loop.
+
+The workload validates a Pydantic AI history (CPU in the loop) between short
+sleeps (I/O waits), and counts iterations over a fixed time in three modes:
+  off       profiler not attached
+  watchdog  stall watchdog only (what every turn pays when PROFILE_ENABLE=1)
+  sampler   watchdog + sampler forced on for the whole run (a slow turn)
+A final run blocks the loop once to check the watchdog catches the stall.
+
+  python -m voice_bot.bench.profiler --seconds 5 --rounds 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from pydantic_ai.messages import ModelMessagesTypeAdapter
+
+from ..profiler import LoopProfiler, thread_stack
+from .room_log import _messages
+
+
+async def _workload(seconds: float, history: list) -> int:
+  iterations = 0
+  deadline = time.monotonic() + seconds
+  while time.monotonic() < deadline:
+    ModelMessagesTypeAdapter.validate_python(history)
+    await asyncio.sleep(0.001)
+    iterations += 1
+  return iterations
+
+
+async def _run(mode: str, seconds: float, history: list, out_dir: str, sample_interval_ms: float) -> tuple[int, dict]:
+  if mode == "off":
+    return await _workload(seconds, history), {}
+  profiler = LoopProfiler(out_dir, stall_ms=100, slow_turn_ms=0 if mode == "sampler" else 1e9, sample_interval_ms=sample_interval_ms)
+  profiler.attach()
+  try:
+    async with profiler.turn("bench"):
+      await asyncio.sleep(0.01)  # let the slow-turn timer fire
+      iterations = await _workload(seconds, history)
+  finally:
+    await profiler.aclose()
+  return iterations, profiler.snapshot()
+
+
+def _sample_cost_us(depth: int = 60, n: int = 2000) -> float:
+  """Cost of one stack sample of a thread `depth` frames deep; the GIL is held throughout."""
+  ready = threading.Event()
+  done = threading.Event()
+
+  def _deep(k: int) -> None:
+    if k:
+      return _deep(k - 1)
+    ready.set()
+    done.wait()
+
+  thread = threading.Thread(target=_deep, args=(depth,), daemon=True)
+  thread.start()
+  ready.wait()
+  t0 = time.perf_counter()
+  for _ in range(n):
+    thread_stack(thread.ident or 0)
+  cost = (time.perf_counter() - t0) / n * 1e6
+  done.set()
+  return cost
+
+
+async def _stall_check(out_dir: str) -> dict:
+  profiler = LoopProfiler(out_dir, stall_ms=100)
+  profiler.attach(room_id="bench")
+  await asyncio.sleep(0.1)
+  time.sleep(0.3)  # block the loop on purpose
+  await asyncio.sleep(0.2)
+  await profiler.aclose()
+  return profiler.snapshot()
+
+
+def main() -> None:
+  p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  p.add_argument("--seconds", type=float, default=5.0)
+  p.add_argument("--rounds", type=int, default=3)
+  p.add_argument("--history", type=int, default=40, help="messages validated per iteration")
+  p.add_argument("--sample-interval-ms", type=float, default=5.0)
+  args = p.parse_args()
+
+  history = _messages(args.history)
+  out_dir = tempfile.mkdtemp(prefix="bench-profiler-")
+  results: dict[str, list[int]] = {"off": [], "watchdog": [], "sampler": []}
+  # Interleave modes so drift (thermal, noisy neighbours) hits them equally
+  for _ in range(args.rounds):
+    for mode in results:
+      iterations, snap = asyncio.run(_run(mode, args.seconds, history, out_dir, args.sample_interval_ms))
+      results[mode].append(iterations)
+
+  base = statistics.median(results["off"])
+  for mode, values in results.items():
+    med = statistics.median(values)
+    print(f"{mode:<9} {med / args.seconds:>9.0f} it/s   overhead {(1 - med / base) * 100:>5.1f}%")
+  cost = _sample_cost_us()
+  print(f"one sample of a 60-frame stack: {cost:.1f} us -> {cost / (args.sample_interval_ms * 10):.2f}% of the loop thread at {args.sample_interval_ms:g} ms")
+  print(f"stall check: {asyncio.run(_stall_check(out_dir))}")
+  print(f"profiles in {out_dir}: {sorted(os.listdir(os.path.join(out_dir, 'bench')))[:4]}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,108 @@
+"""Room history resume benchmark: local append log vs. fetching from the frontend.
+
+Seeds a fake frontend with N messages per room, then times what a fresh
+`PydanticAgentLLM` pays for its first history read:
+  remote   GET /api/messages/history_json + validate (log disabled)
+  cold     log empty on this node: full history_since fetch, written to the log
+  local    log present: mmap read + one validate_json + empty history_since check
+
+  python -m voice_bot.bench.room_log --sizes 1000,10000 --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import httpx
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, ToolCallPart, ToolReturnPart, UserPromptPart
+from pydantic_core import to_jsonable_python
+
+from ..loadtest.fakes import FakeConfig, FakeStack
+
+
+def _messages(n: int) -> list:
+  # Turn-shaped history: prompt, tool call, tool return, summary
+  out: list = []
+  i = 0
+  while len(out) < n:
+    call_id = f"call_{i}"
+    out += [
+      ModelRequest(parts=[UserPromptPart(content=f"User request: open the flexbox example {i} and highlight the container")]),
+      ModelResponse(parts=[ToolCallPart(tool_name="browserbase_stagehand_navigate", args={"url": f"https://example.com/{i}", "sessionId": "bb-1"}, tool_call_id=call_id)], model_name="gpt-4.1-mini"),
+      ModelRequest(parts=[ToolReturnPart(tool_name="browserbase_stagehand_navigate", content=f"navigated to https://example.com/{i}", tool_call_id=call_id)]),
+      ModelResponse(parts=[TextPart(content="I opened the example and highlighted the flex container for you.")], model_name="gpt-4.1-mini"),
+    ]
+    i += 1
+  return to_jsonable_python(out[:n])
+
+
+async def _time_load(make_llm, room_id: str) -> tuple[float, int]:
+  llm = make_llm()
+  t0 = time.perf_counter()
+  history = await llm._load_history(room_id)
+  return time.perf_counter() - t0, len(history)
+
+
+async def _bench(stack: FakeStack, sizes: list[int], runs: int) -> None:
+  from ..pydantic_llm_adapter import PydanticAgentLLM
+  from ..room_log import get_room_log
+
+  def make_llm(log_enabled: bool = True) -> PydanticAgentLLM:
+    llm = PydanticAgentLLM(openai_model="openai:gpt-4.1-mini", mcp_url="")
+    if not log_enabled:
+      llm._room_log = None
+    return llm
+
+  print(f"{'messages':>9} {'scenario':<8} {'p50 ms':>9} {'min ms':>9}")
+  for n in sizes:
+    room_id = f"bench-{n}"
+    async with httpx.AsyncClient(timeout=120.0) as client:
+      r = await client.post(f"{stack.frontend_base}/api/messages/append_json", json={"roomId": room_id, "messagesJson": _messages(n)})
+      r.raise_for_status()
+
+    results: dict[str, list[float]] = {"remote": [], "cold": [], "local": []}
+    for _ in range(runs):
+      elapsed, count = await _time_load(lambda: make_llm(False), room_id)
+      assert count == n, count
+      results["remote"].append(elapsed)
+
+      get_room_log().drop(room_id)
+      elapsed, count = await _time_load(make_llm, room_id)
+      assert count == n, count
+      results["cold"].append(elapsed)
+
+      elapsed, count = await _time_load(make_llm, room_id)
+      assert count == n, count
+      results["local"].append(elapsed)
+
+    for scenario, values in results.items():
+      print(f"{n:>9} {scenario:<8} {statistics.median(values) * 1000:>9.1f} {min(values) * 1000:>9.1f}")
+
+
+def main() -> None:
+  p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  p.add_argument("--sizes", default="1000,10000")
+  p.add_argument("--runs", type=int, default=5)
+  p.add_argument("--frontend-latency", type=float, default=0.0, help="added per frontend request, seconds")
+  args = p.parse_args()
+
+  log_dir = tempfile.mkdtemp(prefix="bench-room-log-")
+  with FakeStack(FakeConfig(frontend_latency=args.frontend_latency)) as stack:
+    os.environ["FRONTEND_API_BASE"] = stack.frontend_base
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["ROOM_LOG_DIR"] = log_dir
+    os.environ.setdefault("LOGFIRE_ENABLE", "0")
+    try:
+      asyncio.run(_bench(stack, [int(s) for s in args.sizes.split(",") if s.strip()], args.runs))
+    finally:
+      shutil.rmtree(log_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+  main()
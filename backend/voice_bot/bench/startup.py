@@ -0,0 +1,150 @@
+"""Worker cold-start benchmark with an import-time budget.
+
+Each phase runs in a fresh interpreter under `-X importtime`:
+  worker   import of voice_bot.worker (what every job process pays)
+  plugins  worker + the configured plugins (what the supervisor pays)
+  prewarm  worker + prewarm() (VAD and turn-detector files loaded in parallel)
+
+  python -m voice_bot.bench.startup --runs 5 --budget-ms 1200
+  python -m voice_bot.bench.startup --top 25 --json startup.json
+
+Exits non-zero when the median worker import exceeds the budget
+(WORKER_IMPORT_BUDGET_MS, default 1200); tests/test_startup.py runs the same
+check under pytest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Max median import time of voice_bot.worker
+WORKER_IMPORT_BUDGET_MS = float(os.getenv("WORKER_IMPORT_BUDGET_MS", "1200"))
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+_PHASES = {
+  "worker": "import voice_bot.worker",
+  "plugins": "import voice_bot.worker as w; w.import_plugins()",
+  "prewarm": (
+    "import types, time, voice_bot.worker as w; t0 = time.perf_counter(); "
+    "w.prewarm(types.SimpleNamespace(userdata={})); "
+    "print(f'prewarm_s={time.perf_counter() - t0:.6f}')"
+  ),
+}
+
+
+@dataclass
+class ImportRecord:
+  module: str
+  self_us: int
+  cumulative_us: int
+  depth: int
+
+
+@dataclass
+class PhaseResult:
+  phase: str
+  import_ms: list[float] = field(default_factory=list)
+  wall_ms: list[float] = field(default_factory=list)
+  prewarm_ms: list[float] = field(default_factory=list)
+  top: list[ImportRecord] = field(default_factory=list)
+
+  @property
+  def import_median_ms(self) -> float:
+    return statistics.median(self.import_ms) if self.import_ms else 0.0
+
+  @property
+  def wall_median_ms(self) -> float:
+    return statistics.median(self.wall_ms) if self.wall_ms else 0.0
+
+
+def parse_importtime(stderr: str) -> list[ImportRecord]:
+  """Parse `-X importtime` output; depth 0 records are top-level imports."""
+  records: list[ImportRecord] = []
+  for line in stderr.splitlines():
+    m = _LINE.match(line)
+    if m is None:
+      continue
+    self_us, cumulative_us, indent, module = m.groups()
+    records.append(ImportRecord(module=module.strip(), self_us=int(self_us), cumulative_us=int(cumulative_us), depth=len(indent) // 2))
+  return records
+
+
+def total_import_us(records: list[ImportRecord]) -> int:
+  return sum(r.cumulative_us for r in records if r.depth == 0)
+
+
+def run_phase(phase: str, runs: int = 5, top: int = 15) -> PhaseResult:
+  env = dict(os.environ)
+  env.setdefault("LOGFIRE_ENABLE", "0")
+  result = PhaseResult(phase=phase)
+  for _ in range(runs):
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+      [sys.executable, "-X", "importtime", "-c", _PHASES[phase]],
+      cwd=BACKEND_DIR,
+      env=env,
+      capture_output=True,
+      text=True,
+    )
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+      tail = "\n".join(l for l in proc.stderr.splitlines() if not l.startswith("import time:"))[-2000:]
+      raise RuntimeError(f"{phase} phase failed:\n{tail}")
+    records = parse_importtime(proc.stderr)
+    result.import_ms.append(total_import_us(records) / 1000.0)
+    result.wall_ms.append(wall * 1000.0)
+    for line in proc.stdout.splitlines():
+      if line.startswith("prewarm_s="):
+        result.prewarm_ms.append(float(line.split("=", 1)[1]) * 1000.0)
+    if not result.top:
+      result.top = sorted(records, key=lambda r: r.self_us, reverse=True)[:top]
+  return result
+
+
+def main() -> None:
+  p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  p.add_argument("--runs", type=int, default=5)
+  p.add_argument("--phases", default="worker,plugins,prewarm")
+  p.add_argument("--top", type=int, default=15, help="slowest modules (self time) to list per phase")
+  p.add_argument("--budget-ms", type=float, default=WORKER_IMPORT_BUDGET_MS, help="max median import time of voice_bot.worker")
+  p.add_argument("--json", help="write phase results to this file")
+  args = p.parse_args()
+
+  results: list[PhaseResult] = []
+  for phase in [ph.strip() for ph in args.phases.split(",") if ph.strip()]:
+    res = run_phase(phase, args.runs, args.top)
+    results.append(res)
+    line = f"{phase:<8} import p50 {res.import_median_ms:>8.1f} ms   process p50 {res.wall_median_ms:>8.1f} ms"
+    if res.prewarm_ms:
+      line += f"   prewarm p50 {statistics.median(res.prewarm_ms):>8.1f} ms"
+    print(line)
+    for r in res.top:
+      print(f"           {r.self_us / 1000:>8.1f} ms self {r.cumulative_us / 1000:>9.1f} ms cum  {r.module}")
+
+  if args.json:
+    with open(args.json, "w") as f:
+      json.dump([{**asdict(r), "import_median_ms": r.import_median_ms, "wall_median_ms": r.wall_median_ms} for r in results], f, indent=2)
+
+  worker = next((r for r in results if r.phase == "worker"), None)
+  if worker is not None and args.budget_ms > 0:
+    ok = worker.import_median_ms <= args.budget_ms
+    print(f"budget: worker import {worker.import_median_ms:.1f} ms / {args.budget_ms:.0f} ms -> {'ok' if ok else 'OVER BUDGET'}")
+    if not ok:
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
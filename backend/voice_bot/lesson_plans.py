@@ -0,0 +1,294 @@
+"""Reusable lesson-plan templates keyed by a normalized learning goal.
+
+Plans the agent generates are stored as templates (no step ids, progress or
+learner objective). A later learner with the same goal gets a copy with fresh
+step ids in one tool call instead of a full plan generation on the first turn.
+
+Lookup is an exact match on the normalized goal ("Teach me CSS flexbox!" and
+"flexbox in css" both become "css flexbox"), then a nearest-neighbour search
+over goal embeddings. The default embedder hashes character n-grams into sparse
+vectors and needs no model; set LESSON_PLAN_EMBED_MODEL to use a local
+sentence-transformers model.
+
+Templates are JSON files under LESSON_PLAN_CACHE_DIR so every job process on a
+node shares them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import math
+import uuid
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Protocol
+
+from .schemas import LessonPlan, LessonStep
+
+
+log = logging.getLogger("agent")
+
+# Request phrasing in front of the subject; only stripped at the start so
+# subject words like "learning" in "machine learning" are kept
+_LEADING_FILLER = re.compile(
+  r"^(?:[\s,.!?]*(?:please|can you|could you|i want to learn|i'd like to learn|i would like to learn|i want to understand|"
+  r"help me (?:learn|understand)|teach me|show me|explain|learn|how to|how do i)\b)+"
+)
+_STOPWORDS = frozenset("a an and the of in on for to with using use me my i we our is are be it this that".split())
+_TOKEN = re.compile(r"[a-z0-9+#]+")
+
+
+def _singular(tok: str) -> str:
+  if len(tok) <= 4 or not tok.endswith("s") or tok.endswith("ss"):
+    return tok
+  if tok.endswith("ies"):
+    return tok[:-3] + "y"
+  if tok.endswith(("ches", "shes", "xes", "sses")):
+    return tok[:-2]
+  return tok[:-1]
+
+
+def normalize_goal(goal: str) -> str:
+  """Lowercase, drop leading request phrasing and stopwords, singularize, sort tokens."""
+  text = _LEADING_FILLER.sub(" ", goal.lower().strip())
+  tokens = set()
+  for tok in _TOKEN.findall(text):
+    if tok in _STOPWORDS:
+      continue
+    tokens.add(_singular(tok))
+  return " ".join(sorted(tokens))
+
+
+# Sparse unit vector: dimension -> weight
+Vector = dict[int, float]
+
+
+def _unit(vec: Vector) -> Vector:
+  norm = math.sqrt(sum(v * v for v in vec.values()))
+  return {i: v / norm for i, v in vec.items()} if norm > 0 else vec
+
+
+def cosine(a: Vector, b: Vector) -> float:
+  if len(a) > len(b):
+    a, b = b, a
+  return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+
+class GoalEmbedder(Protocol):
+  name: str
+
+  def embed(self, texts: list[str]) -> list[Vector]: ...
+
+
+class HashingEmbedder:
+  """Character n-gram feature hashing; unit vectors, no model download."""
+
+  def __init__(self, dims: int = 512, ngram: int = 3) -> None:
+    self.dims = dims
+    self.ngram = ngram
+    self.name = f"hash-{ngram}g-{dims}"
+
+  def embed(self, texts: list[str]) -> list[Vector]:
+    out = []
+    for text in texts:
+      vec: Vector = {}
+      padded = f" {text} "
+      for i in range(max(len(padded) - self.ngram + 1, 1)):
+        h = int.from_bytes(hashlib.blake2b(padded[i:i + self.ngram].encode(), digest_size=4).digest(), "little")
+        vec[h % self.dims] = vec.get(h % self.dims, 0.0) + 1.0
+      out.append(_unit(vec))
+    return out
+
+
+class SentenceTransformerEmbedder:
+  def __init__(self, model: str) -> None:
+    from sentence_transformers import SentenceTransformer
+
+    self._model = SentenceTransformer(model)
+    self.name = f"st-{model}"
+
+  def embed(self, texts: list[str]) -> list[Vector]:
+    return [dict(enumerate(row)) for row in self._model.encode(texts, normalize_embeddings=True).tolist()]
+
+
+def build_embedder() -> GoalEmbedder:
+  model = os.getenv("LESSON_PLAN_EMBED_MODEL", "")
+  if model:
+    try:
+      return SentenceTransformerEmbedder(model)
+    except Exception as e:
+      log.warning("lesson plan embedder unavailable, using hashing embedder", extra={"model": model, "error": str(e)})
+  return HashingEmbedder()
+
+
+@dataclass
+class PlanTemplate:
+  key: str
+  goal: str
+  plan: dict[str, Any]
+  generation_s: float = 0.0
+  created_at: float = field(default_factory=time.time)
+  uses: int = 0
+
+
+@dataclass
+class TemplateMatch:
+  template: PlanTemplate
+  score: float
+  exact: bool
+
+
+@dataclass
+class PlanCacheStats:
+  exact_hits: int = 0
+  similar_hits: int = 0
+  misses: int = 0
+  stored: int = 0
+  time_saved_s: float = 0.0
+  output_tokens_saved: int = 0
+
+  def snapshot(self) -> dict[str, Any]:
+    lookups = self.exact_hits + self.similar_hits + self.misses
+    return {
+      "exact_hits": self.exact_hits,
+      "similar_hits": self.similar_hits,
+      "misses": self.misses,
+      "hit_rate": round((self.exact_hits + self.similar_hits) / lookups, 3) if lookups else 0.0,
+      "stored": self.stored,
+      "time_saved_s": round(self.time_saved_s, 2),
+      "output_tokens_saved": self.output_tokens_saved,
+    }
+
+
+def template_from_plan(plan: LessonPlan) -> dict[str, Any]:
+  """Strip learner-specific state: ids, progress and the learner's own objective."""
+  steps = sorted(plan.steps, key=lambda s: s.order)
+  return {
+    "title": plan.title,
+    "description": plan.description,
+    "goal": plan.goal,
+    "objective": plan.objective,
+    "steps": [{"conceptTitle": s.conceptTitle, "description": s.description, "objective": s.objective} for s in steps],
+  }
+
+
+def instantiate(template: PlanTemplate, goal: str, user_objective: str | None = None) -> LessonPlan:
+  steps = [
+    LessonStep(id=f"step-{uuid.uuid4().hex[:8]}", order=i, done=False, **step)
+    for i, step in enumerate(template.plan["steps"])
+  ]
+  return LessonPlan(
+    title=template.plan["title"],
+    description=template.plan["description"],
+    goal=goal or template.plan["goal"],
+    objective=template.plan["objective"],
+    userObjective=user_objective or None,
+    steps=steps,
+  )
+
+
+class LessonPlanCache:
+  """Template store on disk with an in-memory similarity index, refreshed when the directory changes."""
+
+  def __init__(self, root: str | Path, *, embedder: GoalEmbedder | None = None, min_similarity: float = 0.85, max_templates: int = 2000) -> None:
+    self.root = Path(root)
+    self.root.mkdir(parents=True, exist_ok=True)
+    self.embedder = embedder or HashingEmbedder()
+    self.min_similarity = min_similarity
+    self.max_templates = max_templates
+    self.stats = PlanCacheStats()
+    self._lock = threading.Lock()
+    self._templates: dict[str, PlanTemplate] = {}
+    self._keys: list[str] = []
+    self._vectors: list[Vector] = []
+    self._loaded_mtime = -1.0
+
+  def _path(self, key: str) -> Path:
+    return self.root / f"{hashlib.sha1(key.encode()).hexdigest()[:16]}.json"
+
+  def _refresh(self) -> None:
+    mtime = self.root.stat().st_mtime
+    if mtime == self._loaded_mtime:
+      return
+    templates: dict[str, PlanTemplate] = {}
+    for path in self.root.glob("*.json"):
+      try:
+        data = json.loads(path.read_text())
+        templates[data["key"]] = PlanTemplate(**data)
+      except (OSError, ValueError, KeyError, TypeError):
+        continue
+    self._templates = templates
+    self._keys = list(templates)
+    self._vectors = self.embedder.embed(self._keys) if self._keys else []
+    self._loaded_mtime = mtime
+
+  def lookup(self, goal: str) -> TemplateMatch | None:
+    key = normalize_goal(goal)
+    if not key:
+      return None
+    with self._lock:
+      self._refresh()
+      template = self._templates.get(key)
+      if template is not None:
+        return TemplateMatch(template=template, score=1.0, exact=True)
+      if not self._keys:
+        return None
+      query = self.embedder.embed([key])[0]
+      score, best = max((cosine(query, vec), i) for i, vec in enumerate(self._vectors))
+      if score < self.min_similarity:
+        return None
+      return TemplateMatch(template=self._templates[self._keys[best]], score=score, exact=False)
+
+  def record_hit(self, match: TemplateMatch, instantiate_s: float) -> None:
+    if match.exact:
+      self.stats.exact_hits += 1
+    else:
+      self.stats.similar_hits += 1
+    match.template.uses += 1
+    self.stats.time_saved_s += max(match.template.generation_s - instantiate_s, 0.0)
+    # Rough chars-per-token estimate of the plan JSON the model did not have to write
+    self.stats.output_tokens_saved += len(json.dumps(match.template.plan)) // 4
+
+  def record_miss(self) -> None:
+    self.stats.misses += 1
+
+  def store(self, plan: LessonPlan, goal: str | None = None, generation_s: float = 0.0) -> PlanTemplate | None:
+    key = normalize_goal(goal or plan.goal)
+    if not key or not plan.steps:
+      return None
+    template = PlanTemplate(key=key, goal=goal or plan.goal, plan=template_from_plan(plan), generation_s=generation_s)
+    with self._lock:
+      self._refresh()
+      if key not in self._templates and len(self._templates) >= self.max_templates:
+        return None
+      # Atomic replace so concurrent job processes never read a partial file
+      tmp = self.root / f".{uuid.uuid4().hex}.tmp"
+      tmp.write_text(json.dumps(template.__dict__))
+      os.replace(tmp, self._path(key))
+      self.stats.stored += 1
+    log.info("stored lesson plan template", extra={"key": key, "steps": len(plan.steps), "generation_s": round(generation_s, 2)})
+    return template
+
+  def snapshot(self) -> dict[str, Any]:
+    return {**self.stats.snapshot(), "templates": len(self._templates), "embedder": self.embedder.name}
+
+
+def lesson_plan_cache_enabled() -> bool:
+  return os.getenv("LESSON_PLAN_CACHE_ENABLE", "1").lower() in ("1", "true", "yes")
+
+
+@lru_cache()
+def get_lesson_plan_cache() -> LessonPlanCache:
+  return LessonPlanCache(
+    os.getenv("LESSON_PLAN_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "browserteacher-lesson-plans"),
+    embedder=build_embedder(),
+    min_similarity=float(os.getenv("LESSON_PLAN_MIN_SIMILARITY", "0.85")),
+  )
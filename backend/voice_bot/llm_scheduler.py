@@ -0,0 +1,424 @@
+"""Process-wide scheduler for LLM calls made by every room in a worker.
+
+All `PydanticAgentLLM` instances in a worker process share one scheduler. Model
+calls are admitted through token buckets (requests and tokens per minute) in
+priority order (narration > action), round-robin across rooms within a
+priority, so a busy room cannot starve the others and tool work never delays
+what the learner is waiting to hear.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from email.utils import parsedate_to_datetime
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, AsyncIterator, Coroutine, TypeVar
+
+import httpx
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import KnownModelName, Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+
+log = logging.getLogger("agent")
+
+T = TypeVar("T")
+
+# Room of the turn currently being served; set by room_task, read by ScheduledModel
+current_room: contextvars.ContextVar[str] = contextvars.ContextVar("llm_room", default="")
+
+
+def room_task(room: str, coro: Coroutine[Any, Any, T]) -> asyncio.Task[T]:
+  """Run `coro` as a task whose own context has `current_room` set to `room`."""
+  context = contextvars.copy_context()
+  context.run(current_room.set, room)
+  return asyncio.create_task(coro, context=context)
+
+
+class Priority(IntEnum):
+  NARRATION = 0
+  ACTION = 1
+
+
+class LLMOverloadedError(RuntimeError):
+  """Raised when a request is shed because the queue is too deep."""
+
+
+class TokenBucket:
+  def __init__(self, per_minute: float) -> None:
+    self.capacity = float(per_minute)
+    self.rate = float(per_minute) / 60.0
+    self.tokens = self.capacity
+    self._updated = time.monotonic()
+
+  def _refill(self, now: float) -> None:
+    self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+    self._updated = now
+
+  def wait_time(self, amount: float, now: float) -> float:
+    self._refill(now)
+    amount = min(amount, self.capacity)
+    if self.tokens >= amount:
+      return 0.0
+    return (amount - self.tokens) / self.rate
+
+  def take(self, amount: float) -> None:
+    self.tokens -= min(amount, self.capacity)
+
+  def adjust(self, delta: float) -> None:
+    # Reconcile an estimate with actual usage; may leave the bucket in debt
+    self.tokens = min(self.capacity, self.tokens - delta)
+
+  def drain(self) -> None:
+    self.tokens = min(self.tokens, 0.0)
+
+
+@dataclass
+class _Waiter:
+  priority: Priority
+  room: str
+  tokens: int
+  future: asyncio.Future
+  enqueued_at: float
+
+
+@dataclass
+class Lease:
+  priority: Priority
+  room: str
+  estimated_tokens: int
+  queue_wait: float
+  used_tokens: int | None = None
+
+
+@dataclass
+class _PriorityStats:
+  waits: deque = field(default_factory=lambda: deque(maxlen=2048))
+  granted: int = 0
+  rejected: int = 0
+
+
+def _pct(values: list[float], pct: float) -> float:
+  if not values:
+    return 0.0
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100.0)))]
+
+
+class LLMScheduler:
+  """Admission control for LLM requests; a value of 0 disables a limit.
+
+  Action requests are shed once `max_queue_depth` requests are queued.
+  Narration keeps queueing past that, since the learner is waiting for it,
+  up to `max_narration_queue_depth`.
+
+  Queue state belongs to the event loop that created it. The scheduler is
+  process-wide and outlives loops (benchmarks call asyncio.run per phase), so
+  the first request on a new loop drops what an earlier loop left behind.
+  """
+
+  def __init__(
+    self,
+    *,
+    requests_per_minute: int = 0,
+    tokens_per_minute: int = 0,
+    max_concurrency: int = 0,
+    max_queue_depth: int = 0,
+    max_narration_queue_depth: int = 0,
+  ) -> None:
+    self._requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+    self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+    self.max_concurrency = max_concurrency
+    self.max_queue_depth = max_queue_depth
+    self.max_narration_queue_depth = max_narration_queue_depth
+    self._loop: asyncio.AbstractEventLoop | None = None
+    self._queues: dict[Priority, OrderedDict[str, deque[_Waiter]]] = {p: OrderedDict() for p in Priority}
+    self._queued = 0
+    self._in_flight = 0
+    self._paused_until = 0.0
+    self._timer: asyncio.TimerHandle | None = None
+    self._stats: dict[Priority, _PriorityStats] = {p: _PriorityStats() for p in Priority}
+    self._rate_limited = 0
+
+  @property
+  def queue_depth(self) -> int:
+    return self._queued
+
+  def _bind_loop(self) -> asyncio.AbstractEventLoop:
+    loop = asyncio.get_running_loop()
+    if self._loop is not loop:
+      # Waiters, slots and the timer of a previous loop belong to tasks that no longer run
+      self._loop = loop
+      self._queues = {p: OrderedDict() for p in Priority}
+      self._queued = 0
+      self._in_flight = 0
+      self._timer = None
+    return loop
+
+  def _enqueue(self, priority: Priority, room: str, tokens: int) -> _Waiter:
+    loop = self._bind_loop()
+    limit = self.max_narration_queue_depth if priority == Priority.NARRATION else self.max_queue_depth
+    if limit and self._queued >= limit:
+      self._stats[priority].rejected += 1
+      raise LLMOverloadedError(f"LLM queue depth {self._queued} exceeds {limit}")
+    waiter = _Waiter(priority, room, tokens, loop.create_future(), time.monotonic())
+    self._queues[priority].setdefault(room, deque()).append(waiter)
+    self._queued += 1
+    return waiter
+
+  def _remove(self, waiter: _Waiter) -> None:
+    rooms = self._queues[waiter.priority]
+    q = rooms.get(waiter.room)
+    if q is None or waiter not in q:
+      return
+    q.remove(waiter)
+    self._queued -= 1
+    if not q:
+      del rooms[waiter.room]
+
+  def _head(self) -> _Waiter | None:
+    for priority in Priority:
+      rooms = self._queues[priority]
+      if rooms:
+        return rooms[next(iter(rooms))][0]
+    return None
+
+  def _pop_head(self, waiter: _Waiter) -> None:
+    rooms = self._queues[waiter.priority]
+    q = rooms.pop(waiter.room)
+    q.popleft()
+    self._queued -= 1
+    if q:
+      # Rotate the room to the back for per-room round-robin
+      rooms[waiter.room] = q
+
+  def _pump(self) -> None:
+    self._timer = None
+    while True:
+      waiter = self._head()
+      if waiter is None:
+        return
+      if waiter.future.done():
+        self._pop_head(waiter)
+        continue
+      if self.max_concurrency and self._in_flight >= self.max_concurrency:
+        return  # released slots pump again
+      now = time.monotonic()
+      # Strict priority: the head waits for capacity rather than letting lower priorities jump ahead
+      delay = max(
+        self._paused_until - now,
+        self._requests.wait_time(1, now) if self._requests else 0.0,
+        self._tokens.wait_time(waiter.tokens, now) if self._tokens else 0.0,
+      )
+      if delay > 0:
+        self._schedule(delay)
+        return
+      self._pop_head(waiter)
+      if self._requests:
+        self._requests.take(1)
+      if self._tokens:
+        self._tokens.take(waiter.tokens)
+      self._in_flight += 1
+      waiter.future.set_result(now - waiter.enqueued_at)
+
+  def _schedule(self, delay: float) -> None:
+    if self._timer is not None:
+      return
+    self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+
+  def _release(self, lease: Lease) -> None:
+    self._in_flight -= 1
+    if self._tokens and lease.used_tokens is not None:
+      self._tokens.adjust(lease.used_tokens - lease.estimated_tokens)
+    self._pump()
+
+  def penalize(self, retry_after: float) -> None:
+    """Pause all admissions after the provider rate-limited us."""
+    self._rate_limited += 1
+    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+    if self._requests:
+      self._requests.drain()
+
+  @asynccontextmanager
+  async def slot(self, *, priority: Priority, room: str = "", tokens: int = 0) -> AsyncIterator[Lease]:
+    waiter = self._enqueue(priority, room, tokens)
+    self._pump()
+    try:
+      queue_wait = await waiter.future
+    except asyncio.CancelledError:
+      if waiter.future.done() and not waiter.future.cancelled():
+        # Granted just before cancellation; give the slot back
+        self._release(Lease(priority, room, tokens, 0.0))
+      else:
+        self._remove(waiter)
+      raise
+    stats = self._stats[priority]
+    stats.granted += 1
+    stats.waits.append(queue_wait)
+    lease = Lease(priority=priority, room=room, estimated_tokens=tokens, queue_wait=queue_wait)
+    try:
+      yield lease
+    finally:
+      self._release(lease)
+
+  def snapshot(self) -> dict[str, Any]:
+    out: dict[str, Any] = {
+      "queued": self._queued,
+      "in_flight": self._in_flight,
+      "rate_limited": self._rate_limited,
+    }
+    for priority, stats in self._stats.items():
+      waits = list(stats.waits)
+      out[priority.name.lower()] = {
+        "granted": stats.granted,
+        "rejected": stats.rejected,
+        "queue_wait_p50_ms": round(_pct(waits, 50) * 1000, 1),
+        "queue_wait_p99_ms": round(_pct(waits, 99) * 1000, 1),
+      }
+    return out
+
+  def reset_stats(self) -> None:
+    self._stats = {p: _PriorityStats() for p in Priority}
+    self._rate_limited = 0
+
+
+@lru_cache()
+def get_llm_scheduler() -> LLMScheduler:
+  return LLMScheduler(
+    requests_per_minute=int(os.getenv("LLM_RPM", "0")),
+    tokens_per_minute=int(os.getenv("LLM_TPM", "0")),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+    max_queue_depth=int(os.getenv("LLM_MAX_QUEUE", "64")),
+    max_narration_queue_depth=int(os.getenv("LLM_MAX_NARRATION_QUEUE", "256")),
+  )
+
+
+def estimate_tokens(messages: list[ModelMessage], model_settings: ModelSettings | None, params: ModelRequestParameters) -> int:
+  chars = 0
+  for msg in messages:
+    for part in msg.parts:
+      content = getattr(part, "content", None) or getattr(part, "args", None) or ""
+      chars += len(content) if isinstance(content, str) else len(str(content))
+  for tool in [*params.function_tools, *params.output_tools]:
+    chars += len(tool.name) + len(tool.description or "") + len(str(tool.parameters_json_schema))
+  max_output = int((model_settings or {}).get("max_tokens", 512))
+  return chars // 4 + max_output
+
+
+# Longest provider-requested pause honoured before retrying a 429
+_MAX_RETRY_AFTER_S = 60.0
+
+
+def retry_after(error: BaseException) -> float | None:
+  """Seconds from the Retry-After(-Ms) header of the provider response behind a ModelHTTPError."""
+  response = getattr(error.__cause__, "response", None)
+  headers = getattr(response, "headers", None)
+  if not headers:
+    return None
+  value = headers.get("retry-after-ms")
+  if value:
+    try:
+      return float(value) / 1000.0
+    except ValueError:
+      pass
+  value = headers.get("retry-after")
+  if not value:
+    return None
+  try:
+    return float(value)
+  except ValueError:
+    pass
+  try:
+    return parsedate_to_datetime(value).timestamp() - time.time()
+  except (TypeError, ValueError):
+    return None
+
+
+def _is_connection_error(error: BaseException) -> bool:
+  # Provider SDKs (openai, anthropic) share these names; timeouts subclass connection errors
+  return isinstance(error, httpx.TransportError) or any(c.__name__ == "APIConnectionError" for c in type(error).__mro__)
+
+
+class ScheduledModel(WrapperModel):
+  """Pydantic AI model that routes every request through the shared scheduler."""
+
+  def __init__(self, wrapped: Model | KnownModelName, *, priority: Priority, scheduler: LLMScheduler | None = None, max_retries: int = 3) -> None:
+    super().__init__(wrapped)
+    self.priority = priority
+    self.scheduler = scheduler or get_llm_scheduler()
+    self.max_retries = max_retries
+    # 429s and connection errors are retried here, after the slot is released; SDK retries would hold it
+    client = getattr(self.wrapped, "client", None)
+    if callable(getattr(client, "with_options", None)):
+      self.wrapped.client = client.with_options(max_retries=0)
+
+  def _retry_delay(self, error: Exception, attempt: int) -> float | None:
+    """Seconds to wait outside the slot before retrying, or None to raise."""
+    if attempt >= self.max_retries:
+      return None
+    if isinstance(error, ModelHTTPError) and error.status_code == 429:
+      # The scheduler pause delays every caller, this one included
+      self._on_rate_limited(error, attempt)
+      return 0.0
+    if _is_connection_error(error):
+      backoff = min(8.0, 0.5 * (2 ** attempt))
+      log.warning("LLM connection error, retrying", extra={"priority": self.priority.name, "backoff_s": backoff, "error": str(error)})
+      return backoff
+    return None
+
+  def _on_rate_limited(self, error: ModelHTTPError, attempt: int) -> float:
+    requested = retry_after(error)
+    if requested is not None and requested >= 0:
+      backoff = min(requested, _MAX_RETRY_AFTER_S)
+    else:
+      backoff = min(30.0, 1.0 * (2 ** attempt))
+    self.scheduler.penalize(backoff)
+    log.warning("LLM rate limited", extra={"priority": self.priority.name, "backoff_s": backoff, "retry_after": requested is not None})
+    return backoff
+
+  async def request(self, messages: list[ModelMessage], model_settings: ModelSettings | None, model_request_parameters: ModelRequestParameters) -> ModelResponse:
+    tokens = estimate_tokens(messages, model_settings, model_request_parameters)
+    attempt = 0
+    while True:
+      async with self.scheduler.slot(priority=self.priority, room=current_room.get(), tokens=tokens) as lease:
+        try:
+          response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+        except Exception as e:
+          delay = self._retry_delay(e, attempt)
+          if delay is None:
+            raise
+        else:
+          lease.used_tokens = response.usage.total_tokens or None
+          return response
+      attempt += 1
+      await asyncio.sleep(delay)
+
+  @asynccontextmanager
+  async def request_stream(self, messages: list[ModelMessage], model_settings: ModelSettings | None, model_request_parameters: ModelRequestParameters, run_context: Any = None) -> AsyncIterator[StreamedResponse]:
+    tokens = estimate_tokens(messages, model_settings, model_request_parameters)
+    attempt = 0
+    while True:
+      async with self.scheduler.slot(priority=self.priority, room=current_room.get(), tokens=tokens):
+        async with AsyncExitStack() as stack:
+          # 429s and connection errors arrive before the first chunk, so only opening the stream is retried
+          try:
+            stream = await stack.enter_async_context(self.wrapped.request_stream(messages, model_settings, model_request_parameters, run_context))
+          except Exception as e:
+            delay = self._retry_delay(e, attempt)
+            if delay is None:
+              raise
+          else:
+            yield stream
+            return
+      attempt += 1
+      await asyncio.sleep(delay)
@@ -0,0 +1,17 @@
+from .fakes import FakeConfig, FakeStack
+from .runner import LevelReport, LoopMonitor, SimChatContext, TurnSample, ramp, run_level
+from .script import Turn, TurnScript, record_from_frontend
+
+__all__ = [
+  "FakeConfig",
+  "FakeStack",
+  "LevelReport",
+  "LoopMonitor",
+  "SimChatContext",
+  "TurnSample",
+  "ramp",
+  "run_level",
+  "Turn",
+  "TurnScript",
+  "record_from_frontend",
+]
@@ -0,0 +1,114 @@
+"""Multi-room load generator for `PydanticAgentLLM`.
+
+  python -m voice_bot.loadtest ramp --levels 1,4,16,32 --turns 5 --think-time 4
+  python -m voice_bot.loadtest record --frontend https://<frontend> --room lesson-... --out session.json
+  python -m voice_bot.loadtest ramp --levels 8 --script session.json --speed 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from dataclasses import asdict
+
+from .fakes import FakeConfig, FakeStack
+from .runner import LevelReport, ramp
+from .script import TurnScript, record_from_frontend
+
+
+def _levels(value: str) -> list[int]:
+  return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _cmd_ramp(args: argparse.Namespace) -> None:
+  cfg = FakeConfig(
+    llm_latency=args.llm_latency,
+    llm_jitter=args.llm_jitter,
+    mcp_latency=args.mcp_latency,
+    mcp_jitter=args.mcp_jitter,
+    frontend_latency=args.frontend_latency,
+    tool_calls_per_action=args.tool_calls,
+    llm_rpm=args.llm_rpm,
+  )
+  script = TurnScript.load(args.script).scaled(args.speed) if args.script else TurnScript.synthetic(args.turns, args.think_time)
+
+  with FakeStack(cfg) as stack:
+    # The adapter and the OpenAI provider read these at construction time
+    os.environ["OPENAI_BASE_URL"] = stack.llm_base_url
+    os.environ["OPENAI_API_KEY"] = "loadtest"
+    os.environ["FRONTEND_API_BASE"] = stack.frontend_base
+    os.environ.setdefault("LOGFIRE_ENABLE", "0")
+    # The fake frontend starts empty, so keep room logs away from a real worker's
+    os.environ.setdefault("ROOM_LOG_DIR", tempfile.mkdtemp(prefix="loadtest-room-log-"))
+
+    from ..pydantic_llm_adapter import PydanticAgentLLM
+    from ..prompts import ASSISTANT_SYSTEM_PROMPT
+    from ..llm_scheduler import get_llm_scheduler
+    from ..model_routing import get_model_routing
+    from ..mcp_tools import get_tool_cache
+
+    def make_llm() -> PydanticAgentLLM:
+      return PydanticAgentLLM(openai_model=args.model, mcp_url=stack.mcp_url, system_prompt=ASSISTANT_SYSTEM_PROMPT)
+
+    print(f"script: {len(script.turns)} turns over {script.turns[-1].at if script.turns else 0:.1f}s per room")
+    print(LevelReport.HEADER)
+    scheduler = get_llm_scheduler()
+    routing = get_model_routing()
+
+    def on_level(report: LevelReport) -> None:
+      print(report.row(), flush=True)
+      print(f"      scheduler: {scheduler.snapshot()}", flush=True)
+      print(f"      routing: {routing.snapshot()}", flush=True)
+      print(f"      mcp tools: {get_tool_cache().snapshot()}", flush=True)
+      scheduler.reset_stats()
+
+    reports = asyncio.run(ramp(_levels(args.levels), script, make_llm, stagger=args.stagger, on_level=on_level))
+
+  if args.json:
+    with open(args.json, "w") as f:
+      json.dump([asdict(r) for r in reports], f, indent=2)
+
+
+def _cmd_record(args: argparse.Namespace) -> None:
+  script = asyncio.run(record_from_frontend(args.frontend, args.room))
+  script.dump(args.out)
+  print(f"recorded {len(script.turns)} turns to {args.out}")
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(prog="python -m voice_bot.loadtest")
+  sub = parser.add_subparsers(dest="cmd", required=True)
+
+  p = sub.add_parser("ramp", help="ramp simulated rooms against local fake servers")
+  p.add_argument("--levels", default="1,2,4,8,16", help="comma separated room counts")
+  p.add_argument("--turns", type=int, default=5)
+  p.add_argument("--think-time", type=float, default=3.0, help="seconds between synthetic turns")
+  p.add_argument("--script", help="replay a recorded turn script instead of synthetic turns")
+  p.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier for --script")
+  p.add_argument("--stagger", type=float, default=0.0, help="seconds between room starts")
+  p.add_argument("--model", default="openai:gpt-4.1-mini")
+  p.add_argument("--llm-latency", type=float, default=0.4)
+  p.add_argument("--llm-jitter", type=float, default=0.2)
+  p.add_argument("--mcp-latency", type=float, default=0.3)
+  p.add_argument("--mcp-jitter", type=float, default=0.2)
+  p.add_argument("--frontend-latency", type=float, default=0.01)
+  p.add_argument("--tool-calls", type=int, default=2, help="browser tool calls per action phase")
+  p.add_argument("--llm-rpm", type=int, default=0, help="fake LLM answers 429 above this many requests per minute")
+  p.add_argument("--json", help="write level reports to this file")
+  p.set_defaults(func=_cmd_ramp)
+
+  r = sub.add_parser("record", help="record a real room's turn pattern from the frontend history API")
+  r.add_argument("--frontend", default=os.getenv("FRONTEND_API_BASE", "http://localhost:3000"))
+  r.add_argument("--room", required=True)
+  r.add_argument("--out", required=True)
+  r.set_defaults(func=_cmd_record)
+
+  args = parser.parse_args()
+  args.func(args)
+
+
+if __name__ == "__main__":
+  main()
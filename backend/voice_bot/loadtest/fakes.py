@@ -0,0 +1,331 @@
+"""Local stand-ins for the OpenAI-compatible LLM, Browserbase MCP and Next.js frontend.
+
+The servers run in a child process so their CPU does not show up as event-loop
+lag in the process under test.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import random
+import re
+import socket
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class FakeConfig:
+  # Simulated latencies (seconds); each call sleeps base + uniform(0, jitter)
+  llm_latency: float = 0.4
+  llm_jitter: float = 0.2
+  mcp_latency: float = 0.3
+  mcp_jitter: float = 0.2
+  frontend_latency: float = 0.01
+  # Extra navigate time for a page the browser has not loaded or prefetched yet
+  page_load_latency: float = 0.0
+  # Number of Browserbase tool calls the fake model makes per action phase
+  tool_calls_per_action: int = 2
+  # Requests per minute the fake LLM accepts before answering 429 (0 = unlimited)
+  llm_rpm: int = 0
+  host: str = "127.0.0.1"
+  llm_port: int = 0
+  mcp_port: int = 0
+  frontend_port: int = 0
+
+
+def _free_port(host: str) -> int:
+  with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+    s.bind((host, 0))
+    return s.getsockname()[1]
+
+
+async def _sleep(base: float, jitter: float) -> None:
+  delay = base + (random.uniform(0, jitter) if jitter > 0 else 0.0)
+  if delay > 0:
+    await asyncio.sleep(delay)
+
+
+_USER_REQUEST_RE = re.compile(r"User request: (.*)")
+_URL_RE = re.compile(r"https?://[^\s\"']+")
+
+
+def _completion(model: str, message: dict, finish_reason: str, prompt_tokens: int) -> dict:
+  content = message.get("content") or ""
+  completion_tokens = max(1, len(content) // 4 + sum(len(c["function"]["arguments"]) // 4 for c in message.get("tool_calls", [])))
+  return {
+    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+    "object": "chat.completion",
+    "created": int(time.time()),
+    "model": model,
+    "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+    "usage": {
+      "prompt_tokens": prompt_tokens,
+      "completion_tokens": completion_tokens,
+      "total_tokens": prompt_tokens + completion_tokens,
+    },
+  }
+
+
+def _tool_call(name: str, args: dict) -> dict:
+  return {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+
+
+def fake_llm_reply(body: dict, cfg: FakeConfig) -> dict:
+  """Decide what the fake model answers based on the tools offered in the request."""
+  model = str(body.get("model", "fake"))
+  messages: list[dict] = body.get("messages") or []
+  tool_names = [t.get("function", {}).get("name", "") for t in body.get("tools") or []]
+  prompt_tokens = max(1, len(json.dumps(messages)) // 4 + len(json.dumps(body.get("tools") or [])) // 4)
+
+  # Structured output (NarrationDecision) is requested through an output tool
+  output_tool = next((n for n in tool_names if n.startswith("final_result")), "")
+  if output_tool:
+    last_user = next((m for m in reversed(messages) if m.get("role") == "user"), {})
+    content = last_user.get("content") or ""
+    text = content if isinstance(content, str) else " ".join(str(p.get("text", "")) for p in content if isinstance(p, dict))
+    match = _USER_REQUEST_RE.search(text)
+    request = match.group(1).strip() if match else text
+    act = not request.endswith("?")
+    msg = "Let me open that page for you." if act else "Good question. Here is the short answer."
+    return _completion(model, {"role": "assistant", "content": None, "tool_calls": [_tool_call(output_tool, {"message": msg, "act": act})]}, "tool_calls", prompt_tokens)
+
+  # Action phase: chain a few Browserbase calls, then summarize
+  tool_results = 0
+  for m in reversed(messages):
+    if m.get("role") == "user":
+      break
+    if m.get("role") == "tool":
+      tool_results += 1
+  browser_tools = [n for n in tool_names if n.startswith("browserbase_") and n != "browserbase_session_create"]
+  if browser_tools and tool_results < cfg.tool_calls_per_action:
+    name = "browserbase_stagehand_navigate" if "browserbase_stagehand_navigate" in browser_tools else browser_tools[0]
+    # Open the last URL the learner asked for
+    url = "https://example.com"
+    for m in reversed(messages):
+      match = _URL_RE.search(str(m.get("content") or "")) if m.get("role") == "user" else None
+      if match:
+        url = match.group(0)
+        break
+    return _completion(model, {"role": "assistant", "content": None, "tool_calls": [_tool_call(name, {"url": url})]}, "tool_calls", prompt_tokens)
+  return _completion(model, {"role": "assistant", "content": "Done, the page is open."}, "stop", prompt_tokens)
+
+
+def build_llm_app(cfg: FakeConfig):
+  app = FastAPI(title="fake-llm")
+  window: deque[float] = deque()
+
+  @app.post("/v1/chat/completions")
+  async def chat_completions(request: Request):
+    body = await request.json()
+    if cfg.llm_rpm:
+      now = time.monotonic()
+      while window and now - window[0] > 60.0:
+        window.popleft()
+      if len(window) >= cfg.llm_rpm:
+        # Seconds until the oldest request leaves the window, as real providers report
+        wait = max(60.0 - (now - window[0]), 0.1)
+        return JSONResponse({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}, status_code=429, headers={"retry-after": f"{wait:.1f}"})
+      window.append(now)
+    await _sleep(cfg.llm_latency, cfg.llm_jitter)
+    return fake_llm_reply(body, cfg)
+
+  return app
+
+
+def build_frontend_app(cfg: FakeConfig):
+  app = FastAPI(title="fake-frontend")
+  history: dict[str, list] = {}
+  plans: dict[str, dict] = {}
+
+  @app.get("/api/session")
+  async def session_get(roomId: str = "", sessionId: str = "") -> dict:
+    await _sleep(cfg.frontend_latency, 0)
+    room = roomId or sessionId.removeprefix("sess-")
+    return {"_id": f"sess-{room}", "roomId": room, "bbSessionId": f"bb-{room}"}
+
+  @app.get("/api/messages/history_json")
+  async def history_json(roomId: str, limit: int = 100) -> list:
+    await _sleep(cfg.frontend_latency, 0)
+    rows = history.get(roomId, [])
+    return rows[-limit:] if limit > 0 else rows
+
+  @app.get("/api/messages/history_since")
+  async def history_since(roomId: str, afterSeq: int = -1) -> dict:
+    # A room's seq numbers are the list indexes, as Convex assigns them
+    await _sleep(cfg.frontend_latency, 0)
+    rows = history.get(roomId, [])
+    start = max(afterSeq + 1, 0)
+    return {"lastSeq": len(rows) - 1, "messages": [{"seq": i, "message": m} for i, m in enumerate(rows[start:], start)]}
+
+  @app.post("/api/messages/append_json")
+  async def append_json(request: Request) -> dict:
+    body = await request.json()
+    await _sleep(cfg.frontend_latency, 0)
+    rows = history.setdefault(str(body.get("roomId", "")), [])
+    first_seq = len(rows)
+    rows.extend(body.get("messagesJson") or [])
+    return {"ok": True, "firstSeq": first_seq, "lastSeq": len(rows) - 1}
+
+  @app.get("/api/lesson/plan")
+  async def plan_get(sessionId: str):
+    await _sleep(cfg.frontend_latency, 0)
+    if sessionId not in plans:
+      return JSONResponse({"error": "not found"}, status_code=404)
+    return plans[sessionId]
+
+  @app.post("/api/lesson/plan")
+  async def plan_upsert(request: Request) -> dict:
+    body = await request.json()
+    await _sleep(cfg.frontend_latency, 0)
+    plan = {**(body.get("plan") or {}), "_id": f"plan-{body.get('sessionId', '')}"}
+    plans[str(body.get("sessionId", ""))] = plan
+    return plan
+
+  @app.post("/api/lesson/step")
+  async def step_toggle(request: Request) -> dict:
+    body = await request.json()
+    await _sleep(cfg.frontend_latency, 0)
+    for step in plans.get(str(body.get("sessionId", "")), {}).get("steps") or []:
+      if step.get("id") == body.get("stepId"):
+        step["done"] = bool(body.get("done"))
+    return {"stepId": body.get("stepId"), "done": bool(body.get("done"))}
+
+  return app
+
+
+def build_mcp_app(cfg: FakeConfig):
+  from mcp.server.fastmcp import FastMCP
+
+  server = FastMCP("fake-browserbase", json_response=True, log_level="WARNING")
+  # Pages loaded or prefetched per session, served without page_load_latency
+  warm: set[tuple[str, str]] = set()
+
+  def _page(url: str) -> str:
+    return url.split("#", 1)[0].rstrip("/").lower()
+
+  @server.tool()
+  async def browserbase_session_create(sessionId: str = "") -> str:
+    """Create or reuse a Browserbase session."""
+    await _sleep(cfg.mcp_latency, cfg.mcp_jitter)
+    return f"session {sessionId or 'new'} ready"
+
+  @server.tool()
+  async def browserbase_stagehand_navigate(url: str, sessionId: str = "") -> str:
+    """Navigate to a URL in the browser."""
+    key = (sessionId, _page(url))
+    await _sleep(cfg.mcp_latency + (0.0 if key in warm else cfg.page_load_latency), cfg.mcp_jitter)
+    warm.add(key)
+    return f"navigated to {url}"
+
+  @server.tool()
+  async def browserbase_prefetch(url: str, sessionId: str = "") -> str:
+    """Load a URL in a background tab so a later navigate is fast."""
+    key = (sessionId, _page(url))
+    if key not in warm:
+      await _sleep(cfg.mcp_latency + cfg.page_load_latency, cfg.mcp_jitter)
+      warm.add(key)
+    return f"prefetched {url}"
+
+  @server.tool()
+  async def browserbase_stagehand_act(action: str, sessionId: str = "") -> str:
+    """Perform an action on the current page."""
+    await _sleep(cfg.mcp_latency, cfg.mcp_jitter)
+    return f"performed {action}"
+
+  @server.tool()
+  async def browserbase_screenshot(sessionId: str = "") -> str:
+    """Take a screenshot of the current page."""
+    await _sleep(cfg.mcp_latency, cfg.mcp_jitter)
+    return "screenshot taken"
+
+  @server.tool()
+  async def multi_browserbase_stagehand_session_create(name: str = "") -> str:
+    """Create an additional parallel browser session."""
+    await _sleep(cfg.mcp_latency, cfg.mcp_jitter)
+    return f"session {name or 'extra'} created"
+
+  return server.streamable_http_app()
+
+
+async def _serve_all(cfg: FakeConfig) -> None:
+  from hypercorn.asyncio import serve
+  from hypercorn.config import Config
+
+  never = asyncio.Event()
+  tasks = []
+  for app, port in (
+    (build_llm_app(cfg), cfg.llm_port),
+    (build_mcp_app(cfg), cfg.mcp_port),
+    (build_frontend_app(cfg), cfg.frontend_port),
+  ):
+    config = Config()
+    config.bind = [f"{cfg.host}:{port}"]
+    config.accesslog = None
+    config.loglevel = "WARNING"
+    tasks.append(asyncio.create_task(serve(app, config, shutdown_trigger=never.wait)))
+  await asyncio.gather(*tasks)
+
+
+def _serve_process(cfg: FakeConfig) -> None:
+  asyncio.run(_serve_all(cfg))
+
+
+@dataclass
+class FakeStack:
+  """Runs the fake servers in a child process for the lifetime of the context."""
+
+  cfg: FakeConfig = field(default_factory=FakeConfig)
+  _proc: Any = None
+
+  @property
+  def llm_base_url(self) -> str:
+    return f"http://{self.cfg.host}:{self.cfg.llm_port}/v1"
+
+  @property
+  def mcp_url(self) -> str:
+    return f"http://{self.cfg.host}:{self.cfg.mcp_port}/mcp"
+
+  @property
+  def frontend_base(self) -> str:
+    return f"http://{self.cfg.host}:{self.cfg.frontend_port}"
+
+  def start(self, timeout: float = 20.0) -> None:
+    for name in ("llm_port", "mcp_port", "frontend_port"):
+      if not getattr(self.cfg, name):
+        setattr(self.cfg, name, _free_port(self.cfg.host))
+    ctx = multiprocessing.get_context("spawn")
+    self._proc = ctx.Process(target=_serve_process, args=(self.cfg,), daemon=True)
+    self._proc.start()
+    deadline = time.monotonic() + timeout
+    for port in (self.cfg.llm_port, self.cfg.mcp_port, self.cfg.frontend_port):
+      while True:
+        try:
+          with socket.create_connection((self.cfg.host, port), timeout=0.5):
+            break
+        except OSError:
+          if time.monotonic() > deadline or not self._proc.is_alive():
+            self.stop()
+            raise RuntimeError(f"fake server on port {port} did not start")
+          time.sleep(0.05)
+
+  def stop(self) -> None:
+    if self._proc is not None:
+      self._proc.terminate()
+      self._proc.join(timeout=5)
+      self._proc = None
+
+  def __enter__(self) -> "FakeStack":
+    self.start()
+    return self
+
+  def __exit__(self, *exc: Any) -> None:
+    self.stop()
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .script import TurnScript
+
+try:
+  import psutil  # type: ignore
+except Exception:  # pragma: no cover
+  psutil = None  # type: ignore
+
+
+log = logging.getLogger("loadtest")
+
+
+def percentile(values: list[float], pct: float) -> float:
+  if not values:
+    return 0.0
+  ordered = sorted(values)
+  k = (len(ordered) - 1) * pct / 100.0
+  lo = int(k)
+  hi = min(lo + 1, len(ordered) - 1)
+  return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def rss_bytes() -> int:
+  if psutil is not None:
+    return int(psutil.Process().memory_info().rss)
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  except Exception:
+    import resource
+
+    return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+
+
+def open_sockets() -> int:
+  if psutil is not None:
+    proc = psutil.Process()
+    connections = getattr(proc, "net_connections", None) or proc.connections
+    return len(connections(kind="inet"))
+  count = 0
+  try:
+    for fd in os.listdir("/proc/self/fd"):
+      try:
+        if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+          count += 1
+      except OSError:
+        continue
+  except OSError:
+    return -1
+  return count
+
+
+class LoopMonitor:
+  """Samples event-loop lag (sleep overshoot) plus RSS and open sockets."""
+
+  def __init__(self, interval: float = 0.05, resource_every: int = 10) -> None:
+    self.interval = interval
+    self.resource_every = resource_every
+    self.lags: list[float] = []
+    self.peak_rss = 0
+    self.peak_sockets = 0
+    self._task: asyncio.Task | None = None
+
+  def _sample_resources(self) -> None:
+    self.peak_rss = max(self.peak_rss, rss_bytes())
+    self.peak_sockets = max(self.peak_sockets, open_sockets())
+
+  async def _run(self) -> None:
+    ticks = 0
+    while True:
+      t0 = time.perf_counter()
+      await asyncio.sleep(self.interval)
+      self.lags.append(max(0.0, time.perf_counter() - t0 - self.interval))
+      ticks += 1
+      if ticks % self.resource_every == 0:
+        self._sample_resources()
+
+  def start(self) -> None:
+    self._sample_resources()
+    self._task = asyncio.create_task(self._run())
+
+  async def stop(self) -> None:
+    self._sample_resources()
+    if self._task is not None:
+      self._task.cancel()
+      try:
+        await self._task
+      except asyncio.CancelledError:
+        pass
+      self._task = None
+
+
+@dataclass
+class _Item:
+  role: str
+  content: str
+  room: str
+
+
+@dataclass
+class SimChatContext:
+  """Minimal stand-in for LiveKit's ChatContext as read by `PydanticAgentLLM`."""
+
+  room: str
+  items: list[_Item] = field(default_factory=list)
+
+  def add_message(self, *, role: str, content: str) -> None:
+    self.items.append(_Item(role=role, content=content, room=self.room))
+
+
+@dataclass
+class TurnSample:
+  room: str
+  first_chunk_s: float
+  turn_s: float
+  ok: bool
+  error: str = ""
+
+
+@dataclass
+class LevelReport:
+  rooms: int
+  duration_s: float
+  turns: int
+  errors: int
+  throughput: float
+  first_chunk_p50: float
+  first_chunk_p95: float
+  first_chunk_p99: float
+  turn_p50: float
+  turn_p95: float
+  turn_p99: float
+  loop_lag_p99_ms: float
+  loop_lag_max_ms: float
+  peak_rss_mb: float
+  peak_sockets: int
+
+  HEADER = (
+    f"{'rooms':>5} {'turns':>6} {'err':>4} {'turn/s':>7} "
+    f"{'first p50':>9} {'p95':>6} {'p99':>6} {'turn p50':>9} {'p95':>6} {'p99':>6} "
+    f"{'lag p99ms':>9} {'maxms':>7} {'rss MB':>7} {'socks':>6}"
+  )
+
+  def row(self) -> str:
+    return (
+      f"{self.rooms:>5} {self.turns:>6} {self.errors:>4} {self.throughput:>7.2f} "
+      f"{self.first_chunk_p50:>9.2f} {self.first_chunk_p95:>6.2f} {self.first_chunk_p99:>6.2f} "
+      f"{self.turn_p50:>9.2f} {self.turn_p95:>6.2f} {self.turn_p99:>6.2f} "
+      f"{self.loop_lag_p99_ms:>9.1f} {self.loop_lag_max_ms:>7.1f} {self.peak_rss_mb:>7.1f} {self.peak_sockets:>6}"
+    )
+
+
+async def run_turn(llm: Any, ctx: SimChatContext, text: str) -> TurnSample:
+  ctx.add_message(role="user", content=text)
+  t0 = time.perf_counter()
+  first = 0.0
+  error = ""
+  # chat() swallows exceptions raised inside its context, so record them in the body
+  async with llm.chat(chat_ctx=ctx) as stream:
+    try:
+      async for _chunk in stream:
+        if not first:
+          first = time.perf_counter() - t0
+    except Exception as e:
+      error = f"{type(e).__name__}: {e}"
+  total = time.perf_counter() - t0
+  return TurnSample(room=ctx.room, first_chunk_s=first or total, turn_s=total, ok=not error, error=error)
+
+
+async def run_room(room_id: str, script: TurnScript, make_llm: Callable[[], Any], samples: list[TurnSample]) -> None:
+  llm = make_llm()
+  ctx = SimChatContext(room=room_id)
+  try:
+    await llm.open(room_id)
+    start = time.perf_counter()
+    for turn in script.turns:
+      wait = start + turn.at - time.perf_counter()
+      if wait > 0:
+        await asyncio.sleep(wait)
+      sample = await run_turn(llm, ctx, turn.text)
+      if sample.error:
+        log.warning("turn failed", extra={"lk_room": room_id, "error": sample.error})
+      samples.append(sample)
+  finally:
+    await llm.close()
+
+
+async def run_level(rooms: int, script: TurnScript, make_llm: Callable[[], Any], *, stagger: float = 0.0, prefix: str = "load") -> LevelReport:
+  samples: list[TurnSample] = []
+  monitor = LoopMonitor()
+  monitor.start()
+  t0 = time.perf_counter()
+
+  async def _room(i: int) -> None:
+    if stagger > 0:
+      await asyncio.sleep(i * stagger)
+    await run_room(f"{prefix}-{rooms}-{i}", script, make_llm, samples)
+
+  results = await asyncio.gather(*(_room(i) for i in range(rooms)), return_exceptions=True)
+  duration = time.perf_counter() - t0
+  await monitor.stop()
+  room_failures = [r for r in results if isinstance(r, BaseException)]
+  for r in room_failures:
+    log.warning("room failed", extra={"error": repr(r)})
+
+  ok = [s for s in samples if s.ok]
+  first = [s.first_chunk_s for s in ok]
+  turn = [s.turn_s for s in ok]
+  return LevelReport(
+    rooms=rooms,
+    duration_s=duration,
+    turns=len(samples),
+    errors=len(samples) - len(ok) + len(room_failures),
+    throughput=len(ok) / duration if duration > 0 else 0.0,
+    first_chunk_p50=percentile(first, 50),
+    first_chunk_p95=percentile(first, 95),
+    first_chunk_p99=percentile(first, 99),
+    turn_p50=percentile(turn, 50),
+    turn_p95=percentile(turn, 95),
+    turn_p99=percentile(turn, 99),
+    loop_lag_p99_ms=percentile(monitor.lags, 99) * 1000,
+    loop_lag_max_ms=max(monitor.lags, default=0.0) * 1000,
+    peak_rss_mb=monitor.peak_rss / (1024 * 1024),
+    peak_sockets=monitor.peak_sockets,
+  )
+
+
+async def ramp(levels: list[int], script: TurnScript, make_llm: Callable[[], Any], *, stagger: float = 0.0, on_level: Callable[[LevelReport], None] | None = None) -> list[LevelReport]:
+  reports: list[LevelReport] = []
+  for rooms in levels:
+    report = await run_level(rooms, script, make_llm, stagger=stagger)
+    reports.append(report)
+    if on_level is not None:
+      on_level(report)
+  return reports
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+
+DEFAULT_UTTERANCES = [
+  "Teach me CSS flexbox.",
+  "Open the MDN page on flexbox.",
+  "What does justify-content do?",
+  "Show me an example with align-items.",
+  "Mark the first step as done.",
+]
+
+# The narration phase wraps the learner's words; the action phase prompt is synthetic
+_USER_REQUEST_RE = re.compile(r"User request: (.*)")
+_ACTION_PROMPT_PREFIX = "Proceed to act as narrated."
+
+
+@dataclass
+class Turn:
+  at: float  # seconds since the start of the session
+  text: str
+
+
+@dataclass
+class TurnScript:
+  turns: list[Turn] = field(default_factory=list)
+
+  @classmethod
+  def synthetic(cls, turns: int, think_time: float) -> "TurnScript":
+    return cls([Turn(at=i * think_time, text=DEFAULT_UTTERANCES[i % len(DEFAULT_UTTERANCES)]) for i in range(turns)])
+
+  @classmethod
+  def load(cls, path: str | Path) -> "TurnScript":
+    data = json.loads(Path(path).read_text())
+    return cls([Turn(at=float(t["at"]), text=str(t["text"])) for t in data.get("turns", [])])
+
+  def dump(self, path: str | Path) -> None:
+    Path(path).write_text(json.dumps({"turns": [{"at": t.at, "text": t.text} for t in self.turns]}, indent=2))
+
+  def scaled(self, speed: float) -> "TurnScript":
+    if speed <= 0:
+      return self
+    return TurnScript([Turn(at=t.at / speed, text=t.text) for t in self.turns])
+
+  @classmethod
+  def from_history(cls, history_json: list) -> "TurnScript":
+    """Extract learner utterances and their timing from Pydantic AI message JSON."""
+    stamped: list[tuple[datetime, str]] = []
+    for msg in history_json:
+      if not isinstance(msg, dict) or msg.get("kind") != "request":
+        continue
+      for part in msg.get("parts") or []:
+        if part.get("part_kind") != "user-prompt" or not isinstance(part.get("content"), str):
+          continue
+        content = part["content"]
+        if content.startswith(_ACTION_PROMPT_PREFIX):
+          continue
+        match = _USER_REQUEST_RE.search(content)
+        text = match.group(1).strip() if match else content.strip()
+        try:
+          ts = datetime.fromisoformat(str(part.get("timestamp", "")).replace("Z", "+00:00"))
+        except ValueError:
+          continue
+        if text:
+          stamped.append((ts, text))
+    stamped.sort(key=lambda x: x[0])
+    if not stamped:
+      return cls()
+    start = stamped[0][0]
+    return cls([Turn(at=(ts - start).total_seconds(), text=text) for ts, text in stamped])
+
+
+async def record_from_frontend(frontend_base: str, room_id: str, limit: int = 1000000) -> TurnScript:
+  """Pull a real room's stored history and turn it into a replayable script."""
+  async with httpx.AsyncClient(timeout=30.0) as client:
+    r = await client.get(f"{frontend_base}/api/messages/history_json", params={"roomId": room_id, "limit": str(limit)})
+    r.raise_for_status()
+    return TurnScript.from_history(r.json())
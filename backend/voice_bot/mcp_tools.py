@@ -0,0 +1,135 @@
+"""Tool-definition cache and per-phase tool filters for the Browserbase MCP toolset.
+
+Pydantic AI lists MCP tools on every agent run. The listing is the same for
+every room talking to the same server, so it is fetched once per server URL and
+version, shared by all connections in the process, and dropped when any
+connection receives `notifications/tools/list_changed`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import logging
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+
+from mcp import types as mcp_types
+from pydantic_ai import RunContext
+from pydantic_ai.mcp import MCPServerStreamableHTTP
+from pydantic_ai.tools import ToolDefinition
+from pydantic_ai.toolsets import AbstractToolset
+
+from .llm_scheduler import Priority
+
+
+log = logging.getLogger("agent")
+
+# Tools hidden from a phase unless overridden by MCP_TOOLS_<PHASE>_DENY; prefetch is driven by the worker, not the model
+_DEFAULT_DENY = "multi_*,*prefetch*"
+
+
+@dataclass
+class _Entry:
+  tools: list[mcp_types.Tool]
+  fetched_at: float
+
+
+class ToolDefinitionCache:
+  """Process-wide cache of MCP tool listings keyed by (server URL, version)."""
+
+  def __init__(self, ttl_s: float = 600.0) -> None:
+    self.ttl_s = ttl_s
+    self._entries: dict[tuple[str, str], _Entry] = {}
+    self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+    self.hits = 0
+    self.misses = 0
+    self.invalidations = 0
+
+  async def get(self, key: tuple[str, str], fetch: Callable[[], Awaitable[list[mcp_types.Tool]]]) -> list[mcp_types.Tool]:
+    entry = self._entries.get(key)
+    if entry is not None and (self.ttl_s <= 0 or time.monotonic() - entry.fetched_at < self.ttl_s):
+      self.hits += 1
+      return entry.tools
+    # Single flight: concurrent room starts share one listing
+    lock = self._locks.setdefault(key, asyncio.Lock())
+    async with lock:
+      entry = self._entries.get(key)
+      if entry is not None and (self.ttl_s <= 0 or time.monotonic() - entry.fetched_at < self.ttl_s):
+        self.hits += 1
+        return entry.tools
+      self.misses += 1
+      tools = await fetch()
+      self._entries[key] = _Entry(tools=tools, fetched_at=time.monotonic())
+      return tools
+
+  def invalidate(self, key: tuple[str, str]) -> None:
+    if self._entries.pop(key, None) is not None:
+      self.invalidations += 1
+
+  def snapshot(self) -> dict[str, Any]:
+    return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations, "entries": len(self._entries)}
+
+
+@lru_cache()
+def get_tool_cache() -> ToolDefinitionCache:
+  return ToolDefinitionCache(ttl_s=float(os.getenv("MCP_TOOLS_CACHE_TTL_S", "600")))
+
+
+class CachedMCPServerStreamableHTTP(MCPServerStreamableHTTP):
+  """Streamable HTTP MCP server whose tool listing comes from the shared cache."""
+
+  def __init__(self, *, url: str, version: str = "", cache: ToolDefinitionCache | None = None, **kwargs: Any) -> None:
+    super().__init__(url=url, **kwargs)
+    self._cache_key = (url, version)
+    self._tool_cache = cache or get_tool_cache()
+
+  async def __aenter__(self):
+    await super().__aenter__()
+    self._watch_list_changed()
+    return self
+
+  def _watch_list_changed(self) -> None:
+    # pydantic_ai builds the ClientSession itself, so chain onto its message handler
+    client = getattr(self, "_client", None)
+    original = getattr(client, "_message_handler", None)
+    if original is None or getattr(original, "_watches_tool_list", False):
+      return
+
+    async def _handler(message: Any) -> None:
+      if isinstance(message, mcp_types.ServerNotification) and isinstance(message.root, mcp_types.ToolListChangedNotification):
+        log.info("MCP tool list changed, invalidating cache", extra={"mcp_url": self.url})
+        self.invalidate_tools()
+      await original(message)
+
+    _handler._watches_tool_list = True  # type: ignore[attr-defined]
+    client._message_handler = _handler  # type: ignore[union-attr]
+
+  def invalidate_tools(self) -> None:
+    self._tool_cache.invalidate(self._cache_key)
+
+  async def list_tools(self) -> list[mcp_types.Tool]:
+    return await self._tool_cache.get(self._cache_key, super().list_tools)
+
+
+def tool_filter(phase: Priority) -> Callable[[RunContext[Any], ToolDefinition], bool]:
+  """Allow/deny glob patterns for the MCP tools a phase may see (MCP_TOOLS_<PHASE>_ALLOW/_DENY)."""
+  prefix = f"MCP_TOOLS_{phase.name}_"
+  allow = [p.strip() for p in os.getenv(prefix + "ALLOW", "*").split(",") if p.strip()]
+  deny = [p.strip() for p in os.getenv(prefix + "DENY", _DEFAULT_DENY).split(",") if p.strip()]
+  decisions: dict[str, bool] = {}
+
+  def _allowed(ctx: RunContext[Any], tool_def: ToolDefinition) -> bool:
+    name = tool_def.name
+    if name not in decisions:
+      decisions[name] = any(fnmatch.fnmatchcase(name, p) for p in allow) and not any(fnmatch.fnmatchcase(name, p) for p in deny)
+    return decisions[name]
+
+  return _allowed
+
+
+def phase_toolset(server: CachedMCPServerStreamableHTTP, phase: Priority) -> AbstractToolset[Any]:
+  return server.filtered(tool_filter(phase))
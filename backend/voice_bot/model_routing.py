@@ -0,0 +1,188 @@
+"""Per-phase model routing with hedged requests and latency budgets.
+
+Each phase (narration, action) can use its own model. When a hedge model is
+configured, a duplicate request is sent to it once the primary has been
+outstanding longer than the phase's observed p95 (never sooner than
+HEDGE_AFTER_MS), and whichever answers first wins. Budgets bound the whole
+model run of a phase; the adapter substitutes fallback text when one runs out.
+
+Configured per phase from env, e.g. for narration:
+  LLM_NARRATION_MODEL, LLM_NARRATION_HEDGE_MODEL,
+  LLM_NARRATION_BUDGET_MS, LLM_NARRATION_HEDGE_AFTER_MS
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import KnownModelName, Model, ModelRequestParameters, infer_model
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+from .llm_scheduler import Priority, ScheduledModel
+
+
+log = logging.getLogger("agent")
+
+# Defaults per phase: (budget ms, initial hedge delay ms)
+_DEFAULTS: dict[Priority, tuple[int, int]] = {
+  Priority.NARRATION: (6000, 1500),
+  Priority.ACTION: (0, 4000),
+}
+
+# Samples needed before the observed p95 replaces the configured hedge delay
+_MIN_SAMPLES = 20
+
+
+def _pct(values: list[float], pct: float) -> float:
+  if not values:
+    return 0.0
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100.0)))]
+
+
+@dataclass
+class PhaseStats:
+  latencies: deque = field(default_factory=lambda: deque(maxlen=500))
+  requests: int = 0
+  hedged: int = 0
+  hedge_wins: int = 0
+  budget_exceeded: int = 0
+
+  def snapshot(self) -> dict[str, Any]:
+    lat = list(self.latencies)
+    return {
+      "requests": self.requests,
+      "hedged": self.hedged,
+      "hedge_wins": self.hedge_wins,
+      "budget_exceeded": self.budget_exceeded,
+      "primary_p50_ms": round(_pct(lat, 50) * 1000, 1),
+      "primary_p95_ms": round(_pct(lat, 95) * 1000, 1),
+      "primary_p99_ms": round(_pct(lat, 99) * 1000, 1),
+    }
+
+
+@dataclass
+class PhaseRoute:
+  phase: Priority
+  model: str | None = None
+  hedge_model: str | None = None
+  budget_s: float = 0.0
+  hedge_after_s: float = 0.0
+  stats: PhaseStats = field(default_factory=PhaseStats)
+
+  def hedge_delay(self) -> float:
+    # The configured delay is a floor: samples of primaries cut short by a hedge win
+    # only bound their latency from below, so the observed p95 can still run low
+    if len(self.stats.latencies) >= _MIN_SAMPLES:
+      return max(_pct(list(self.stats.latencies), 95), self.hedge_after_s)
+    return self.hedge_after_s
+
+
+class TimedModel(WrapperModel):
+  """Records the latency of every primary request of a phase.
+
+  A primary cancelled by a winning hedge is recorded with its elapsed time, so
+  the slow tail stays in the samples. Streamed requests pass through untimed.
+  """
+
+  def __init__(self, wrapped: Model | KnownModelName, route: PhaseRoute) -> None:
+    super().__init__(wrapped)
+    self.route = route
+
+  async def request(self, messages: list[ModelMessage], model_settings: ModelSettings | None, model_request_parameters: ModelRequestParameters) -> ModelResponse:
+    self.route.stats.requests += 1
+    t0 = time.monotonic()
+    try:
+      response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+    except asyncio.CancelledError:
+      self.route.stats.latencies.append(time.monotonic() - t0)
+      raise
+    self.route.stats.latencies.append(time.monotonic() - t0)
+    return response
+
+
+class HedgedModel(WrapperModel):
+  """Sends a duplicate request to a secondary model once the primary runs past p95.
+
+  Only `request` is hedged; `request_stream` goes to the primary alone. The
+  adapter's agent runs never stream model responses.
+  """
+
+  def __init__(self, primary: Model | KnownModelName, secondary: Model | KnownModelName, route: PhaseRoute) -> None:
+    super().__init__(primary)
+    self.secondary = infer_model(secondary)
+    self.route = route
+
+  async def request(self, messages: list[ModelMessage], model_settings: ModelSettings | None, model_request_parameters: ModelRequestParameters) -> ModelResponse:
+    stats = self.route.stats
+    primary = asyncio.ensure_future(self.wrapped.request(messages, model_settings, model_request_parameters))
+    secondary: asyncio.Future | None = None
+    try:
+      done, _ = await asyncio.wait({primary}, timeout=self.route.hedge_delay())
+      if done:
+        return primary.result()
+
+      stats.hedged += 1
+      secondary = asyncio.ensure_future(self.secondary.request(messages, model_settings, model_request_parameters))
+      pending: set[asyncio.Future] = {primary, secondary}
+      while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+          if task.exception() is not None:
+            continue
+          if task is secondary:
+            stats.hedge_wins += 1
+            log.info("hedged request won", extra={"phase": self.route.phase.name, "model": self.secondary.model_name})
+          return task.result()
+      return primary.result()  # both failed; surface the primary error
+    finally:
+      for task in (primary, secondary):
+        if task is not None and not task.done():
+          task.cancel()
+
+
+class ModelRouting:
+  def __init__(self, routes: dict[Priority, PhaseRoute]) -> None:
+    self.routes = routes
+
+  @classmethod
+  def from_env(cls) -> "ModelRouting":
+    routes: dict[Priority, PhaseRoute] = {}
+    for phase, (budget_ms, hedge_ms) in _DEFAULTS.items():
+      prefix = f"LLM_{phase.name}_"
+      routes[phase] = PhaseRoute(
+        phase=phase,
+        model=os.getenv(prefix + "MODEL") or None,
+        hedge_model=os.getenv(prefix + "HEDGE_MODEL") or None,
+        budget_s=int(os.getenv(prefix + "BUDGET_MS", str(budget_ms))) / 1000.0,
+        hedge_after_s=int(os.getenv(prefix + "HEDGE_AFTER_MS", str(hedge_ms))) / 1000.0,
+      )
+    return cls(routes)
+
+  def route(self, phase: Priority) -> PhaseRoute:
+    return self.routes[phase]
+
+  def build_model(self, phase: Priority, default_model: str) -> Model:
+    """Model for a phase: timed scheduled primary, optionally hedged with a scheduled secondary."""
+    route = self.routes[phase]
+    primary = TimedModel(ScheduledModel(route.model or default_model, priority=phase), route)
+    if not route.hedge_model:
+      return primary
+    return HedgedModel(primary, ScheduledModel(route.hedge_model, priority=phase), route)
+
+  def snapshot(self) -> dict[str, Any]:
+    return {phase.name.lower(): route.stats.snapshot() for phase, route in self.routes.items()}
+
+
+@lru_cache()
+def get_model_routing() -> ModelRouting:
+  return ModelRouting.from_env()
@@ -0,0 +1,332 @@
+"""Speculative warm-up of the next lesson step's pages.
+
+While the learner works on step N, URLs from step N+1's description and
+objective are warmed in the idle time between turns, so the navigate call for
+the next step does not pay the page's cold start:
+
+- when the MCP server lists PREFETCH_MCP_TOOL (default `browserbase_prefetch`)
+  it is called with the URL and the room's Browserbase session, so the page
+  is loaded in a background tab of the learner's browser;
+- otherwise, only with PREFETCH_HTTP_WARM=1, the worker fetches the URL once
+  itself. That warms CDN and origin caches but not the remote browser. The
+  URLs come from model-written plan text, so only http(s) URLs on default
+  ports whose host resolves to public addresses are fetched. The fetch
+  connects to the address that was checked and does not follow redirects.
+
+The Browserbase MCP server has no background-tab tool, and its navigate would
+move the learner's own page, so in production there is nothing to warm the
+browser with. Prefetch is off by default (PREFETCH_ENABLE=0) and the in-browser
+path runs only against the fake MCP server of the bench, until the MCP server
+offers such a tool.
+
+Prefetches start only while no turn is running. At most
+PREFETCH_MAX_CONCURRENCY (default 2) run at once and at most PREFETCH_MAX_URLS
+(default 3) are taken from the steps ahead (PREFETCH_LOOKAHEAD, default 1).
+When the plan changes, pending and in-flight prefetches for URLs that are no
+longer ahead are cancelled.
+
+Every navigate is counted as a hit (URL was loaded in the browser), late hit
+(warm-up still running), HTTP-warmed navigation (fetched by the worker only)
+or miss. Time saved is the difference between the median miss and median hit
+navigate latency, times the number of hits. Tune the settings with
+`python -m voice_bot.bench.prefetch` against the fake MCP server.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import os
+import re
+import socket
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+
+log = logging.getLogger("agent")
+
+_URL = re.compile(r"https?://[^\s<>\"'()\[\]{}]+")
+# Sentence punctuation that often sticks to a URL in prose
+_TRAILING = ".,;:!?"
+
+Warmer = Callable[[str], Awaitable[Any]]
+
+
+def normalize_url(url: str) -> str:
+  """Key for matching a prefetched URL with a later navigate: lowercase host, no fragment or trailing slash."""
+  parts = urlsplit(url.strip().rstrip(_TRAILING))
+  path = parts.path.rstrip("/")
+  return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def step_urls(step: dict[str, Any]) -> list[str]:
+  text = " ".join(str(step.get(k) or "") for k in ("conceptTitle", "description", "objective"))
+  return [m.rstrip(_TRAILING) for m in _URL.findall(text)]
+
+
+def next_step_targets(plan: dict[str, Any] | None, *, lookahead: int = 1, max_urls: int = 3) -> list[str]:
+  """URLs of the `lookahead` steps after the current (first not done) step."""
+  steps = sorted((plan or {}).get("steps") or [], key=lambda s: s.get("order", 0))
+  current = next((i for i, s in enumerate(steps) if not s.get("done")), None)
+  if current is None:
+    return []
+  targets: list[str] = []
+  seen: set[str] = set()
+  for step in steps[current + 1:current + 1 + lookahead]:
+    if step.get("done"):
+      continue
+    for url in step_urls(step):
+      key = normalize_url(url)
+      if key not in seen:
+        seen.add(key)
+        targets.append(url)
+  return targets[:max_urls]
+
+
+@dataclass
+class PrefetchStats:
+  scheduled: int = 0
+  completed: int = 0
+  failed: int = 0
+  cancelled: int = 0
+  hits: int = 0
+  late_hits: int = 0
+  http_warmed: int = 0
+  misses: int = 0
+  wasted: int = 0
+  warm_s: deque = field(default_factory=lambda: deque(maxlen=256))
+  hit_s: deque = field(default_factory=lambda: deque(maxlen=256))
+  http_warmed_s: deque = field(default_factory=lambda: deque(maxlen=256))
+  miss_s: deque = field(default_factory=lambda: deque(maxlen=256))
+
+  def time_saved_s(self) -> float:
+    if not self.hit_s or not self.miss_s:
+      return 0.0
+    return max(statistics.median(self.miss_s) - statistics.median(self.hit_s), 0.0) * self.hits
+
+  def snapshot(self) -> dict[str, Any]:
+    navigations = self.hits + self.late_hits + self.http_warmed + self.misses
+
+    def p50_ms(values: deque) -> float:
+      return round(statistics.median(values) * 1000, 1) if values else 0.0
+
+    return {
+      "scheduled": self.scheduled,
+      "completed": self.completed,
+      "failed": self.failed,
+      "cancelled": self.cancelled,
+      "wasted": self.wasted,
+      "hits": self.hits,
+      "late_hits": self.late_hits,
+      "http_warmed": self.http_warmed,
+      "misses": self.misses,
+      "hit_rate": round(self.hits / navigations, 3) if navigations else 0.0,
+      "warm_p50_ms": p50_ms(self.warm_s),
+      "hit_p50_ms": p50_ms(self.hit_s),
+      "http_warmed_p50_ms": p50_ms(self.http_warmed_s),
+      "miss_p50_ms": p50_ms(self.miss_s),
+      "time_saved_s": round(self.time_saved_s(), 2),
+    }
+
+
+class StepPrefetcher:
+  """Warms the next step's URLs in the background for one room.
+
+  `in_browser` says whether `warm` loads pages in the learner's browser; when
+  it does not, navigations to warmed URLs are reported as http_warmed, not hits.
+  """
+
+  def __init__(self, warm: Warmer, *, in_browser: bool = True, max_concurrency: int = 2, max_urls: int = 3, lookahead: int = 1, warm_ttl_s: float = 300.0) -> None:
+    self._warm = warm
+    self.in_browser = in_browser
+    self.max_urls = max_urls
+    self.lookahead = lookahead
+    self.warm_ttl_s = warm_ttl_s
+    self.stats = PrefetchStats()
+    self._slots = asyncio.Semaphore(max(max_concurrency, 1))
+    self._idle = asyncio.Event()
+    self._idle.set()
+    self._tasks: dict[str, asyncio.Task] = {}
+    self._warmed: dict[str, float] = {}
+
+  def update(self, plan: dict[str, Any] | None) -> None:
+    """Prefetch the steps ahead of `plan`; cancel work for URLs that are no longer ahead."""
+    targets = {normalize_url(u): u for u in next_step_targets(plan, lookahead=self.lookahead, max_urls=self.max_urls)}
+    for key in [k for k in self._tasks if k not in targets]:
+      self._cancel(key)
+    now = time.monotonic()
+    for key, url in targets.items():
+      warmed_at = self._warmed.get(key)
+      if key in self._tasks or (warmed_at is not None and now - warmed_at < self.warm_ttl_s):
+        continue
+      self.stats.scheduled += 1
+      self._tasks[key] = asyncio.create_task(self._prefetch(key, url))
+
+  def invalidate(self) -> None:
+    """The plan was replaced: drop everything not yet warmed."""
+    for key in list(self._tasks):
+      self._cancel(key)
+
+  def _cancel(self, key: str) -> None:
+    task = self._tasks.pop(key, None)
+    if task is not None and not task.done():
+      task.cancel()
+      self.stats.cancelled += 1
+
+  def pause(self) -> None:
+    """A turn started; prefetches not yet running wait until it ends."""
+    self._idle.clear()
+
+  def resume(self) -> None:
+    self._idle.set()
+
+  async def _prefetch(self, key: str, url: str) -> None:
+    try:
+      await self._idle.wait()
+      async with self._slots:
+        # A turn may have started while waiting for a slot
+        await self._idle.wait()
+        t0 = time.perf_counter()
+        await self._warm(url)
+        self.stats.warm_s.append(time.perf_counter() - t0)
+        self.stats.completed += 1
+        self._warmed[key] = time.monotonic()
+    except asyncio.CancelledError:
+      raise
+    except Exception as e:
+      self.stats.failed += 1
+      log.info("prefetch failed", extra={"url": url, "error": str(e)})
+    finally:
+      if self._tasks.get(key) is asyncio.current_task():
+        del self._tasks[key]
+
+  def observe_navigation(self, url: str, latency_s: float) -> None:
+    key = normalize_url(url)
+    warmed_at = self._warmed.pop(key, None)
+    if warmed_at is not None and time.monotonic() - warmed_at < self.warm_ttl_s:
+      if self.in_browser:
+        self.stats.hits += 1
+        self.stats.hit_s.append(latency_s)
+      else:
+        self.stats.http_warmed += 1
+        self.stats.http_warmed_s.append(latency_s)
+    elif key in self._tasks:
+      self.stats.late_hits += 1
+    else:
+      self.stats.misses += 1
+      self.stats.miss_s.append(latency_s)
+
+  async def aclose(self) -> None:
+    tasks = list(self._tasks.values())
+    for key in list(self._tasks):
+      self._cancel(key)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    self.stats.wasted += len(self._warmed)
+    self._warmed.clear()
+
+  def snapshot(self) -> dict[str, Any]:
+    return {**self.stats.snapshot(), "pending": len(self._tasks), "in_browser": self.in_browser}
+
+
+def mcp_warmer(server: Any, tool: str, session_id: str) -> Warmer:
+  async def _warm(url: str) -> Any:
+    return await server.direct_call_tool(tool, {"url": url, "sessionId": session_id})
+
+  return _warm
+
+
+class UnsafeURLError(ValueError):
+  """The URL is not a public http(s) page the worker may fetch."""
+
+
+async def check_public_url(url: str) -> str:
+  """Reject URLs that could reach the worker's own network (SSRF); returns a checked address of the host."""
+  parts = urlsplit(url)
+  if parts.scheme not in ("http", "https") or not parts.hostname or parts.username or parts.password:
+    raise UnsafeURLError(f"not a plain http(s) URL: {url}")
+  try:
+    port = parts.port
+  except ValueError:
+    raise UnsafeURLError(f"bad port: {url}") from None
+  if port not in (None, 80, 443):
+    raise UnsafeURLError(f"non-default port: {url}")
+  try:
+    infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port or 443, type=socket.SOCK_STREAM)
+  except OSError as e:
+    raise UnsafeURLError(f"cannot resolve {parts.hostname}: {e}") from None
+  addresses = [ipaddress.ip_address(str(info[4][0]).split("%", 1)[0]) for info in infos]
+  for address in addresses:
+    if not address.is_global:
+      raise UnsafeURLError(f"{parts.hostname} resolves to non-public address {address}")
+  if not addresses:
+    raise UnsafeURLError(f"cannot resolve {parts.hostname}")
+  return str(addresses[0])
+
+
+def pinned_request(url: str, address: str) -> tuple[str, dict[str, str], dict[str, Any]]:
+  """URL, headers and httpx extensions for fetching `url` from `address` without resolving its host again.
+
+  The Host header and TLS SNI (and so certificate verification) keep the original host name.
+  """
+  parts = urlsplit(url)
+  host = f"[{address}]" if ":" in address else address
+  netloc = host if parts.port is None else f"{host}:{parts.port}"
+  pinned = urlunsplit((parts.scheme, netloc, parts.path or "/", parts.query, ""))
+  return pinned, {"Host": parts.netloc}, {"sni_hostname": parts.hostname or ""}
+
+
+def http_warmer(timeout_s: float = 5.0) -> Warmer:
+  async def _warm(url: str) -> None:
+    address = await check_public_url(url)
+    # A second lookup at connect time could return another address (DNS rebinding)
+    pinned, headers, extensions = pinned_request(url, address)
+    # Redirects are not followed: their targets were never checked. No env proxies either
+    async with httpx.AsyncClient(timeout=timeout_s, follow_redirects=False, trust_env=False) as client:
+      # Headers and the first chunk are enough to warm the caches in front of the page
+      async with client.stream("GET", pinned, headers=headers, extensions=extensions) as r:
+        async for _ in r.aiter_raw(16384):
+          break
+
+  return _warm
+
+
+async def build_warmer(server: Any | None, session_id: str) -> tuple[Warmer, bool] | None:
+  """Warmer plus whether it loads pages in the learner's browser; None when there is no safe way to warm."""
+  tool = os.getenv("PREFETCH_MCP_TOOL", "browserbase_prefetch")
+  if server is not None and session_id and tool:
+    try:
+      names = {t.name for t in await server.list_tools()}
+    except Exception as e:
+      log.warning("failed to list MCP tools for prefetch", extra={"error": str(e)})
+      names = set()
+    if tool in names:
+      return mcp_warmer(server, tool, session_id), True
+  if os.getenv("PREFETCH_HTTP_WARM", "0").lower() in ("1", "true", "yes"):
+    return http_warmer(float(os.getenv("PREFETCH_HTTP_TIMEOUT_S", "5"))), False
+  return None
+
+
+def prefetch_enabled() -> bool:
+  return os.getenv("PREFETCH_ENABLE", "0").lower() in ("1", "true", "yes")
+
+
+async def build_prefetcher(server: Any | None, session_id: str) -> StepPrefetcher | None:
+  warmer = await build_warmer(server, session_id)
+  if warmer is None:
+    log.info("step prefetch off: MCP server has no prefetch tool and PREFETCH_HTTP_WARM is not set")
+    return None
+  warm, in_browser = warmer
+  return StepPrefetcher(
+    warm,
+    in_browser=in_browser,
+    max_concurrency=int(os.getenv("PREFETCH_MAX_CONCURRENCY", "2")),
+    max_urls=int(os.getenv("PREFETCH_MAX_URLS", "3")),
+    lookahead=int(os.getenv("PREFETCH_LOOKAHEAD", "1")),
+  )
@@ -0,0 +1,296 @@
+"""Opt-in event-loop stall watchdog and slow-turn stack sampler for the worker.
+
+Enabled with PROFILE_ENABLE=1. Two background threads watch the loop thread:
+
+- the stall watchdog notices when the loop has not run its heartbeat for
+  PROFILE_STALL_MS (default 100) and records the loop thread's stack for as
+  long as the stall lasts;
+- the sampler wakes up only once a turn has run longer than
+  PROFILE_SLOW_TURN_MS (default 4000) and then samples the loop thread every
+  PROFILE_SAMPLE_INTERVAL_MS (default 5) until the turn ends.
+
+A loop parked in `selectors.select` is waiting on I/O; anything else on top of
+the stack is CPU spent in the loop (history validation, JSON, logging...).
+
+Dumps go to PROFILE_DIR/<room>/: `stalls.collapsed` (weights in ms) and, per
+slow turn, `turn-<unix>-<n>-<ms>ms.collapsed` plus `.speedscope.json`. Open either with
+flamegraph.pl or https://www.speedscope.app.
+
+Overhead was measured with `python -m voice_bot.bench.profiler` on a loop that
+validates history between short sleeps. Neither the watchdog nor a sampler that
+stays on showed a throughput change outside the +-3% run-to-run noise. One
+sample of a 60-frame stack costs about 75 us with the GIL held, which is
+about 1.5% of the loop thread at a 5 ms interval. That cost applies only while
+a slow turn is being sampled. The watchdog wakes once every PROFILE_STALL_MS/4.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from pathlib import Path
+from types import FrameType
+from typing import Any, AsyncIterator
+
+
+log = logging.getLogger("agent")
+
+# Frames deeper than this are cut from the root side
+_MAX_DEPTH = 128
+
+
+def _frame_name(frame: FrameType) -> str:
+  code = frame.f_code
+  return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def thread_stack(thread_id: int) -> tuple[str, ...] | None:
+  """Stack of a thread as frame names, root first."""
+  frame = sys._current_frames().get(thread_id)
+  names: list[str] = []
+  while frame is not None and len(names) < _MAX_DEPTH:
+    names.append(_frame_name(frame))
+    frame = frame.f_back
+  return tuple(reversed(names)) if names else None
+
+
+def to_collapsed(stacks: Counter) -> str:
+  return "".join(f"{';'.join(stack)} {int(weight)}\n" for stack, weight in stacks.most_common())
+
+
+def to_speedscope(stacks: Counter, name: str, weight_unit_ms: float) -> dict[str, Any]:
+  frames: list[dict[str, str]] = []
+  index: dict[str, int] = {}
+  samples: list[list[int]] = []
+  weights: list[float] = []
+  for stack, count in stacks.items():
+    ids = []
+    for frame in stack:
+      if frame not in index:
+        index[frame] = len(frames)
+        frames.append({"name": frame})
+      ids.append(index[frame])
+    samples.append(ids)
+    weights.append(count * weight_unit_ms)
+  return {
+    "$schema": "https://www.speedscope.app/file-format-schema.json",
+    "name": name,
+    "exporter": "voice_bot.profiler",
+    "shared": {"frames": frames},
+    "profiles": [
+      {
+        "type": "sampled",
+        "name": name,
+        "unit": "milliseconds",
+        "startValue": 0,
+        "endValue": sum(weights),
+        "samples": samples,
+        "weights": weights,
+      }
+    ],
+  }
+
+
+class _Turn:
+  def __init__(self, room_id: str, seq: int) -> None:
+    self.room_id = room_id
+    self.seq = seq
+    self.started = time.monotonic()
+    self.sampling = False
+    self.stacks: Counter = Counter()
+
+
+class LoopProfiler:
+  """Stall watchdog plus slow-turn sampler for the thread running one asyncio loop."""
+
+  def __init__(self, out_dir: str | Path, *, stall_ms: float = 100.0, slow_turn_ms: float = 4000.0, sample_interval_ms: float = 5.0) -> None:
+    self.out_dir = Path(out_dir)
+    self.stall_s = stall_ms / 1000.0
+    self.slow_turn_s = slow_turn_ms / 1000.0
+    self.sample_interval_s = sample_interval_ms / 1000.0
+    self.room_id = "process"
+
+    self._loop: asyncio.AbstractEventLoop | None = None
+    self._loop_thread_id = 0
+    self._last_beat = 0.0
+    self._heartbeat: asyncio.Task | None = None
+    self._stop = threading.Event()
+    self._threads: list[threading.Thread] = []
+    self._turns: set[_Turn] = set()
+    self._turn_seq = 0
+    self._sampling = threading.Event()
+    self._lock = threading.Lock()
+
+    self.stalls = 0
+    self.stall_ms_total = 0.0
+    self.slow_turns = 0
+    self.samples = 0
+
+  def attach(self, loop: asyncio.AbstractEventLoop | None = None, room_id: str | None = None) -> None:
+    """Start watching; must be called from the loop's thread."""
+    if self._loop is not None:
+      return
+    self._loop = loop or asyncio.get_running_loop()
+    self._loop_thread_id = threading.get_ident()
+    # A worker process may serve another job after aclose(); start its threads afresh
+    self._stop.clear()
+    self._sampling.clear()
+    if room_id:
+      self.room_id = room_id
+    self._last_beat = time.monotonic()
+    self._heartbeat = self._loop.create_task(self._beat())
+    for target, name in ((self._watch_stalls, "stall-watchdog"), (self._sample_turns, "turn-sampler")):
+      thread = threading.Thread(target=target, name=name, daemon=True)
+      thread.start()
+      self._threads.append(thread)
+    log.info("loop profiler attached", extra={"stall_ms": self.stall_s * 1000, "slow_turn_ms": self.slow_turn_s * 1000})
+
+  async def aclose(self) -> None:
+    self._stop.set()
+    self._sampling.set()
+    if self._heartbeat is not None:
+      self._heartbeat.cancel()
+    for thread in self._threads:
+      await asyncio.to_thread(thread.join, 1.0)
+    self._threads.clear()
+    self._loop = None
+    log.info("loop profiler stats", extra=self.snapshot())
+
+  async def _beat(self) -> None:
+    interval = self.stall_s / 4
+    while True:
+      self._last_beat = time.monotonic()
+      await asyncio.sleep(interval)
+
+  def _room_dir(self, room_id: str) -> Path:
+    path = self.out_dir / re.sub(r"[^A-Za-z0-9._-]", "_", room_id)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+  def _watch_stalls(self) -> None:
+    check = self.stall_s / 4
+    pending_beat: float | None = None
+    stacks: Counter = Counter()
+    while not self._stop.wait(check):
+      beat = self._last_beat
+      if pending_beat is None:
+        if time.monotonic() - beat <= self.stall_s:
+          continue
+        pending_beat = beat
+      if beat == pending_beat:
+        # Still blocked: keep sampling so long stalls show where the time went
+        stack = thread_stack(self._loop_thread_id)
+        if stack:
+          stacks[stack] += 1
+        continue
+      # The loop ran again; subtract the heartbeat's own sleep between beats
+      duration_ms = max((beat - pending_beat) - self.stall_s / 4, 0.0) * 1000
+      self._record_stall(stacks, duration_ms)
+      pending_beat = None
+      stacks = Counter()
+
+  def _record_stall(self, stacks: Counter, duration_ms: float) -> None:
+    self.stalls += 1
+    self.stall_ms_total += duration_ms
+    total = sum(stacks.values()) or 1
+    # Spread the stall's duration over its samples so weights read as milliseconds
+    weighted = Counter({stack: max(round(duration_ms * n / total), 1) for stack, n in stacks.items()})
+    top = stacks.most_common(1)[0][0][-1] if stacks else "?"
+    log.warning("event loop stalled", extra={"stall_ms": round(duration_ms, 1), "top_frame": top, "lk_room": self.room_id})
+    try:
+      with open(self._room_dir(self.room_id) / "stalls.collapsed", "a") as f:
+        f.write(to_collapsed(weighted))
+    except OSError as e:
+      log.warning("failed to write stall profile", extra={"error": str(e)})
+
+  def _sample_turns(self) -> None:
+    while not self._stop.is_set():
+      self._sampling.wait()
+      if self._stop.is_set():
+        return
+      t0 = time.monotonic()
+      stack = thread_stack(self._loop_thread_id)
+      if stack:
+        with self._lock:
+          active = [t for t in self._turns if t.sampling]
+          for turn in active:
+            turn.stacks[stack] += 1
+          self.samples += 1 if active else 0
+      self._stop.wait(max(self.sample_interval_s - (time.monotonic() - t0), 0.0))
+
+  def _mark_slow(self, turn: _Turn) -> None:
+    with self._lock:
+      if turn not in self._turns:
+        return
+      turn.sampling = True
+      self.slow_turns += 1
+      self._sampling.set()
+    log.info("slow turn, sampling stacks", extra={"lk_room": turn.room_id, "turn": turn.seq})
+
+  def _dump_turn(self, turn: _Turn, elapsed_ms: float) -> None:
+    room_dir = self._room_dir(turn.room_id)
+    stem = f"turn-{int(time.time())}-{turn.seq}-{int(elapsed_ms)}ms"
+    (room_dir / f"{stem}.collapsed").write_text(to_collapsed(turn.stacks))
+    speedscope = to_speedscope(turn.stacks, f"{turn.room_id} {stem}", self.sample_interval_s * 1000)
+    (room_dir / f"{stem}.speedscope.json").write_text(json.dumps(speedscope))
+    log.info("wrote slow turn profile", extra={"lk_room": turn.room_id, "path": str(room_dir / stem), "samples": sum(turn.stacks.values())})
+
+  @asynccontextmanager
+  async def turn(self, room_id: str) -> AsyncIterator[None]:
+    """Bracket one turn; stacks are sampled only once it runs past the slow threshold."""
+    if self._loop is None:
+      yield
+      return
+    with self._lock:
+      self._turn_seq += 1
+      turn = _Turn(room_id or self.room_id, self._turn_seq)
+      self._turns.add(turn)
+    timer = self._loop.call_later(self.slow_turn_s, self._mark_slow, turn)
+    try:
+      yield
+    finally:
+      timer.cancel()
+      with self._lock:
+        self._turns.discard(turn)
+        if not any(t.sampling for t in self._turns):
+          self._sampling.clear()
+      if turn.sampling and turn.stacks:
+        elapsed_ms = (time.monotonic() - turn.started) * 1000
+        try:
+          await asyncio.to_thread(self._dump_turn, turn, elapsed_ms)
+        except OSError as e:
+          log.warning("failed to write turn profile", extra={"error": str(e)})
+
+  def snapshot(self) -> dict[str, Any]:
+    return {
+      "stalls": self.stalls,
+      "stall_ms_total": round(self.stall_ms_total, 1),
+      "slow_turns": self.slow_turns,
+      "samples": self.samples,
+    }
+
+
+def profiler_enabled() -> bool:
+  return os.getenv("PROFILE_ENABLE", "0").lower() in ("1", "true", "yes")
+
+
+@lru_cache()
+def get_profiler() -> LoopProfiler | None:
+  if not profiler_enabled():
+    return None
+  return LoopProfiler(
+    os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "browserteacher-profiles"),
+    stall_ms=float(os.getenv("PROFILE_STALL_MS", "100")),
+    slow_turn_ms=float(os.getenv("PROFILE_SLOW_TURN_MS", "4000")),
+    sample_interval_ms=float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")),
+  )
@@ -0,0 +1,175 @@
+"""Templated spoken progress for long action runs.
+
+While the action phase chains Browserbase calls, tool start/finish events are
+turned into short sentences from per-tool templates (no extra LLM calls) and
+rate-limited so the learner hears a steady trickle instead of a burst. A line
+that arrives too soon is held and spoken when the window opens, unless a newer
+line replaces it first:
+
+  ACTION_PROGRESS_ENABLE          default 1
+  ACTION_PROGRESS_FIRST_AFTER_S   quiet period after the narration (default 2.0)
+  ACTION_PROGRESS_MIN_INTERVAL_S  minimum gap between chunks (default 5.0)
+  ACTION_PROGRESS_MAX_CHUNKS      per action run (default 6)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+from urllib.parse import urlparse
+
+
+@dataclass(frozen=True)
+class ProgressTemplate:
+  start: str | None = None
+  finish: str | None = None
+  failed: str | None = "That didn't work, trying another way."
+
+
+# First matching pattern wins; {host} and {action} come from the tool arguments
+TEMPLATES: list[tuple[str, ProgressTemplate]] = [
+  ("browserbase_session_create", ProgressTemplate(failed=None)),
+  ("*navigate*", ProgressTemplate(start="Opening {host}.", finish="The page is loaded.")),
+  ("*stagehand_act*", ProgressTemplate(start="Now I'll {action}.")),
+  ("*extract*", ProgressTemplate(start="Reading what's on the page.")),
+  ("*observe*", ProgressTemplate(start="Looking over the page.")),
+  ("*screenshot*", ProgressTemplate(start="Taking a look at the screen.", failed=None)),
+  ("lesson_plan_*", ProgressTemplate(start="Updating your lesson plan.")),
+  ("lesson_step_toggle*", ProgressTemplate(start="Saving your progress.", failed=None)),
+  ("*", ProgressTemplate(start="Still working on it.")),
+]
+
+# Longest `action` argument spoken verbatim
+_MAX_ACTION_WORDS = 8
+
+
+def _template(tool_name: str) -> ProgressTemplate:
+  for pattern, template in TEMPLATES:
+    if fnmatch.fnmatchcase(tool_name, pattern):
+      return template
+  return ProgressTemplate()
+
+
+def _fields(args: dict[str, Any]) -> dict[str, str] | None:
+  url = str(args.get("url") or "")
+  host = urlparse(url).hostname or url
+  host = host.removeprefix("www.")
+  action = " ".join(str(args.get("action") or args.get("instruction") or "").split())
+  if action:
+    words = action.rstrip(".").split(" ")
+    if len(words) > _MAX_ACTION_WORDS:
+      return None
+    action = " ".join(words)
+    action = action[0].lower() + action[1:]
+  return {"host": host or "the page", "action": action or "do the next step"}
+
+
+def render(tool_name: str, args: dict[str, Any] | None, phase: str) -> str | None:
+  """Sentence for a tool event (`phase` is start, finish or failed), or None to stay quiet."""
+  text = getattr(_template(tool_name), phase)
+  if not text:
+    return None
+  fields = _fields(args or {})
+  if fields is None:
+    # Argument too long to read out; fall back to the generic line
+    return "Working on the next step." if phase == "start" else None
+  return text.format(**fields)
+
+
+class ProgressNarrator:
+  """Rate-limits progress lines and hands them to the chat() stream."""
+
+  def __init__(self, *, first_after_s: float = 2.0, min_interval_s: float = 5.0, max_chunks: int = 6) -> None:
+    self.first_after_s = first_after_s
+    self.min_interval_s = min_interval_s
+    self.max_chunks = max_chunks
+    self._queue: asyncio.Queue[str] = asyncio.Queue()
+    self._started = time.monotonic()
+    self._last_at: float | None = None
+    self._last_text = ""
+    self._announced: set[str] = set()
+    # Latest line held back by the timing windows: (text, tool name, phase), spoken by _timer
+    self._pending: tuple[str, str, str] | None = None
+    self._timer: asyncio.TimerHandle | None = None
+    self.emitted = 0
+    self.suppressed = 0
+
+  @classmethod
+  def from_env(cls) -> "ProgressNarrator":
+    return cls(
+      first_after_s=float(os.getenv("ACTION_PROGRESS_FIRST_AFTER_S", "2.0")),
+      min_interval_s=float(os.getenv("ACTION_PROGRESS_MIN_INTERVAL_S", "5.0")),
+      max_chunks=int(os.getenv("ACTION_PROGRESS_MAX_CHUNKS", "6")),
+    )
+
+  def tool_event(self, tool_name: str, args: dict[str, Any] | None, phase: str) -> None:
+    # A finish line only makes sense if the learner heard the start, or is about to
+    held_start = self._pending is not None and self._pending[1:] == (tool_name, "start")
+    if phase == "finish" and tool_name not in self._announced and not held_start:
+      return
+    self._announced.discard(tool_name)
+    text = render(tool_name, args, phase)
+    if text is None:
+      return
+    if text == self._last_text or self.emitted >= self.max_chunks:
+      self.suppressed += 1
+      return
+    if self._pending is not None:
+      self.suppressed += 1
+    self._pending = (text, tool_name, phase)
+    delay = self._opens_at() - time.monotonic()
+    if delay <= 0:
+      self._emit_pending()
+    elif self._timer is None:
+      self._timer = asyncio.get_running_loop().call_later(delay, self._emit_pending)
+
+  def _opens_at(self) -> float:
+    opens = self._started + self.first_after_s
+    if self._last_at is not None:
+      opens = max(opens, self._last_at + self.min_interval_s)
+    return opens
+
+  def _emit_pending(self) -> None:
+    if self._timer is not None:
+      self._timer.cancel()
+      self._timer = None
+    pending, self._pending = self._pending, None
+    if pending is None:
+      return
+    text, tool_name, phase = pending
+    self._last_at = time.monotonic()
+    self._last_text = text
+    self.emitted += 1
+    if phase == "start":
+      self._announced.add(tool_name)
+    self._queue.put_nowait(text)
+
+  async def relay(self, task: asyncio.Future) -> AsyncIterator[str]:
+    """Yield progress lines until `task` finishes; the caller awaits the task for its result."""
+    while not task.done():
+      getter = asyncio.ensure_future(self._queue.get())
+      try:
+        await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+      finally:
+        got = getter.done()
+        if not got:
+          getter.cancel()
+      if got:
+        yield getter.result()
+    # Lines held or queued after the last tool event are stale once the summary is ready
+    if self._timer is not None:
+      self._timer.cancel()
+      self._timer = None
+    if self._pending is not None:
+      self._pending = None
+      self.suppressed += 1
+    while not self._queue.empty():
+      self._queue.get_nowait()
+
+
+def progress_enabled() -> bool:
+  return os.getenv("ACTION_PROGRESS_ENABLE", "1").lower() in ("1", "true", "yes")
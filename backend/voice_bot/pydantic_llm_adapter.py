@@ -3,15 +3,26 @@ from __future__ import annotations
 from typing import AsyncIterator, Iterable, Optional
 import os
 import asyncio
+import time
+import contextlib
 from contextlib import asynccontextmanager, AsyncExitStack
 
 import logging
 from pydantic_ai import Agent as PAgent
 from pydantic_ai import Tool, RunContext
-from pydantic_ai.messages import ModelMessagesTypeAdapter
+from pydantic_ai.messages import (
+  FunctionToolCallEvent,
+  FunctionToolResultEvent,
+  ModelMessage,
+  ModelMessagesTypeAdapter,
+  ModelRequest,
+  ModelResponse,
+  RetryPromptPart,
+  TextPart,
+  UserPromptPart,
+)
 from pydantic_core import to_jsonable_python
 import httpx
-from pydantic_ai.mcp import MCPServerStreamableHTTP
 
 # LiveKit LLM base types
 from livekit.agents.llm.llm import LLM as LKLLM
@@ -19,6 +30,20 @@ from typing import Any
 from dataclasses import dataclass
 from livekit.agents import get_job_context
 from .schemas import LessonPlan, RoomIdOut, NarrationDecision
+from .llm_scheduler import LLMOverloadedError, Priority, room_task
+from .model_routing import get_model_routing
+from .mcp_tools import CachedMCPServerStreamableHTTP, phase_toolset
+from .room_log import RoomLog, RoomLogTail, decode_messages, encode_message, get_room_log, room_log_enabled
+from .profiler import get_profiler
+from .progress import ProgressNarrator, progress_enabled
+from .prefetch import StepPrefetcher, build_prefetcher, prefetch_enabled
+from .lesson_plans import LessonPlanCache, get_lesson_plan_cache, instantiate, lesson_plan_cache_enabled
+
+
+# Spoken when a phase runs out of its latency budget
+FALLBACK_NARRATION = "Sorry, that took me too long. Could you say that again?"
+FALLBACK_ACTION = "That is taking longer than expected. Ask me to continue when you are ready."
+FALLBACK_OVERLOADED = "I'm handling a lot right now. Please ask me again in a moment."
 
 
 @dataclass
@@ -74,7 +99,7 @@ class PydanticAgentLLM(LKLLM):
         logging.getLogger("agent").info("lesson_plan_get ok", extra={"has_plan": bool(data), "title": data.get("title", "")})
         return data
 
-    async def lesson_plan_upsert_tool(ctx: RunContext[Deps], plan: LessonPlan) -> dict:
+    async def _post_plan(ctx: RunContext[Deps], plan: LessonPlan) -> dict:
       base = ctx.deps.frontend_base
       sid = ctx.deps.convex_session_id
       async with httpx.AsyncClient(timeout=10.0) as client:
@@ -86,8 +111,51 @@ class PydanticAgentLLM(LKLLM):
         r.raise_for_status()
         data = r.json()
         logging.getLogger("agent").info("lesson_plan_upsert ok", extra={"_id": data.get("_id", "")})
+        # Warm-ups for the old plan's steps are re-planned after the turn
+        if self._prefetcher is not None:
+          self._prefetcher.invalidate()
         return data
 
+    async def lesson_plan_upsert_tool(ctx: RunContext[Deps], plan: LessonPlan) -> dict:
+      data = await _post_plan(ctx, plan)
+      room = ctx.deps.room_id
+      # The first plan written for a room becomes a template for the same goal
+      if self._plan_cache is not None and room not in self._plan_stored:
+        self._plan_stored.add(room)
+        miss_at = self._plan_miss_at.pop(room, None)
+        generation_s = time.monotonic() - miss_at if miss_at is not None else 0.0
+        try:
+          await asyncio.to_thread(self._plan_cache.store, plan, None, generation_s)
+        except Exception as e:
+          logging.getLogger("agent").warning("failed to store lesson plan template", extra={"lk_room": room, "error": str(e)})
+      return data
+
+    async def lesson_plan_from_template_tool(ctx: RunContext[Deps], goal: str, user_objective: str | None = None) -> dict:
+      """Create this session's lesson plan from a cached plan for the same learning goal.
+
+      Args:
+        goal: The learner's goal in their words, e.g. "learn CSS flexbox".
+        user_objective: What the learner wants to be able to do, if they said.
+      Returns: The stored plan, or {"error": "not_found"} when no plan matches; then write one with lesson_plan_upsert_tool.
+      """
+      cache = self._plan_cache
+      if cache is None:
+        return {"error": "not_found"}
+      t0 = time.perf_counter()
+      match = await asyncio.to_thread(cache.lookup, goal)
+      if match is None:
+        cache.record_miss()
+        self._plan_miss_at[ctx.deps.room_id] = time.monotonic()
+        return {"error": "not_found"}
+      data = await _post_plan(ctx, instantiate(match.template, goal, user_objective))
+      cache.record_hit(match, time.perf_counter() - t0)
+      self._plan_stored.add(ctx.deps.room_id)
+      logging.getLogger("agent").info(
+        "lesson plan from template",
+        extra={"lk_room": ctx.deps.room_id, "key": match.template.key, "score": round(match.score, 3), "exact": match.exact},
+      )
+      return data
+
     async def lesson_step_toggle_tool(ctx: RunContext[Deps], step_id: str, done: bool) -> dict:
       base = ctx.deps.frontend_base
       sid = ctx.deps.convex_session_id
@@ -104,9 +172,15 @@ class PydanticAgentLLM(LKLLM):
       Tool(session_get_tool),
       Tool(lesson_plan_get_tool),
       Tool(lesson_plan_upsert_tool),
+      Tool(lesson_plan_from_template_tool),
       Tool(lesson_step_toggle_tool),
     ]
 
+    # Lesson plan templates shared by every room on this node
+    self._plan_cache: LessonPlanCache | None = get_lesson_plan_cache() if lesson_plan_cache_enabled() else None
+    self._plan_miss_at: dict[str, float] = {}
+    self._plan_stored: set[str] = set()
+
     # Track ensured Browserbase sessions by room
     self._bb_session_ready: dict[str, bool] = {}
 
@@ -114,18 +188,28 @@ class PydanticAgentLLM(LKLLM):
     # Base prompt string + dynamic strict instructions (registered below)
     self._base_system_prompt = system_prompt or ""
 
+    # Each phase gets its routed (scheduled, optionally hedged) model; openai_model is the default
+    self._routing = get_model_routing()
+    action_model = self._routing.build_model(Priority.ACTION, openai_model)
+    narrate_model = self._routing.build_model(Priority.NARRATION, openai_model)
+
     if mcp_url:
-      server = MCPServerStreamableHTTP(url=mcp_url, process_tool_call=self._mcp_process_tool_call)
+      # Tool listing is cached per server URL/version; the action phase only sees its allowed tools
+      server = CachedMCPServerStreamableHTTP(
+        url=mcp_url,
+        version=os.getenv("BB_MCP_SERVER_VERSION", ""),
+        process_tool_call=self._mcp_process_tool_call,
+      )
       self._mcp_server = server
-      self._agent = PAgent(openai_model, system_prompt=self._base_system_prompt, deps_type=Deps, tools=tools, toolsets=[server])
+      self._agent = PAgent(action_model, system_prompt=self._base_system_prompt, deps_type=Deps, tools=tools, toolsets=[phase_toolset(server, Priority.ACTION)])
       # Allow MCP sampling to use this model
       self._agent.set_mcp_sampling_model()
     else:
       self._mcp_server = None
-      self._agent = PAgent(openai_model, system_prompt=self._base_system_prompt, deps_type=Deps, tools=tools)
+      self._agent = PAgent(action_model, system_prompt=self._base_system_prompt, deps_type=Deps, tools=tools)
 
     # A lightweight narration-only agent with no tools for Phase A
-    self._agent_narrate = PAgent(openai_model, system_prompt=self._base_system_prompt, deps_type=Deps, tools=[])
+    self._agent_narrate = PAgent(narrate_model, system_prompt=self._base_system_prompt, deps_type=Deps, tools=[])
 
     # Register dynamic system prompt to inject strict Browserbase session rules per run
     @self._agent.system_prompt
@@ -144,6 +228,15 @@ class PydanticAgentLLM(LKLLM):
       )
       return strict
 
+    # Validated history per room, backed by the local append log and kept in
+    # step with the frontend copy by sequence number
+    self._room_log: RoomLog | None = get_room_log() if room_log_enabled() else None
+    self._history: dict[str, list[ModelMessage]] = {}
+
+    # Warms the next lesson step's pages between turns (PREFETCH_ENABLE)
+    self._prefetcher: StepPrefetcher | None = None
+    self._prefetch_refresh: asyncio.Task | None = None
+
     # Persistent context management
     self._entered: bool = False
     self._exit_stack: AsyncExitStack | None = None
@@ -157,6 +250,14 @@ class PydanticAgentLLM(LKLLM):
     await self._exit_stack.enter_async_context(self._agent)
     self._entered = True
 
+    # Resume history before the first reply; drop logs of rooms that have ended
+    if self._room_log is not None:
+      try:
+        await asyncio.to_thread(self._room_log.compact)
+        await self._load_history(room_id)
+      except Exception as e:
+        logging.getLogger("agent").warning("failed to resume room history", extra={"lk_room": room_id, "error": str(e)})
+
     # Proactively ensure Browserbase session is bound to this MCP connection
     base = os.getenv("FRONTEND_API_BASE", "http://localhost:3000")
     bb_session_id = ""
@@ -176,16 +277,53 @@ class PydanticAgentLLM(LKLLM):
       except Exception as e:
         logging.getLogger("agent").warning("failed to pre-bind Browserbase session", extra={"lk_room": room_id, "error": str(e)})
 
+    if prefetch_enabled():
+      self._prefetcher = await build_prefetcher(self._mcp_server, bb_session_id)
+
   async def close(self) -> None:
     if not self._entered:
       return
     try:
+      # Stop warm-ups before the MCP connection they may be using goes away
+      if self._prefetch_refresh is not None:
+        self._prefetch_refresh.cancel()
+      if self._prefetcher is not None:
+        await self._prefetcher.aclose()
+        logging.getLogger("agent").info("step prefetch stats", extra=self._prefetcher.snapshot())
       assert self._exit_stack is not None
       await self._exit_stack.aclose()
     finally:
       self._entered = False
       self._exit_stack = None
 
+  async def _refresh_prefetch(self, deps: Deps) -> None:
+    # Read the plan after the turn so new plans and toggled steps are picked up
+    try:
+      async with httpx.AsyncClient(timeout=10.0) as client:
+        r = await client.get(f"{deps.frontend_base}/api/lesson/plan", params={"sessionId": deps.convex_session_id})
+      plan = r.json() if r.status_code == 200 else None
+    except Exception as e:
+      logging.getLogger("agent").warning("failed to read lesson plan for prefetch", extra={"lk_room": deps.room_id, "error": str(e)})
+      return
+    if self._prefetcher is not None:
+      self._prefetcher.update(plan)
+
+  @asynccontextmanager
+  async def _prefetch_turn(self, deps: Deps):
+    # Prefetches only start while no turn is running, and are re-planned when it ends
+    prefetcher = self._prefetcher
+    if prefetcher is None or not deps.convex_session_id:
+      yield
+      return
+    prefetcher.pause()
+    try:
+      yield
+    finally:
+      prefetcher.resume()
+      if self._prefetch_refresh is not None:
+        self._prefetch_refresh.cancel()
+      self._prefetch_refresh = asyncio.create_task(self._refresh_prefetch(deps))
+
   async def _fetch_history(self, room_id: str, limit: int = 1000000) -> list:
     # Fetch Pydantic message JSON array from Next.js route
     async with httpx.AsyncClient(timeout=10.0) as client:
@@ -194,10 +332,95 @@ class PydanticAgentLLM(LKLLM):
       r.raise_for_status()
       return r.json()
 
-  async def _append_history(self, room_id: str, new_messages: list) -> None:
+  async def _fetch_history_since(self, room_id: str, after_seq: int) -> dict | None:
+    # None when the frontend cannot reconcile by seq (older deployment or legacy rows)
     async with httpx.AsyncClient(timeout=10.0) as client:
       base = os.getenv("FRONTEND_API_BASE", "http://localhost:3000")
-      await client.post(f"{base}/api/messages/append_json", json={"roomId": room_id, "messagesJson": new_messages})
+      r = await client.get(f"{base}/api/messages/history_since", params={"roomId": room_id, "afterSeq": str(after_seq)})
+      if r.status_code == 404:
+        return None
+      r.raise_for_status()
+      data = r.json()
+      return data if isinstance(data, dict) and data.get("lastSeq") is not None else None
+
+  async def _resume_history(self, room_id: str) -> list[ModelMessage] | None:
+    assert self._room_log is not None
+    t0 = time.perf_counter()
+    tail = await asyncio.to_thread(self._room_log.read, room_id)
+    remote = await self._fetch_history_since(room_id, tail.last_seq)
+    if remote is not None and int(remote["lastSeq"]) < tail.last_seq:
+      # The frontend copy is behind the local log (e.g. reset); it is the source of truth
+      await asyncio.to_thread(self._room_log.drop, room_id)
+      tail = RoomLogTail()
+      remote = await self._fetch_history_since(room_id, -1)
+    if remote is None:
+      return None
+    delta = [(int(m["seq"]), encode_message(m["message"])) for m in remote.get("messages") or []]
+    if delta:
+      await asyncio.to_thread(self._room_log.append, room_id, delta)
+    messages = decode_messages(tail.payloads + [payload for _, payload in delta])
+    logging.getLogger("agent").info(
+      "resumed room history",
+      extra={"lk_room": room_id, "local": len(tail.payloads), "remote": len(delta), "ms": round((time.perf_counter() - t0) * 1000, 1)},
+    )
+    return messages
+
+  async def _load_history(self, room_id: str) -> list[ModelMessage]:
+    if not room_id:
+      return []
+    cached = self._history.get(room_id)
+    if cached is not None:
+      return list(cached)
+    messages: list[ModelMessage] | None = None
+    if self._room_log is not None:
+      try:
+        messages = await self._resume_history(room_id)
+      except Exception as e:
+        logging.getLogger("agent").warning("room log resume failed, using remote history", extra={"lk_room": room_id, "error": str(e)})
+    if messages is None:
+      history_json = await self._fetch_history(room_id)
+      return ModelMessagesTypeAdapter.validate_python(history_json) if history_json else []
+    self._history[room_id] = messages
+    return list(messages)
+
+  async def _append_history(self, room_id: str, new_messages: list) -> None:
+    try:
+      async with httpx.AsyncClient(timeout=10.0) as client:
+        base = os.getenv("FRONTEND_API_BASE", "http://localhost:3000")
+        r = await client.post(f"{base}/api/messages/append_json", json={"roomId": room_id, "messagesJson": new_messages})
+    except Exception:
+      self._history.pop(room_id, None)
+      raise
+    cached = self._history.get(room_id)
+    if cached is None or self._room_log is None:
+      return
+    first_seq = None
+    if r.status_code == 200:
+      with contextlib.suppress(Exception):
+        first_seq = int(r.json()["firstSeq"])
+    last_seq = await asyncio.to_thread(self._room_log.last_seq, room_id)
+    if first_seq is None or first_seq != last_seq + 1:
+      # Failed append or another writer got in between: re-resume on the next turn
+      self._history.pop(room_id, None)
+      return
+    records = [(first_seq + i, encode_message(m)) for i, m in enumerate(new_messages)]
+    await asyncio.to_thread(self._room_log.append, room_id, records)
+    cached.extend(ModelMessagesTypeAdapter.validate_python(new_messages))
+
+  async def _within_budget(self, phase: Priority, coro):
+    budget = self._routing.route(phase).budget_s
+    if budget <= 0:
+      return await coro
+    try:
+      return await asyncio.wait_for(coro, budget)
+    except asyncio.TimeoutError:
+      self._routing.route(phase).stats.budget_exceeded += 1
+      logging.getLogger("agent").warning("phase exceeded latency budget", extra={"phase": phase.name, "budget_s": budget})
+      raise
+
+  def _fallback_messages(self, prompt: str, reply: str) -> list:
+    # Keep stored history coherent when a phase is cut short: the prompt and what was spoken
+    return to_jsonable_python([ModelRequest(parts=[UserPromptPart(content=prompt)]), ModelResponse(parts=[TextPart(content=reply)])])
 
   async def _agent_run(self, agent: PAgent, *, user_prompt: str, message_history: list, deps: Deps | None) -> tuple[str, list]:
     if self._entered and agent is self._agent:
@@ -208,8 +431,7 @@ class PydanticAgentLLM(LKLLM):
     return (result.output or "", to_jsonable_python(result.new_messages()))
 
   async def _run_narration(self, room_id: str, user_prompt: str, deps: Deps | None) -> NarrationDecision:
-    history_json = await self._fetch_history(room_id) if room_id else []
-    history = ModelMessagesTypeAdapter.validate_python(history_json) if history_json else []
+    history = await self._load_history(room_id)
     # Ask only for narration; tools are disabled by using the narration agent
     # Return typed decision using Pydantic AI result_type, no manual JSON parsing
     prompt = (
@@ -222,26 +444,63 @@ class PydanticAgentLLM(LKLLM):
       f"User request: {user_prompt}\n"
       "Respond with a concise narration and the act flag."
     )
-    if self._entered:
-      result = await self._agent_narrate.run(prompt, message_history=history, deps=deps, output_type=NarrationDecision)
-    else:
+    async def _run():
+      if self._entered:
+        return await self._agent_narrate.run(prompt, message_history=history, deps=deps, output_type=NarrationDecision)
       async with self._agent_narrate:
-        result = await self._agent_narrate.run(prompt, message_history=history, deps=deps, output_type=NarrationDecision)
+        return await self._agent_narrate.run(prompt, message_history=history, deps=deps, output_type=NarrationDecision)
+
+    try:
+      result = await self._within_budget(Priority.NARRATION, _run())
+    except asyncio.TimeoutError:
+      # Keep the learner hearing something, but never act without the narration decision
+      if room_id:
+        await self._append_history(room_id, self._fallback_messages(prompt, FALLBACK_NARRATION))
+      return NarrationDecision(message=FALLBACK_NARRATION, act=False)
+    except LLMOverloadedError as e:
+      logging.getLogger("agent").warning("narration shed by LLM scheduler", extra={"lk_room": room_id, "error": str(e)})
+      return NarrationDecision(message=FALLBACK_OVERLOADED, act=False)
     new_msgs = to_jsonable_python(result.new_messages())
     if room_id and new_msgs:
       await self._append_history(room_id, new_msgs)
     return result.output or NarrationDecision(message="", act=False)
 
-  async def _run_action(self, room_id: str, deps: Deps) -> str:
-    history_json = await self._fetch_history(room_id) if room_id else []
-    history = ModelMessagesTypeAdapter.validate_python(history_json) if history_json else []
+  async def _iter_action(self, prompt: str, history: list, deps: Deps, narrator: ProgressNarrator | None):
+    # Walk the graph node by node so tool calls can be narrated as they start and finish
+    async with self._agent.iter(prompt, message_history=history, deps=deps) as run:
+      async for node in run:
+        if narrator is None or not PAgent.is_call_tools_node(node):
+          continue
+        async with node.stream(run.ctx) as events:
+          async for event in events:
+            if isinstance(event, FunctionToolCallEvent):
+              # Malformed args are the tool's problem; narration falls back to the tool name
+              try:
+                args = event.part.args_as_dict()
+              except Exception:
+                args = {}
+              narrator.tool_event(event.part.tool_name, args, "start")
+            elif isinstance(event, FunctionToolResultEvent):
+              failed = isinstance(event.result, RetryPromptPart)
+              narrator.tool_event(event.result.tool_name or "", None, "failed" if failed else "finish")
+    return run.result
+
+  async def _run_action(self, room_id: str, deps: Deps, narrator: ProgressNarrator | None = None) -> str:
+    history = await self._load_history(room_id)
     # Perform the narrated actions now; keep result summary short
     prompt = "Proceed to act as narrated. Do not restate the plan. Use tools to complete the step, then reply with one short sentence summary."
-    if self._entered:
-      result = await self._agent.run(prompt, message_history=history, deps=deps)
-    else:
+    async def _run():
+      if self._entered:
+        return await self._iter_action(prompt, history, deps, narrator)
       async with self._agent:
-        result = await self._agent.run(prompt, message_history=history, deps=deps)
+        return await self._iter_action(prompt, history, deps, narrator)
+
+    try:
+      result = await self._within_budget(Priority.ACTION, _run())
+    except asyncio.TimeoutError:
+      if room_id:
+        await self._append_history(room_id, self._fallback_messages(prompt, FALLBACK_ACTION))
+      return FALLBACK_ACTION
     new_msgs = to_jsonable_python(result.new_messages())
     if room_id and new_msgs:
       await self._append_history(room_id, new_msgs)
@@ -343,24 +602,42 @@ class PydanticAgentLLM(LKLLM):
     add_message = getattr(chat_ctx, "add_message", None)
 
     async def _gen():
-      # Phase A: narrate with decision
-      decision = await self._run_narration(room_id, prompt, deps)
-      if callable(add_message) and decision.message:
-        maybe = add_message(role="assistant", content=decision.message)
-        if asyncio.iscoroutine(maybe):
-          await maybe
-      if decision.message:
-        yield decision.message
-
-      # Phase B: act only if requested
-      if decision.act:
-        act = await self._run_action(room_id, deps)
-        if callable(add_message) and act:
-          maybe = add_message(role="assistant", content=act)
+      # Slow turns get their stacks sampled when PROFILE_ENABLE is set
+      profiler = get_profiler()
+      async with (profiler.turn(room_id) if profiler is not None else contextlib.nullcontext()), self._prefetch_turn(deps):
+        # Phase A: narrate with decision. Both phases run in tasks of their own so the
+        # scheduler sees this turn's room, whichever task consumes the stream
+        decision = await room_task(room_id, self._run_narration(room_id, prompt, deps))
+        if callable(add_message) and decision.message:
+          maybe = add_message(role="assistant", content=decision.message)
           if asyncio.iscoroutine(maybe):
             await maybe
-        if act:
-          yield act
+        if decision.message:
+          yield decision.message
+
+        # Phase B: act only if requested
+        if decision.act:
+          narrator = ProgressNarrator.from_env() if progress_enabled() else None
+          action = room_task(room_id, self._run_action(room_id, deps, narrator))
+          try:
+            if narrator is not None:
+              # Spoken progress lines while the action runs; not added to history
+              async for line in narrator.relay(action):
+                yield line
+            act = await action
+          except LLMOverloadedError as e:
+            logging.getLogger("agent").warning("action shed by LLM scheduler", extra={"lk_room": room_id, "error": str(e)})
+            act = FALLBACK_OVERLOADED
+          finally:
+            # The consumer may stop reading mid-action (user interrupted)
+            if not action.done():
+              action.cancel()
+          if callable(add_message) and act:
+            maybe = add_message(role="assistant", content=act)
+            if asyncio.iscoroutine(maybe):
+              await maybe
+          if act:
+            yield act
 
     try:
       yield _gen()
@@ -414,6 +691,13 @@ class PydanticAgentLLM(LKLLM):
         pass
     except Exception:
       pass
+    url = tool_args.get("url")
+    if self._prefetcher is not None and "navigate" in name and url:
+      # Navigate latency feeds the prefetch hit/miss stats
+      t0 = time.perf_counter()
+      result = await call_tool(name, tool_args, None)
+      self._prefetcher.observe_navigation(str(url), time.perf_counter() - t0)
+      return result
     return await call_tool(name, tool_args, None)
 
 
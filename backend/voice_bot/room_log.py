@@ -0,0 +1,220 @@
+"""Durable per-room append log of Pydantic AI message history on the worker's disk.
+
+Each room gets a directory of append-only segment files. A segment starts with a
+small header and holds records of
+
+  u32 payload length | u64 seq | u32 crc32(payload) | payload (compact message JSON)
+
+where `seq` is the sequence number the frontend (Convex) assigned to the message.
+Segments are memory-mapped for reads; a torn or corrupt tail left by a crash is
+cut off at the first bad record. Resume decodes all payloads with one
+`validate_json` call, which is several times faster than fetching the history
+over HTTP and validating it from Python objects.
+
+  ROOM_LOG_DIR            where room directories live
+  ROOM_LOG_SEGMENT_BYTES  roll to a new segment past this size (default 4 MiB)
+  ROOM_LOG_TTL_S          compaction drops rooms idle longer than this (default 6h)
+  ROOM_LOG_FSYNC          fsync after each append (default off; a crashed worker
+                          process still leaves its writes in the page cache)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable
+
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
+
+
+log = logging.getLogger("agent")
+
+_MAGIC = b"BTRL"
+_VERSION = 1
+_SEGMENT_HEADER = struct.Struct("<4sH")
+_RECORD = struct.Struct("<IQI")
+_SEGMENT_SUFFIX = ".seg"
+
+
+@dataclass
+class RoomLogTail:
+  """What is on disk for a room: payloads in seq order and the last seq (-1 when empty)."""
+
+  last_seq: int = -1
+  payloads: list[bytes] = field(default_factory=list)
+
+  def messages(self) -> list[ModelMessage]:
+    return decode_messages(self.payloads)
+
+
+def encode_message(message_json: Any) -> bytes:
+  return json.dumps(message_json, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def decode_messages(payloads: list[bytes]) -> list[ModelMessage]:
+  if not payloads:
+    return []
+  return ModelMessagesTypeAdapter.validate_json(b"[" + b",".join(payloads) + b"]")
+
+
+def _room_dirname(room_id: str) -> str:
+  # Readable prefix for operators, hash suffix so sanitizing never collides
+  safe = re.sub(r"[^A-Za-z0-9._-]", "_", room_id)[:64]
+  return f"{safe}-{hashlib.sha1(room_id.encode()).hexdigest()[:8]}"
+
+
+class RoomLog:
+  """Segment-based append log, one directory per room. Thread-safe; calls block on disk I/O."""
+
+  def __init__(self, root: str | Path, *, segment_bytes: int = 4 << 20, ttl_s: float = 6 * 3600, fsync: bool = False) -> None:
+    self.root = Path(root)
+    self.segment_bytes = segment_bytes
+    self.ttl_s = ttl_s
+    self.fsync = fsync
+    self.root.mkdir(parents=True, exist_ok=True)
+    self._lock = threading.RLock()
+    self._last_seq: dict[str, int] = {}
+
+  def _dir(self, room_id: str) -> Path:
+    return self.root / _room_dirname(room_id)
+
+  def _segments(self, room_dir: Path) -> list[Path]:
+    if not room_dir.is_dir():
+      return []
+    return sorted(p for p in room_dir.iterdir() if p.suffix == _SEGMENT_SUFFIX)
+
+  def _read_segment(self, path: Path, after_seq: int, out: list[bytes]) -> int:
+    """Append valid payloads with seq > after_seq to `out`; returns the last valid seq."""
+    last = after_seq
+    with open(path, "r+b") as f:
+      size = os.fstat(f.fileno()).st_size
+      if size < _SEGMENT_HEADER.size:
+        return last
+      with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version = _SEGMENT_HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+          raise ValueError(f"unsupported room log segment {path.name}")
+        pos = _SEGMENT_HEADER.size
+        while pos + _RECORD.size <= size:
+          length, seq, crc = _RECORD.unpack_from(mm, pos)
+          end = pos + _RECORD.size + length
+          if end > size:
+            break
+          payload = mm[pos + _RECORD.size:end]
+          if zlib.crc32(payload) != crc or seq <= last:
+            break
+          out.append(payload)
+          last = seq
+          pos = end
+      if pos < size:
+        # Torn write or corruption: drop the tail so later appends stay readable
+        log.warning("truncating corrupt room log tail", extra={"segment": str(path), "offset": pos, "size": size})
+        f.truncate(pos)
+    return last
+
+  def read(self, room_id: str) -> RoomLogTail:
+    with self._lock:
+      tail = RoomLogTail()
+      try:
+        for path in self._segments(self._dir(room_id)):
+          tail.last_seq = self._read_segment(path, tail.last_seq, tail.payloads)
+      except (OSError, ValueError) as e:
+        log.warning("discarding unreadable room log", extra={"lk_room": room_id, "error": str(e)})
+        self._drop_locked(room_id)
+        return RoomLogTail()
+      self._last_seq[room_id] = tail.last_seq
+      return tail
+
+  def last_seq(self, room_id: str) -> int:
+    with self._lock:
+      if room_id not in self._last_seq:
+        return self.read(room_id).last_seq
+      return self._last_seq[room_id]
+
+  def append(self, room_id: str, records: Iterable[tuple[int, bytes]]) -> int:
+    """Append (seq, payload) records with increasing seqs; returns the new last seq."""
+    with self._lock:
+      room_dir = self._dir(room_id)
+      room_dir.mkdir(parents=True, exist_ok=True)
+      last = self._last_seq.get(room_id, -1)
+      segments = self._segments(room_dir)
+      path = segments[-1] if segments else None
+      buf = bytearray()
+      first = -1
+      for seq, payload in records:
+        if seq <= last:
+          raise ValueError(f"room log seq {seq} is not after {last}")
+        if first < 0:
+          first = seq
+        buf += _RECORD.pack(len(payload), seq, zlib.crc32(payload))
+        buf += payload
+        last = seq
+      if not buf:
+        return last
+      if path is None or path.stat().st_size >= self.segment_bytes:
+        path = room_dir / f"{first:020d}{_SEGMENT_SUFFIX}"
+        buf = bytearray(_SEGMENT_HEADER.pack(_MAGIC, _VERSION)) + buf
+      with open(path, "ab") as f:
+        f.write(buf)
+        if self.fsync:
+          f.flush()
+          os.fsync(f.fileno())
+      self._last_seq[room_id] = last
+      return last
+
+  def _drop_locked(self, room_id: str) -> None:
+    shutil.rmtree(self._dir(room_id), ignore_errors=True)
+    self._last_seq.pop(room_id, None)
+
+  def drop(self, room_id: str) -> None:
+    with self._lock:
+      self._drop_locked(room_id)
+
+  def compact(self, now: float | None = None) -> int:
+    """Drop the segments of rooms with no writes for `ttl_s`; returns rooms removed."""
+    now = time.time() if now is None else now
+    removed = 0
+    with self._lock:
+      for room_dir in self.root.iterdir():
+        if not room_dir.is_dir():
+          continue
+        try:
+          mtime = max((p.stat().st_mtime for p in room_dir.iterdir()), default=room_dir.stat().st_mtime)
+        except OSError:
+          continue
+        if now - mtime > self.ttl_s:
+          shutil.rmtree(room_dir, ignore_errors=True)
+          removed += 1
+          # Other rooms keep their cached seq, so last_seq() never rescans after a compaction
+          for room_id in [r for r in self._last_seq if _room_dirname(r) == room_dir.name]:
+            del self._last_seq[room_id]
+    if removed:
+      log.info("compacted room log", extra={"rooms_removed": removed})
+    return removed
+
+
+def room_log_enabled() -> bool:
+  return os.getenv("ROOM_LOG_ENABLE", "1").lower() in ("1", "true", "yes")
+
+
+@lru_cache()
+def get_room_log() -> RoomLog:
+  return RoomLog(
+    os.getenv("ROOM_LOG_DIR") or os.path.join(tempfile.gettempdir(), "browserteacher-room-log"),
+    segment_bytes=int(os.getenv("ROOM_LOG_SEGMENT_BYTES", str(4 << 20))),
+    ttl_s=float(os.getenv("ROOM_LOG_TTL_S", str(6 * 3600))),
+    fsync=os.getenv("ROOM_LOG_FSYNC", "0").lower() in ("1", "true", "yes"),
+  )
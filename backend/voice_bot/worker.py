@@ -1,5 +1,8 @@
+import asyncio
 import logging
 import os
+import importlib
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import httpx
 import os
@@ -19,10 +22,9 @@ from livekit.agents import (
   metrics,
 )
 
-from livekit.agents import function_tool, RunContext, ToolError, get_job_context, mcp
-from livekit.plugins import noise_cancellation, openai, silero, deepgram, cartesia
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
-from .pydantic_llm_adapter import PydanticAgentLLM
+from livekit.agents import function_tool, RunContext, ToolError, get_job_context
+from .prompts import ASSISTANT_SYSTEM_PROMPT
+from .profiler import get_profiler
 from api.core.config import get_settings
 
 
@@ -32,47 +34,98 @@ logger = logging.getLogger("agent")
 load_dotenv(".env.local")
 
 
-# Optional Logfire instrumentation
-with contextlib.suppress(Exception):
-  if os.getenv("LOGFIRE_ENABLE", "1").lower() in ("1", "true", "yes"):
-    import logfire
+# Plugins and adapters are imported on demand so a worker only pays for the
+# providers it is configured with. The supervisor imports them once on the main
+# thread (plugin registration requires it), which also makes the forkserver
+# preload exactly these packages for every job process.
+_STT_PLUGINS = {"deepgram": "livekit.plugins.deepgram", "openai": "livekit.plugins.openai"}
+_TTS_PLUGINS = {"cartesia": "livekit.plugins.cartesia", "openai": "livekit.plugins.openai"}
 
-    logfire.configure(scrubbing=False)
-    # Instrument Pydantic AI and HTTPX for full visibility of prompts, tools, and HTTP calls
-    logfire.instrument_pydantic_ai()
-    logfire.instrument_httpx(capture_all=True)
 
+def _env_flag(name: str, default: str) -> bool:
+  return os.getenv(name, default).lower() in ("1", "true", "yes")
 
-ASSISTANT_SYSTEM_PROMPT = (
-  """
-You are BrowserTeacher. You teach software by operating a browser for the user. You speak clearly, briefly, and continuously. You receive speech-to-text input and your replies are text for text-to-speech. Do not use markdown, lists, or code blocks. Keep sentences short.
 
-Interaction style:
-- First narrate what you will do in 1–2 short sentences.
-- Then do the action with tools.
-- After tools finish, say one short sentence about the result.
-- If an action will be long, say brief progress updates between steps.
+def use_pydantic_llm() -> bool:
+  return _env_flag("USE_PYDANTIC_LLM", "0")
 
-Tool rules:
-- Browser session is already prepared and kept alive. Do not invent session ids.
-- Call browserbase_session_create only if the session is not yet bound.
-- For all Browserbase tools, use the already bound session. Do not generate placeholder ids.
 
-Lesson plan rules:
-- After the user states a learning goal, create a lesson plan using the lesson plan tool. Include steps with conceptTitle, description, objective, order.
-- When you complete or undo a concept, update its done state with the lesson step toggle tool immediately.
-- Assume Convex updates the UI in real time; mention only what changed unless the user asks for the full plan.
+def configured_plugins() -> list[str]:
+  """Plugin modules needed by the configured STT/TTS/LLM providers."""
+  stt = os.getenv("LIVEKIT_STT_PROVIDER", "deepgram")
+  tts = os.getenv("LIVEKIT_TTS_PROVIDER", "cartesia")
+  if stt not in _STT_PLUGINS:
+    raise ValueError(f"unsupported LIVEKIT_STT_PROVIDER: {stt}")
+  if tts not in _TTS_PLUGINS:
+    raise ValueError(f"unsupported LIVEKIT_TTS_PROVIDER: {tts}")
+  modules = ["livekit.plugins.silero", "livekit.plugins.turn_detector.multilingual", _STT_PLUGINS[stt], _TTS_PLUGINS[tts]]
+  if not use_pydantic_llm():
+    modules.append("livekit.plugins.openai")
+  if _env_flag("NOISE_CANCELLATION", "1"):
+    modules.append("livekit.plugins.noise_cancellation")
+  return list(dict.fromkeys(modules))
 
-Voice UX rules:
-- Never pause silently for long. Narrate first, then act, then summarize.
-- Keep each spoken part concise. Prefer two short sentences over one long sentence.
-- Avoid filler words.
 
-Safety:
-- Ask one clarifying question only when truly necessary.
-- If a tool fails, say a short error and the next action.
-"""
-)
+def import_plugins() -> None:
+  for module in configured_plugins():
+    importlib.import_module(module)
+
+
+_logfire_configured = False
+
+
+def configure_logfire() -> None:
+  """Optional Logfire instrumentation, configured once per process."""
+  global _logfire_configured
+  if _logfire_configured:
+    return
+  _logfire_configured = True
+  with contextlib.suppress(Exception):
+    if _env_flag("LOGFIRE_ENABLE", "1"):
+      import logfire
+
+      logfire.configure(scrubbing=False)
+      # Instrument Pydantic AI and HTTPX for full visibility of prompts, tools, and HTTP calls
+      if use_pydantic_llm():
+        logfire.instrument_pydantic_ai()
+      logfire.instrument_httpx(capture_all=True)
+
+
+def _build_stt():
+  provider = os.getenv("LIVEKIT_STT_PROVIDER", "deepgram")
+  if provider == "openai":
+    from livekit.plugins import openai
+
+    return openai.STT(model=os.getenv("LIVEKIT_DEFAULT_STT", "gpt-4o-transcribe"))
+  from livekit.plugins import deepgram
+
+  return deepgram.STT(model=os.getenv("LIVEKIT_DEFAULT_STT", "nova-3"), language="multi")
+
+
+def _build_tts():
+  provider = os.getenv("LIVEKIT_TTS_PROVIDER", "cartesia")
+  if provider == "openai":
+    from livekit.plugins import openai
+
+    return openai.TTS(voice=os.getenv("LIVEKIT_DEFAULT_TTS_VOICE", "alloy"))
+  from livekit.plugins import cartesia
+
+  return cartesia.TTS(voice=os.getenv("LIVEKIT_DEFAULT_TTS_VOICE", "6f84f4b8-58a2-430c-8c79-688dad597532"))
+
+
+def _load_vad():
+  from livekit.plugins import silero
+
+  return silero.VAD.load()
+
+
+def _load_turn_detector_languages() -> None:
+  # MultilingualModel needs a job context, so only its per-language thresholds
+  # (and the huggingface_hub import behind them) can be resolved ahead of time
+  from huggingface_hub import hf_hub_download
+  from livekit.plugins.turn_detector.models import HG_MODEL, MODEL_REVISIONS
+
+  hf_hub_download(HG_MODEL, "languages.json", revision=MODEL_REVISIONS["multilingual"], local_files_only=True)
 
 
 class Assistant(Agent):
@@ -178,37 +231,64 @@ class Assistant(Agent):
 
 
 def prewarm(proc: JobProcess):
-  proc.userdata["vad"] = silero.VAD.load()
+  # Imports stay on the main thread; the model loads are blocking I/O + ONNX
+  # session setup, so run them side by side
+  import_plugins()
+  configure_logfire()
+  with ThreadPoolExecutor(max_workers=2, thread_name_prefix="prewarm") as pool:
+    vad = pool.submit(_load_vad)
+    turn_detector = pool.submit(_load_turn_detector_languages)
+    if use_pydantic_llm():
+      from . import pydantic_llm_adapter  # noqa: F401
+    proc.userdata["vad"] = vad.result()
+    try:
+      turn_detector.result()
+    except Exception as e:
+      logger.warning(f"turn detector files not cached, run `download-files`: {e}")
 
 
 async def entrypoint(ctx: JobContext):
   ctx.log_context_fields = {"room": ctx.room.name}
 
+  # Opt-in stall watchdog / slow-turn sampler (PROFILE_ENABLE=1)
+  profiler = get_profiler()
+  if profiler is not None:
+    profiler.attach(asyncio.get_running_loop(), ctx.room.name)
+    ctx.add_shutdown_callback(profiler.aclose)
+
   settings = get_settings()
 
   # Toggle between built-in OpenAI LLM and the Pydantic AI wrapper via env
-  use_pydantic = os.getenv("USE_PYDANTIC_LLM", "0").lower() in ("1", "true", "yes")
+  use_pydantic = use_pydantic_llm()
   if use_pydantic:
+    from .pydantic_llm_adapter import PydanticAgentLLM
+
     llm_node = PydanticAgentLLM(
       openai_model=os.getenv("LIVEKIT_DEFAULT_LLM", "openai:gpt-4.1-mini"),
       mcp_url=(settings.BB_MCP_SERVER_URL or ""),
       system_prompt=ASSISTANT_SYSTEM_PROMPT,
     )
   else:
+    from livekit.plugins import openai
+
     llm_node = openai.LLM(model=os.getenv("LIVEKIT_DEFAULT_LLM", "gpt-4o-mini"))
 
   # Register BrowserBase MCP server for native LiveKit path (not using pydantic)
   mcp_servers = []
   if not use_pydantic and (settings.BB_MCP_SERVER_URL or ""):
     try:
+      from livekit.agents import mcp
+
       mcp_servers = [mcp.MCPServerHTTP(settings.BB_MCP_SERVER_URL)]
     except Exception as e:
       logger.warning(f"Failed to initialize MCP server: {e}")
 
+  from livekit.plugins.turn_detector.multilingual import MultilingualModel
+
   session = AgentSession(
     llm=llm_node,
-    stt=deepgram.STT(model=os.getenv("LIVEKIT_DEFAULT_STT", "nova-3"), language="multi"),
-    tts=cartesia.TTS(voice=os.getenv("LIVEKIT_DEFAULT_TTS_VOICE", "6f84f4b8-58a2-430c-8c79-688dad597532")),
+    stt=_build_stt(),
+    tts=_build_tts(),
     turn_detection=MultilingualModel(),
     vad=ctx.proc.userdata["vad"],
     preemptive_generation=True,
@@ -230,15 +310,30 @@ async def entrypoint(ctx: JobContext):
   async def log_usage():
     summary = usage_collector.get_summary()
     logger.info(f"Usage: {summary}")
+    if use_pydantic:
+      from .lesson_plans import get_lesson_plan_cache, lesson_plan_cache_enabled
+      from .llm_scheduler import get_llm_scheduler
+      from .mcp_tools import get_tool_cache
+      from .model_routing import get_model_routing
+
+      logger.info(f"LLM scheduler: {get_llm_scheduler().snapshot()}")
+      logger.info(f"LLM routing: {get_model_routing().snapshot()}")
+      logger.info(f"MCP tool cache: {get_tool_cache().snapshot()}")
+      if lesson_plan_cache_enabled():
+        logger.info(f"Lesson plan cache: {get_lesson_plan_cache().snapshot()}")
 
   ctx.add_shutdown_callback(log_usage)
 
+  room_input_options = RoomInputOptions()
+  if _env_flag("NOISE_CANCELLATION", "1"):
+    from livekit.plugins import noise_cancellation
+
+    room_input_options = RoomInputOptions(noise_cancellation=noise_cancellation.BVC())
+
   await session.start(
     agent=Assistant(),
     room=ctx.room,
-    room_input_options=RoomInputOptions(
-      noise_cancellation=noise_cancellation.BVC(),
-    ),
+    room_input_options=room_input_options,
   )
 
   await ctx.connect()
@@ -256,11 +351,42 @@ async def entrypoint(ctx: JobContext):
         await llm_node.close()
     except Exception:
       pass
+    # Hand the room's browser back to the backend session pool (no-op if it was not leased).
+    # The session id lets the pool release it even if the lease was lost in an API restart,
+    # and covers the tagged session the frontend creates when the lease fails.
+    # Without a backend, the frontend's session belongs to this room alone and is released
+    # at Browserbase directly.
+    try:
+      backend = os.getenv("BACKEND_API_BASE", "")
+      frontend = os.getenv("FRONTEND_API_BASE", "http://localhost:3000")
+      async with httpx.AsyncClient(timeout=10.0) as client:
+        bb_session_id = ""
+        with contextlib.suppress(Exception):
+          sr = await client.get(f"{frontend}/api/session", params={"roomId": ctx.room.name})
+          if sr.status_code == 200:
+            bb_session_id = str(sr.json().get("bbSessionId", ""))
+        if backend:
+          r = await client.post(
+            f"{backend}/api/v1/browser/release",
+            json={"room_id": ctx.room.name, "bb_session_id": bb_session_id},
+            headers={"X-Browser-Pool-Secret": settings.BROWSER_POOL_SECRET or ""},
+          )
+          r.raise_for_status()
+        elif bb_session_id and settings.BROWSERBASE_API_KEY and settings.BROWSERBASE_PROJECT_ID:
+          r = await client.post(
+            f"https://api.browserbase.com/v1/sessions/{bb_session_id}",
+            json={"status": "REQUEST_RELEASE", "projectId": settings.BROWSERBASE_PROJECT_ID},
+            headers={"X-BB-API-Key": settings.BROWSERBASE_API_KEY},
+          )
+          r.raise_for_status()
+    except Exception as e:
+      logger.warning(f"failed to release browser session: {e}")
 
   ctx.add_shutdown_callback(_shutdown)
 
 
 if __name__ == "__main__":
+  import_plugins()
   cli.run_app(
     WorkerOptions(
       entrypoint_fnc=entrypoint,
@@ -34,14 +34,49 @@ export const pydanticHistoryGet = query({
   },
 });
 
+// Messages after `afterSeq`, plus the room's last seq so workers can reconcile
+// a local copy. lastSeq is null when the room has rows predating seq numbers.
+export const pydanticHistorySince = query({
+  args: { roomId: v.string(), afterSeq: v.number() },
+  handler: async (ctx, args) => {
+    const newest = await ctx.db
+      .query("pydanticMessages")
+      .withIndex("by_room_time", (q) => q.eq("roomId", args.roomId))
+      .order("desc")
+      .first();
+    if (!newest) return { lastSeq: -1, messages: [] };
+    // Rows without seq sort first in by_room_seq; any legacy row means the caller needs the full history
+    const oldest = await ctx.db
+      .query("pydanticMessages")
+      .withIndex("by_room_seq", (q) => q.eq("roomId", args.roomId))
+      .order("asc")
+      .first();
+    if (newest.seq === undefined || oldest?.seq === undefined) return { lastSeq: null, messages: [] };
+    const rows = await ctx.db
+      .query("pydanticMessages")
+      .withIndex("by_room_seq", (q) => q.eq("roomId", args.roomId).gt("seq", args.afterSeq))
+      .order("asc")
+      .collect();
+    return { lastSeq: newest.seq, messages: rows.map((r) => ({ seq: r.seq, message: r.messageJson })) };
+  },
+});
+
 export const pydanticAppend = mutation({
   args: { roomId: v.string(), messagesJson: v.array(v.any()) },
   handler: async (ctx, args) => {
     const now = Date.now();
+    const last = await ctx.db
+      .query("pydanticMessages")
+      .withIndex("by_room_seq", (q) => q.eq("roomId", args.roomId))
+      .order("desc")
+      .first();
+    const firstSeq = (last?.seq ?? -1) + 1;
+    let seq = firstSeq;
     for (const m of args.messagesJson) {
-      await ctx.db.insert("pydanticMessages", { roomId: args.roomId, messageJson: m, createdAt: now } as any);
+      await ctx.db.insert("pydanticMessages", { roomId: args.roomId, messageJson: m, createdAt: now, seq } as any);
+      seq += 1;
     }
-    return { ok: true };
+    return { ok: true, firstSeq, lastSeq: seq - 1 };
   },
 });
 
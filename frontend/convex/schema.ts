@@ -44,7 +44,11 @@ export default defineSchema({
     roomId: v.string(),
     messageJson: v.any(),
     createdAt: v.number(),
-  }).index("by_room_time", ["roomId", "createdAt"]),
+    // Per-room sequence number; rows written before it was introduced have none
+    seq: v.optional(v.number()),
+  })
+    .index("by_room_time", ["roomId", "createdAt"])
+    .index("by_room_seq", ["roomId", "seq"]),
 });
 
 
@@ -10,8 +10,8 @@ export async function POST(req: NextRequest) {
       return NextResponse.json({ error: "roomId and messagesJson required" }, { status: 400 });
     }
     const convex = new ConvexHttpClient(process.env.NEXT_PUBLIC_CONVEX_URL as string);
-    await convex.mutation(api.messages.pydanticAppend, { roomId, messagesJson });
-    return NextResponse.json({ ok: true });
+    const res = await convex.mutation(api.messages.pydanticAppend, { roomId, messagesJson });
+    return NextResponse.json(res);
   } catch (err: any) {
     return NextResponse.json({ error: err?.message || "failed" }, { status: 500 });
   }
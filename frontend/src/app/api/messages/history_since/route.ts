@@ -0,0 +1,14 @@
+import { NextRequest, NextResponse } from "next/server";
+import { api } from "@convex/_generated/api";
+import { ConvexHttpClient } from "convex/browser";
+
+export async function GET(req: NextRequest) {
+  const { searchParams } = new URL(req.url);
+  const roomId = searchParams.get("roomId");
+  const afterSeq = Number(searchParams.get("afterSeq") ?? -1);
+  if (!roomId) return NextResponse.json({ error: "roomId required" }, { status: 400 });
+  if (!Number.isFinite(afterSeq)) return NextResponse.json({ error: "afterSeq must be a number" }, { status: 400 });
+  const convex = new ConvexHttpClient(process.env.NEXT_PUBLIC_CONVEX_URL as string);
+  const res = await convex.query(api.messages.pydanticHistorySince, { roomId, afterSeq });
+  return NextResponse.json(res);
+}
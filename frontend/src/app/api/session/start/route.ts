@@ -10,61 +10,77 @@ export async function POST(req: NextRequest) {
     const { roomId } = body as { roomId: string };
     if (!roomId) return NextResponse.json({ error: "roomId required" }, { status: 400 });
 
-    // Create Browserbase session
-    const bb = new Browserbase({ apiKey: process.env.BROWSERBASE_API_KEY! });
-
-    // Pre-clean: stop all RUNNING Browserbase sessions via SDK, requesting release
-    try {
-      const running: any[] = await (bb as any).sessions.list({ status: "RUNNING" });
-      for (const session of running) {
-        await (bb as any).sessions.update(session.id, {
-          status: "REQUEST_RELEASE",
-          projectId: session.projectId,
+    // Prefer a warm browser leased from the backend session pool (one per room)
+    let bbSessionId = "";
+    let bbLiveViewUrl = "";
+    let bbDevtoolsWssUrl = "";
+    const backendBase = process.env.BACKEND_API_BASE;
+    if (backendBase) {
+      try {
+        const leaseRes = await fetch(`${backendBase}/api/v1/browser/lease`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json", "X-Browser-Pool-Secret": process.env.BROWSER_POOL_SECRET || "" },
+          body: JSON.stringify({ room_id: roomId }),
         });
-        console.log("[session.start] requested release for Browserbase session", { sid: session.id });
+        if (leaseRes.ok) {
+          const lease: any = await leaseRes.json();
+          bbSessionId = lease.bb_session_id || "";
+          bbLiveViewUrl = lease.live_view_url || "";
+          bbDevtoolsWssUrl = lease.devtools_wss_url || "";
+          console.log("[session.start] leased browser from pool", { sid: bbSessionId, warm: lease.warm });
+        } else {
+          console.warn("[session.start] browser pool lease failed", leaseRes.status);
+        }
+      } catch (e) {
+        console.warn("[session.start] browser pool unavailable", (e as any)?.message || e);
       }
-      console.log(`[session.start] requested release for ${running.length} sessions`);
-    } catch (e) {
-      console.warn("[session.start] stop-all (REQUEST_RELEASE) pre-clean failed", (e as any)?.message || e);
     }
-    // Types vary across SDK versions; use any to remain flexible during hackathon
-    const session: any = await (bb as any).sessions.create({
-      projectId: process.env.BROWSERBASE_PROJECT_ID,
-      keepAlive: true,
-    });
 
-    // Some SDKs return only partial URLs on create; attempt a retrieve for full fields
-    // Use official debug endpoint to get final inspector/live URLs
-    const bbSessionId: string = (session.id as string) || "";
-    let bbLiveViewUrl = "";
-    let bbDevtoolsWssUrl = "";
+    if (!bbSessionId) {
+      // Lease failed or no pool: create a fresh session for this room only. Other running
+      // sessions belong to the pool or to other rooms and must be left alone.
+      const bb = new Browserbase({ apiKey: process.env.BROWSERBASE_API_KEY! });
 
-    try {
-      const dbgRes = await fetch(`https://api.browserbase.com/v1/sessions/${bbSessionId}/debug`, {
-        method: "GET",
-        headers: {
-          "X-BB-API-Key": process.env.BROWSERBASE_API_KEY as string,
-          "Content-Type": "application/json",
-        },
+      // Types vary across SDK versions; use any to remain flexible during hackathon.
+      // Tagged like pooled sessions, so the worker's release on shutdown (or the pool's
+      // orphan reaper) can find and stop it; keepAlive sessions never stop on their own
+      const session: any = await (bb as any).sessions.create({
+        projectId: process.env.BROWSERBASE_PROJECT_ID,
+        keepAlive: true,
+        userMetadata: { browserPool: process.env.BROWSER_POOL_TAG || "browserteacher" },
       });
-      if (dbgRes.ok) {
-        const dbg: any = await dbgRes.json();
-        bbLiveViewUrl = dbg.debuggerFullscreenUrl || dbg.debuggerUrl || "";
-        bbDevtoolsWssUrl = dbg.wsUrl || (dbg.pages && dbg.pages[0]?.wsUrl) || "";
-      }
-    } catch {}
 
-    // Fallbacks from initial create if debug isn’t available
-    if (!bbLiveViewUrl || !bbDevtoolsWssUrl) {
-      const fetched: any = (await ((bb as any).sessions.get?.(session.id) ?? (bb as any).sessions.retrieve?.(session.id))) || session;
-      const connectUrl: string =
-        fetched.devtoolsWsUrl || fetched.devtoolsUrl || fetched.connectUrl || fetched.devtools_url || fetched.connect_url || "";
-      const inspector = fetched.inspectorUrl || fetched.liveViewUrl || fetched.inspector_url || fetched.live_url || "";
-      if (!bbLiveViewUrl && inspector) bbLiveViewUrl = inspector;
-      if (!bbDevtoolsWssUrl && connectUrl) bbDevtoolsWssUrl = connectUrl;
-      if (!bbLiveViewUrl && bbDevtoolsWssUrl) {
-        const wssParam = (bbDevtoolsWssUrl as string).replace(/^wss:\/\//, "");
-        bbLiveViewUrl = `https://www.browserbase.com/devtools/inspector.html?wss=${encodeURIComponent(wssParam)}&debug=true`;
+      // Some SDKs return only partial URLs on create; attempt a retrieve for full fields
+      // Use official debug endpoint to get final inspector/live URLs
+      bbSessionId = (session.id as string) || "";
+
+      try {
+        const dbgRes = await fetch(`https://api.browserbase.com/v1/sessions/${bbSessionId}/debug`, {
+          method: "GET",
+          headers: {
+            "X-BB-API-Key": process.env.BROWSERBASE_API_KEY as string,
+            "Content-Type": "application/json",
+          },
+        });
+        if (dbgRes.ok) {
+          const dbg: any = await dbgRes.json();
+          bbLiveViewUrl = dbg.debuggerFullscreenUrl || dbg.debuggerUrl || "";
+          bbDevtoolsWssUrl = dbg.wsUrl || (dbg.pages && dbg.pages[0]?.wsUrl) || "";
+        }
+      } catch {}
+
+      // Fallbacks from initial create if debug isn’t available
+      if (!bbLiveViewUrl || !bbDevtoolsWssUrl) {
+        const fetched: any = (await ((bb as any).sessions.get?.(session.id) ?? (bb as any).sessions.retrieve?.(session.id))) || session;
+        const connectUrl: string =
+          fetched.devtoolsWsUrl || fetched.devtoolsUrl || fetched.connectUrl || fetched.devtools_url || fetched.connect_url || "";
+        const inspector = fetched.inspectorUrl || fetched.liveViewUrl || fetched.inspector_url || fetched.live_url || "";
+        if (!bbLiveViewUrl && inspector) bbLiveViewUrl = inspector;
+        if (!bbDevtoolsWssUrl && connectUrl) bbDevtoolsWssUrl = connectUrl;
+        if (!bbLiveViewUrl && bbDevtoolsWssUrl) {
+          const wssParam = (bbDevtoolsWssUrl as string).replace(/^wss:\/\//, "");
+          bbLiveViewUrl = `https://www.browserbase.com/devtools/inspector.html?wss=${encodeURIComponent(wssParam)}&debug=true`;
+        }
       }
     }
 